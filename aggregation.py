@@ -0,0 +1,162 @@
+# aggregation.py
+
+"""
+Vectorized stat aggregation over many players and periods at once.
+
+A group of players' prefix-summed stat columns is stacked into one NumPy
+array, so window totals for every player × period come from a single
+fancy-indexing lookup, and AVG/OBP/SLG/ERA/WHIP and the team rollups are
+whole-array arithmetic. Values stay numeric throughout; strings are produced
+only by the format_* helpers when the view model is assembled. Works the same
+for one roster group or the whole league.
+"""
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from stat_columns import HITTING_COLUMNS, PITCHING_COLUMNS, PlayerStatColumns
+
+class StatWindows:
+    """
+    Window totals for a group of players over a set of periods.
+
+    Attributes:
+        names: The stat columns, in the order of the last totals axis.
+        totals: int64 array of shape (players, periods, columns).
+        games: int64 array of shape (players, periods), the games each window covers.
+    """
+    def __init__(self, stat_type: str, columns: List[Optional[PlayerStatColumns]], periods: Dict[str, Optional[int]]):
+        """
+        Args:
+            stat_type: 'hitting' or 'pitching'.
+            columns: One PlayerStatColumns per player; None counts as no games.
+            periods: Period name to number of most recent games, None for season-to-date.
+        """
+        self.stat_type = stat_type
+        self.periods = list(periods)
+        self.names = HITTING_COLUMNS if stat_type == 'hitting' else PITCHING_COLUMNS
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        played = np.array([c.games if c is not None else 0 for c in columns], dtype=np.int64)
+        width = int(played.max()) + 1 if len(played) else 1
+        # prefix[p, k, s]: player p's total of stat s over their k most recent
+        # games, padded with the season total past their last game.
+        prefix = np.zeros((len(columns), width, len(self.names)), dtype=np.int64)
+        for p, c in enumerate(columns):
+            if c is None or not c.games:
+                continue
+            for s, name in enumerate(self.names):
+                column = np.frombuffer(c.sums[name], dtype=np.dtype(c.sums[name].typecode))
+                prefix[p, :c.games + 1, s] = column
+                prefix[p, c.games + 1:, s] = column[-1]
+
+        windows = np.array([width - 1 if n is None else n for n in periods.values()], dtype=np.int64)
+        self.games = np.minimum(played[:, None], windows[None, :])
+        self.totals = prefix[np.arange(len(columns))[:, None], self.games, :]
+
+    def stat(self, name: str) -> np.ndarray:
+        """Totals of one stat, shape (players, periods)."""
+        return self.totals[..., self.index[name]]
+
+    def team_totals(self, periods: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Each stat summed over all players, one value per period.
+
+        Args:
+            periods: Period names to return, in order; defaults to all of them.
+        """
+        summed = self.totals.sum(axis=0)
+        if periods is not None:
+            summed = summed[[self.periods.index(period) for period in periods]]
+        return {name: summed[:, i] for name, i in self.index.items()}
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, with 0 wherever the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=denominator > 0)
+
+def hitting_rates(h, ab, bb, tb) -> Dict[str, np.ndarray]:
+    """AVG, OBP and SLG for arrays of hitting totals of any shape."""
+    return {'avg': _ratio(h, ab), 'obp': _ratio(h + bb, ab + bb), 'slg': _ratio(tb, ab)}
+
+def pitching_rates(outs, er, bb, h) -> Dict[str, np.ndarray]:
+    """Innings pitched, ERA and WHIP for arrays of pitching totals of any shape."""
+    ip = np.asarray(outs, dtype=np.float64) / 3.0
+    return {'ip': ip, 'era': _ratio(er * 9, ip), 'whip': _ratio(bb + h, ip)}
+
+def format_player_stats(windows: StatWindows) -> List[Dict[str, Dict[str, Any]]]:
+    """
+    Formats every player's stats by period for the details page.
+
+    Returns:
+        One dictionary per player mapping period name to its stats, in the
+        same shape the per-player formatters used to produce.
+    """
+    names = windows.names
+    if windows.stat_type == 'hitting':
+        rates = hitting_rates(windows.stat('h'), windows.stat('ab'), windows.stat('bb'), windows.stat('tb'))
+        default = {'avg': '.000', 'obp': '.000', 'slg': '.000', 'hr': 0, 'rbi': 0, 'h': 0, 'ab': 0, 'k': 0}
+    else:
+        rates = pitching_rates(windows.stat('outs'), windows.stat('er'), windows.stat('bb'), windows.stat('h'))
+        default = {'era': '0.00', 'whip': '0.00', 'k': 0, 'bb': 0, 'ip': '0.0', 'h': 0, 'r': 0, 'gs': 0, 'sv': 0}
+    totals = windows.totals.tolist()
+    games = windows.games.tolist()
+    rates = {name: values.tolist() for name, values in rates.items()}
+
+    players = []
+    for p in range(len(totals)):
+        by_period = {}
+        for j, period in enumerate(windows.periods):
+            if not games[p][j]:
+                by_period[period] = dict(default)
+                continue
+            t = dict(zip(names, totals[p][j]))
+            if windows.stat_type == 'hitting':
+                by_period[period] = {
+                    'avg': f"{rates['avg'][p][j]:.3f}" if t['ab'] > 0 else ".000",
+                    'obp': f"{rates['obp'][p][j]:.3f}" if t['ab'] + t['bb'] > 0 else ".000",
+                    'slg': f"{rates['slg'][p][j]:.3f}" if t['ab'] > 0 else ".000",
+                    'hr': t['hr'], 'rbi': t['rbi'], 'h': t['h'], 'ab': t['ab'],
+                    'bb': t['bb'], 'tb': t['tb'], 'k': t['k'],
+                }
+            else:
+                by_period[period] = {
+                    'era': f"{rates['era'][p][j]:.2f}" if t['outs'] > 0 else "0.00",
+                    'whip': f"{rates['whip'][p][j]:.2f}" if t['outs'] > 0 else "0.00",
+                    'k': t['k'], 'bb': t['bb'], 'ip': f"{rates['ip'][p][j]:.1f}",
+                    'h': t['h'], 'r': t['r'], 'gs': t['gs'], 'sv': t['sv'],
+                }
+        players.append(by_period)
+    return players
+
+EMPTY_TEAM_STATS = {'AVG': '.000', 'OBP': '.000', 'SLG': '.000', 'HR': 0, 'AVG_HITS': '0.0', 'AVG_K': '0.0'}
+
+def rolling_team_stats(hitting: Dict[str, np.ndarray], pitching: Dict[str, np.ndarray],
+                       games_played: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Computes and formats a team's rolling stats for every period at once.
+
+    Args:
+        hitting: StatWindows.team_totals() of the team's batters.
+        pitching: StatWindows.team_totals() of the team's pitchers.
+        games_played: The team's games played in each period.
+
+    Returns:
+        One dictionary of formatted team stats per period.
+    """
+    rates = hitting_rates(hitting['h'], hitting['ab'], hitting['bb'], hitting['tb'])
+    avg_hits = _ratio(hitting['h'], games_played)
+    avg_k = _ratio(pitching['k'], games_played)
+    rollups = []
+    for j in range(len(games_played)):
+        ab, bb = int(hitting['ab'][j]), int(hitting['bb'][j])
+        rollups.append({
+            'AVG': f"{rates['avg'][j]:.3f}" if ab > 0 else ".000",
+            'OBP': f"{rates['obp'][j]:.3f}" if ab + bb > 0 else ".000",
+            'SLG': f"{rates['slg'][j]:.3f}" if ab > 0 else ".000",
+            'HR': int(hitting['hr'][j]),
+            'AVG_HITS': f"{avg_hits[j]:.1f}" if games_played[j] > 0 else "0.0",
+            'AVG_K': f"{avg_k[j]:.1f}" if games_played[j] > 0 else "0.0",
+        })
+    return rollups
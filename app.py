@@ -5,14 +5,21 @@ Main application file for the MLB Stats Tracker.
 """
 import os
 import logging
-import threading
 from flask import Flask
 
 from config import config_by_name
 from extensions import cache
+from mlb_api import MLBStatsAPI, rate_limiter, transport, circuit_breaker
+from caching import single_flight, swr_cache
+from metrics import metrics
+from profiling import profiler
+from store import stats_store
+from leaderboards import leaderboard_index
+from snapshots import load_on_startup
+from workers import fetch_pool
 from routes import main_bp
-from utils import get_stat_class
-from tasks import daily_cache_refresh, warm_cache_on_startup
+from utils import get_stat_class, period_label
+from tasks import start_background_tasks
 
 def create_app(config_name: str = 'development') -> Flask:
     """
@@ -26,12 +33,26 @@ def create_app(config_name: str = 'development') -> Flask:
     
     # Initialize extensions
     cache.init_app(app)
+    transport.init_app(app)
+    circuit_breaker.init_app(app)
+    rate_limiter.init_app(app)
+    single_flight.init_app(app)
+    swr_cache.init_app(app)
+    stats_store.init_app(app)
+    leaderboard_index.init_app(app)
+    load_on_startup(app)
+    fetch_pool.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    with app.app_context():
+        MLBStatsAPI.ensure_memoize_versions()
     
     # Register blueprints
     app.register_blueprint(main_bp)
 
     # Explicitly register the function as a Jinja2 filter
     app.jinja_env.filters['get_stat_class'] = get_stat_class
+    app.jinja_env.filters['period_label'] = period_label
 
     # Configure logging
     logging.basicConfig(level=logging.INFO,
@@ -47,12 +68,10 @@ app = create_app(config_name)
 
 if __name__ == '__main__':
 
-    # Start background tasks for warming cache and daily refresh
+    # Start background tasks for warming cache and daily refresh.
+    # Under gunicorn they are started per worker by gunicorn.conf.py instead.
     if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
-        warmup_thread = threading.Thread(target=warm_cache_on_startup, args=(app,), daemon=True)
-        refresh_thread = threading.Thread(target=daily_cache_refresh, args=(app,), daemon=True)
-        warmup_thread.start()
-        refresh_thread.start()
+        start_background_tasks(app)
 
     port = int(os.environ.get('PORT', 5005))
     
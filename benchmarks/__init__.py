@@ -0,0 +1,9 @@
+# benchmarks/__init__.py
+
+"""
+Offline benchmarks for the MLB Stats Tracker.
+
+stand_in_api serves recorded or synthetic fixtures (fixtures, record) as a
+local MLB Stats API with configurable latency and rate limit; run drives the
+app against it. See `python -m benchmarks.run --help`.
+"""
@@ -0,0 +1,228 @@
+# benchmarks/fixtures.py
+
+"""
+Fixture data served by the stand-in MLB Stats API.
+
+Fixtures are kept as a data model rather than as canned responses: a
+schedule, team and roster payloads, and per-player game log splits. The
+stand-in answers any schedule window or game log delta from them. All dates
+are shifted so the recording day becomes today, because the app always asks
+for today's slate.
+
+RecordedFixtures loads a set written by benchmarks.record from the live API.
+SyntheticFixtures generates a deterministic league instead, so the suite runs
+without ever having reached statsapi.mlb.com.
+"""
+import os
+import json
+import random
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import pytz
+
+DATE_FIELDS = ('date', 'officialDate', 'gameDate')
+
+def today() -> date:
+    """Today in the timezone the app uses for the daily slate."""
+    return datetime.now(pytz.timezone('US/Pacific')).date()
+
+def _shift(value: str, days: int) -> str:
+    """Shifts a 'YYYY-MM-DD' date, or an ISO timestamp starting with one, by days."""
+    if not days or len(value) < 10:
+        return value
+    shifted = date.fromisoformat(value[:10]) + timedelta(days=days)
+    return shifted.isoformat() + value[10:]
+
+def shift_dates(payload: Any, days: int) -> Any:
+    """Returns payload with every date field shifted by days."""
+    if isinstance(payload, list):
+        return [shift_dates(item, days) for item in payload]
+    if isinstance(payload, dict):
+        return {key: _shift(value, days) if key in DATE_FIELDS and isinstance(value, str) else shift_dates(value, days)
+                for key, value in payload.items()}
+    return payload
+
+def _in_range(day: str, start: Optional[str], end: Optional[str]) -> bool:
+    day = day[:10]
+    return (start is None or day >= start) and (end is None or day <= end)
+
+class Fixtures:
+    """Answers the Stats API queries the app makes from a fixture data model."""
+    def schedule_dates(self) -> List[Dict[str, Any]]:
+        """The whole schedule as a Stats API 'dates' list, oldest first."""
+        raise NotImplementedError
+
+    def team(self, team_id: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def roster(self, team_id: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def game_log(self, player_id: int, stat_group: str) -> List[Dict[str, Any]]:
+        """All of a player's game log splits for the season, oldest first."""
+        raise NotImplementedError
+
+    def schedule(self, start: str, end: str, team_id: Optional[int] = None) -> Dict[str, Any]:
+        dates = []
+        for entry in self.schedule_dates():
+            if not _in_range(entry['date'], start, end):
+                continue
+            games = entry['games']
+            if team_id is not None:
+                games = [game for game in games
+                         if team_id in (game['teams']['home']['team']['id'], game['teams']['away']['team']['id'])]
+            if games:
+                dates.append(dict(entry, games=games, totalGames=len(games)))
+        return {'totalGames': sum(len(entry['games']) for entry in dates), 'dates': dates}
+
+    def game_log_splits(self, player_id: int, stat_group: str,
+                        start: Optional[str] = None, end: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [split for split in self.game_log(player_id, stat_group) if _in_range(split['date'], start, end)]
+
+    def todays_teams(self) -> List[int]:
+        """IDs of the teams playing today, in slate order."""
+        games = self.schedule(today().isoformat(), today().isoformat())['dates']
+        teams = []
+        for entry in games:
+            for game in entry['games']:
+                teams += [game['teams']['home']['team']['id'], game['teams']['away']['team']['id']]
+        return list(dict.fromkeys(teams))
+
+class RecordedFixtures(Fixtures):
+    """
+    A fixture set recorded by benchmarks.record, replayed with its dates
+    shifted so the recording day is today.
+    """
+    def __init__(self, directory: str):
+        def load(name):
+            with open(os.path.join(directory, name)) as f:
+                return json.load(f)
+
+        meta = load('meta.json')
+        days = (today() - date.fromisoformat(meta['recorded_on'])).days
+        self.meta = meta
+        self._dates = shift_dates(load('schedule.json'), days)
+        self._teams = {int(team_id): payload for team_id, payload in load('teams.json').items()}
+        self._rosters = {int(team_id): payload for team_id, payload in load('rosters.json').items()}
+        self._game_logs = {
+            group: {int(player_id): shift_dates(splits, days) for player_id, splits in load(f"game_logs_{group}.json").items()}
+            for group in ('hitting', 'pitching')
+        }
+
+    def schedule_dates(self) -> List[Dict[str, Any]]:
+        return self._dates
+
+    def team(self, team_id: int) -> Optional[Dict[str, Any]]:
+        return self._teams.get(team_id)
+
+    def roster(self, team_id: int) -> Optional[Dict[str, Any]]:
+        return self._rosters.get(team_id)
+
+    def game_log(self, player_id: int, stat_group: str) -> List[Dict[str, Any]]:
+        return self._game_logs[stat_group].get(player_id, [])
+
+class SyntheticFixtures(Fixtures):
+    """
+    A deterministic league: every team plays once a day over the last `days`
+    days and today, with 13 batters and 13 pitchers each. Game logs are
+    generated on first request and kept.
+    """
+    BATTERS = 13
+    PITCHERS = 13
+    STARTERS = 5
+
+    def __init__(self, seed: int = 7, teams: int = 30, days: int = 120):
+        self.seed = seed
+        self.team_ids = [108 + i for i in range(teams)]
+        first_day = today() - timedelta(days=days)
+        self._dates = []
+        self._team_games: Dict[int, List[Dict[str, Any]]] = {team_id: [] for team_id in self.team_ids}
+        for offset in range(days + 1):
+            day = first_day + timedelta(days=offset)
+            rng = random.Random(f"{seed}:schedule:{day}")
+            order = list(self.team_ids)
+            rng.shuffle(order)
+            games = []
+            for n in range(0, len(order) - 1, 2):
+                home, away = order[n], order[n + 1]
+                final = day < today()
+                game = {
+                    'gamePk': int(day.strftime('%y%m%d')) * 100 + n // 2,
+                    'gameDate': f"{day.isoformat()}T23:05:00Z",
+                    'officialDate': day.isoformat(),
+                    'status': {'abstractGameState': 'Final' if final else 'Preview',
+                               'detailedState': 'Final' if final else 'Scheduled'},
+                    'teams': {side: {'team': {'id': team_id, 'name': self._team_name(team_id)}}
+                              for side, team_id in (('home', home), ('away', away))},
+                }
+                if final:
+                    game['teams']['home']['score'] = rng.randint(0, 10)
+                    game['teams']['away']['score'] = rng.randint(0, 10)
+                    for team_id in (home, away):
+                        self._team_games[team_id].append(game)
+                games.append(game)
+            self._dates.append({'date': day.isoformat(), 'totalGames': len(games), 'games': games})
+
+    @staticmethod
+    def _team_name(team_id: int) -> str:
+        return f"Team {team_id}"
+
+    def _players(self, team_id: int) -> List[Dict[str, Any]]:
+        players = [{'id': team_id * 1000 + i, 'pitcher': False} for i in range(self.BATTERS)]
+        players += [{'id': team_id * 1000 + 100 + i, 'pitcher': True} for i in range(self.PITCHERS)]
+        return players
+
+    def schedule_dates(self) -> List[Dict[str, Any]]:
+        return self._dates
+
+    def team(self, team_id: int) -> Optional[Dict[str, Any]]:
+        if team_id not in self._team_games:
+            return None
+        return {'teams': [{'id': team_id, 'name': self._team_name(team_id), 'abbreviation': f"T{team_id % 100:02d}"}]}
+
+    def roster(self, team_id: int) -> Optional[Dict[str, Any]]:
+        if team_id not in self._team_games:
+            return None
+        return {'roster': [{'person': {'id': player['id'], 'fullName': f"Player {player['id']}"},
+                            'position': {'abbreviation': 'P', 'type': 'Pitcher'} if player['pitcher']
+                            else {'abbreviation': 'OF', 'type': 'Outfielder'}}
+                           for player in self._players(team_id)]}
+
+    @lru_cache(maxsize=None)
+    def game_log(self, player_id: int, stat_group: str) -> List[Dict[str, Any]]:
+        team_id, number = divmod(player_id, 1000)
+        if team_id not in self._team_games or (stat_group == 'pitching') != (number >= 100):
+            return []
+        rng = random.Random(f"{self.seed}:player:{player_id}:{stat_group}")
+        splits = []
+        for n, game in enumerate(self._team_games[team_id]):
+            if stat_group == 'hitting':
+                if rng.random() > 0.9:
+                    continue
+                ab = rng.randint(2, 5)
+                h = sum(rng.random() < 0.25 for _ in range(ab))
+                hr = int(h and rng.random() < 0.15)
+                stat = {'atBats': ab, 'hits': h, 'homeRuns': hr, 'rbi': hr + int(rng.random() < 0.2),
+                        'baseOnBalls': int(rng.random() < 0.1), 'totalBases': h + 3 * hr, 'strikeOuts': rng.randint(0, 2)}
+            else:
+                starter = number - 100 < self.STARTERS
+                if (starter and n % self.STARTERS != number - 100) or (not starter and rng.random() > 0.4):
+                    continue
+                outs = rng.randint(12, 21) if starter else rng.randint(1, 6)
+                h = rng.randint(0, outs // 3 + 2)
+                stat = {'inningsPitched': f"{outs // 3}.{outs % 3}", 'earnedRuns': rng.randint(0, h), 'hits': h,
+                        'runs': rng.randint(0, h + 1), 'baseOnBalls': rng.randint(0, 3), 'strikeOuts': rng.randint(0, outs // 2),
+                        'saves': int(not starter and rng.random() < 0.1), 'gamesStarted': int(starter)}
+            home = game['teams']['home']['team']['id'] == team_id
+            splits.append({'date': game['officialDate'], 'game': {'gamePk': game['gamePk']}, 'stat': stat,
+                           'isHome': home, 'team': {'id': team_id},
+                           'opponent': game['teams']['away' if home else 'home']['team']})
+        return splits
+
+def load_fixtures(source: Optional[str] = None, seed: int = 7) -> Fixtures:
+    """Loads the recorded fixture set in directory source, or a synthetic league if source is None or 'synthetic'."""
+    if source in (None, 'synthetic'):
+        return SyntheticFixtures(seed=seed)
+    return RecordedFixtures(source)
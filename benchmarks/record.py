@@ -0,0 +1,97 @@
+# benchmarks/record.py
+
+"""
+Records a fixture set for the stand-in API from the live MLB Stats API.
+
+Captures the season's schedule up to a few days ahead, plus team info,
+active rosters and season game logs for every team playing today. The
+output is the directory layout RecordedFixtures reads:
+
+    python -m benchmarks.record benchmarks/fixtures/2025-07-04
+
+Recording makes a few dozen calls; they are paced to stay well inside the
+API's limits.
+"""
+import os
+import json
+import time
+import argparse
+from datetime import timedelta
+from typing import Any, Dict, List
+
+import requests
+
+from benchmarks.fixtures import today
+
+MLB_API_BASE = "https://statsapi.mlb.com/api/v1"
+# Players per batched game log request, as in MLBStatsAPI.PLAYER_BATCH_SIZE.
+PLAYER_BATCH_SIZE = 50
+
+def _get(session: requests.Session, path: str, params: Dict[str, Any], pause: float) -> Dict[str, Any]:
+    response = session.get(f"{MLB_API_BASE}{path}", params=params, timeout=(3.05, 30))
+    response.raise_for_status()
+    time.sleep(pause)
+    return response.json()
+
+def record(directory: str, days_ahead: int = 3, pause: float = 0.5):
+    """Writes a fixture set for today's slate into directory."""
+    session = requests.Session()
+    day = today()
+    season = day.year
+    os.makedirs(directory, exist_ok=True)
+
+    def save(name: str, payload: Any):
+        with open(os.path.join(directory, name), 'w') as f:
+            json.dump(payload, f)
+
+    schedule = _get(session, '/schedule', {'sportId': 1, 'startDate': f"{season}-01-01",
+                                           'endDate': (day + timedelta(days=days_ahead)).isoformat(),
+                                           'hydrate': 'team'}, pause)
+    save('schedule.json', schedule.get('dates', []))
+
+    team_ids: List[int] = []
+    for entry in schedule.get('dates', []):
+        if entry.get('date') == day.isoformat():
+            for game in entry.get('games', []):
+                team_ids += [game['teams']['home']['team']['id'], game['teams']['away']['team']['id']]
+    team_ids = list(dict.fromkeys(team_ids))
+    print(f"Recording {len(team_ids)} teams playing on {day}")
+
+    teams, rosters = {}, {}
+    players: Dict[str, List[int]] = {'hitting': [], 'pitching': []}
+    for team_id in team_ids:
+        teams[team_id] = _get(session, f"/teams/{team_id}", {'sportId': 1}, pause)
+        rosters[team_id] = _get(session, f"/teams/{team_id}/roster", {'rosterType': 'active'}, pause)
+        for player in rosters[team_id].get('roster', []):
+            group = 'pitching' if player['position']['type'] == 'Pitcher' else 'hitting'
+            players[group].append(player['person']['id'])
+    save('teams.json', teams)
+    save('rosters.json', rosters)
+
+    for group, player_ids in players.items():
+        game_logs = {}
+        for start in range(0, len(player_ids), PLAYER_BATCH_SIZE):
+            chunk = player_ids[start:start + PLAYER_BATCH_SIZE]
+            data = _get(session, '/people', {
+                'personIds': ','.join(map(str, chunk)),
+                'hydrate': f"stats(group=[{group}],type=[gameLog],season={season})",
+            }, pause)
+            for person in data.get('people', []):
+                splits = next((stat.get('splits', []) for stat in person.get('stats', [])
+                               if stat.get('group', {}).get('displayName') == group), [])
+                game_logs[person['id']] = sorted(splits, key=lambda split: split.get('date', ''))
+        save(f"game_logs_{group}.json", game_logs)
+        print(f"Recorded {group} game logs for {len(game_logs)} players")
+
+    save('meta.json', {'recorded_on': day.isoformat(), 'season': season, 'teams': len(team_ids)})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Record stand-in API fixtures from the live MLB Stats API.')
+    parser.add_argument('directory')
+    parser.add_argument('--days-ahead', type=int, default=3, help='Days of schedule to record past today.')
+    parser.add_argument('--pause', type=float, default=0.5, help='Seconds between calls.')
+    args = parser.parse_args(argv)
+    record(args.directory, days_ahead=args.days_ahead, pause=args.pause)
+
+if __name__ == '__main__':
+    main()
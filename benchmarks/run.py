@@ -0,0 +1,433 @@
+# benchmarks/run.py
+
+"""
+Offline benchmark suite.
+
+Starts the stand-in MLB Stats API and runs each scenario in a fresh process
+pointed at it, with its own empty cache directory and stats database:
+
+    cold         / and every details page of today's slate, once each, from empty caches
+    warm         the same pages repeatedly once everything is cached
+    concurrent   several clients loading the slate at once, cold and then warm
+    warmup       warm_cache_on_startup() end to end, then the details pages it prepared
+    aggregation  StatWindows and the team rollups for one roster group and the whole league
+
+For each scenario it reports p50/p99 latency per measurement, upstream calls
+(total, per endpoint, and rejected by the stand-in's rate limit) per phase,
+and the process's peak RSS. Results are written as JSON to benchmarks/results/
+named by time and git commit. --compare prints the change against an earlier
+results file.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios cold warm --latency-ms 120 --compare benchmarks/results/<baseline>.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not reported
+    resource = None
+
+from benchmarks.fixtures import load_fixtures, today
+from benchmarks.stand_in_api import StandInAPI, COUNTS_PATH, API_PREFIX
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+SCENARIOS = ('cold', 'warm', 'concurrent', 'warmup', 'aggregation')
+
+def percentile(samples: List[float], q: float) -> float:
+    """The nearest-rank q-th percentile (0-100) of samples."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Latency summary of a list of durations in seconds, in milliseconds."""
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+    }
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+# Scenario side: runs in a child process with the environment set by run_scenario().
+
+class Upstream:
+    """Reads the stand-in's call counts, to attribute upstream calls to phases."""
+    def __init__(self, api_base: str):
+        self.url = api_base[:-len(API_PREFIX)] + COUNTS_PATH
+        self.phases: Dict[str, Dict[str, Any]] = {}
+
+    def counts(self) -> Dict[str, Any]:
+        with urllib.request.urlopen(self.url, timeout=10) as response:
+            return json.load(response)
+
+    def phase(self, name: str, func: Callable, *args, **kwargs):
+        """Runs func and records the upstream calls it caused under name."""
+        before = self.counts()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            after = self.counts()
+            endpoints = {endpoint: count - before['by_endpoint'].get(endpoint, 0)
+                         for endpoint, count in after['by_endpoint'].items()}
+            self.phases[name] = {
+                'total': after['total'] - before['total'],
+                'by_endpoint': {endpoint: count for endpoint, count in sorted(endpoints.items()) if count},
+                'rejected': after['rejected'] - before['rejected'],
+                'bytes': after['bytes'] - before['bytes'],
+            }
+
+def _load(client, url: str) -> float:
+    """GETs url with a test client, reading the whole (possibly streamed) body; returns the seconds taken."""
+    started = time.perf_counter()
+    response = client.get(url)
+    response.get_data()
+    response.close()
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 400:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+    return elapsed
+
+def _slate(app, limit: Optional[int]) -> List[str]:
+    """Details page URLs for today's matchups."""
+    from mlb_api import MLBStatsAPI
+    with app.app_context():
+        games = MLBStatsAPI.get_todays_games(today().isoformat())
+    urls = list(dict.fromkeys(f"/details/{game['teams']['home']['team']['id']}/{game['teams']['away']['team']['id']}"
+                              for game in games))
+    return urls[:limit] if limit else urls
+
+def _load_all(client, urls: List[str], timings: Dict[str, List[float]], label: str):
+    for url in urls:
+        timings.setdefault(label, []).append(_load(client, url))
+
+def _load_concurrently(app, urls: List[str], clients: int, label: str, timings: Dict[str, List[float]]) -> float:
+    """Each of `clients` threads loads urls in its own shuffled order; returns the wall time."""
+    samples: List[float] = []
+    errors: List[Exception] = []
+    lock = threading.Lock()
+
+    def client_thread(seed: int):
+        client = app.test_client()
+        order = list(urls)
+        random.Random(seed).shuffle(order)
+        for url in order:
+            try:
+                elapsed = _load(client, url)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                samples.append(elapsed)
+
+    threads = [threading.Thread(target=client_thread, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    if errors:
+        raise RuntimeError(f"{len(errors)} concurrent request(s) failed, first: {errors[0]}")
+    timings[label] = samples
+    return wall
+
+def scenario_cold(app, options, upstream: Upstream) -> Dict[str, Any]:
+    client = app.test_client()
+    timings: Dict[str, List[float]] = {}
+    timings['home'] = [upstream.phase('home', _load, client, '/')]
+    urls = _slate(app, options['max_games'])
+    upstream.phase('details', _load_all, client, urls, timings, 'details')
+    return {'timings': timings}
+
+def scenario_warm(app, options, upstream: Upstream) -> Dict[str, Any]:
+    client = app.test_client()
+    urls = _slate(app, options['max_games'])
+    _load(client, '/')
+    _load_all(client, urls, {}, 'setup')
+    timings: Dict[str, List[float]] = {}
+
+    def iterate():
+        for _ in range(options['iterations']):
+            timings.setdefault('home', []).append(_load(client, '/'))
+            _load_all(client, urls, timings, 'details')
+
+    upstream.phase('warm', iterate)
+    return {'timings': timings}
+
+def scenario_concurrent(app, options, upstream: Upstream) -> Dict[str, Any]:
+    urls = _slate(app, options['max_games'])
+    timings: Dict[str, List[float]] = {}
+    clients = options['concurrency']
+    cold_wall = upstream.phase('cold', _load_concurrently, app, urls, clients, 'details_cold', timings)
+    warm_wall = upstream.phase('warm', _load_concurrently, app, urls * options['iterations'], clients, 'details_warm', timings)
+    return {'timings': timings, 'throughput_rps': {
+        'details_cold': round(len(timings['details_cold']) / cold_wall, 2),
+        'details_warm': round(len(timings['details_warm']) / warm_wall, 2),
+    }}
+
+def scenario_warmup(app, options, upstream: Upstream) -> Dict[str, Any]:
+    from tasks import warm_cache_on_startup, warmup_progress
+
+    def warmup():
+        started = time.perf_counter()
+        warm_cache_on_startup(app)
+        return time.perf_counter() - started
+
+    timings: Dict[str, List[float]] = {'warmup': [upstream.phase('warmup', warmup)]}
+    progress = warmup_progress.snapshot()
+    client = app.test_client()
+    urls = _slate(app, options['max_games'])
+    upstream.phase('details_after_warmup', _load_all, client, urls, timings, 'details_after_warmup')
+    return {'timings': timings, 'warmup_tasks': {'total': progress['total'], 'failed': progress['failed']}}
+
+def scenario_aggregation(app, options, upstream: Upstream) -> Dict[str, Any]:
+    from aggregation import StatWindows, format_player_stats, rolling_team_stats
+    from stat_columns import GameLog, PlayerStatColumns
+    from utils import HITTER_PERIODS, PITCHER_PERIODS
+
+    fixtures = load_fixtures(options['fixtures'], seed=options['seed'])
+
+    def columns(player_ids: List[int], group: str) -> List[PlayerStatColumns]:
+        return [PlayerStatColumns(group, GameLog(group, sorted(fixtures.game_log(player_id, group),
+                                                                key=lambda split: split['date'], reverse=True)))
+                for player_id in player_ids]
+
+    rosters = {}
+    for team_id in fixtures.todays_teams():
+        roster = fixtures.roster(team_id) or {'roster': []}
+        rosters[team_id] = {
+            'hitting': [p['person']['id'] for p in roster['roster'] if p['position']['type'] != 'Pitcher'],
+            'pitching': [p['person']['id'] for p in roster['roster'] if p['position']['type'] == 'Pitcher'],
+        }
+    team_id = next(iter(rosters))
+    batters, pitchers = columns(rosters[team_id]['hitting'], 'hitting'), columns(rosters[team_id]['pitching'], 'pitching')
+    league = columns([player_id for roster in rosters.values() for player_id in roster['hitting']], 'hitting')
+    games_played = [21, 21, 21]
+
+    def timed(func: Callable, repeats: int) -> List[float]:
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    def rollup():
+        hitting = StatWindows('hitting', batters, HITTER_PERIODS)
+        pitching = StatWindows('pitching', pitchers, PITCHER_PERIODS)
+        rolling_team_stats(hitting.team_totals(), pitching.team_totals(), games_played)
+
+    repeats = options['micro_repeats']
+    windows = StatWindows('hitting', batters, HITTER_PERIODS)
+    league_windows = StatWindows('hitting', league, HITTER_PERIODS)
+    timings = {
+        'stat_windows_roster': timed(lambda: StatWindows('hitting', batters, HITTER_PERIODS), repeats),
+        'format_player_stats_roster': timed(lambda: format_player_stats(windows), repeats),
+        'team_rollup': timed(rollup, repeats),
+        'stat_windows_league': timed(lambda: StatWindows('hitting', league, HITTER_PERIODS), max(1, repeats // 10)),
+        'format_player_stats_league': timed(lambda: format_player_stats(league_windows), max(1, repeats // 10)),
+    }
+    return {'timings': timings, 'players': {'roster': len(batters), 'league': len(league)}}
+
+SCENARIO_FUNCS = {
+    'cold': scenario_cold,
+    'warm': scenario_warm,
+    'concurrent': scenario_concurrent,
+    'warmup': scenario_warmup,
+    'aggregation': scenario_aggregation,
+}
+
+def _child(scenario: str, options: Dict[str, Any]):
+    import logging
+    from app import app
+    logging.getLogger().setLevel(logging.WARNING)
+    rss_after_import = peak_rss_mb()
+    upstream = Upstream(os.environ['MLB_API_BASE'])
+    started = time.perf_counter()
+    result = SCENARIO_FUNCS[scenario](app, options, upstream)
+    result['wall_s'] = round(time.perf_counter() - started, 3)
+    result['timings'] = {label: summarize(samples) for label, samples in result['timings'].items() if samples}
+    result['upstream'] = upstream.phases
+    result['rss_after_import_mb'] = rss_after_import
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+# Suite side
+
+def run_scenario(api: StandInAPI, scenario: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one scenario in a fresh process with empty caches and a full rate-limit budget."""
+    api.reset()
+    with tempfile.TemporaryDirectory(prefix=f"mlb-bench-{scenario}-") as workdir:
+        env = dict(os.environ,
+                   FLASK_CONFIG='production',
+                   MLB_API_BASE=api.base_url,
+                   CACHE_DIR=os.path.join(workdir, 'cache'),
+                   METRICS_DIR=os.path.join(workdir, 'metrics'),
+                   STATS_DB_PATH=os.path.join(workdir, 'stats.db'),
+                   RUN_BACKGROUND_TASKS='false',
+                   MLB_API_RATE_LIMIT=str(options['rate_limit'] or 1_000_000))
+        process = subprocess.run([sys.executable, '-m', 'benchmarks.run', '--child', scenario, '--options', json.dumps(options)],
+                                 cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {'error': f"exit code {process.returncode}", 'stderr': process.stderr[-4000:]}
+    return json.loads(lines[-1])
+
+def git_commit() -> Tuple[Optional[str], bool]:
+    """The current commit and whether the working tree has uncommitted changes."""
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+
+def run_suite(options: Dict[str, Any]) -> Dict[str, Any]:
+    fixtures = load_fixtures(options['fixtures'], seed=options['seed'])
+    api = StandInAPI(fixtures, latency=options['latency_ms'] / 1000, jitter=options['jitter_ms'] / 1000,
+                     rate_limit=options['rate_limit'] or None).start()
+    commit, dirty = git_commit()
+    results = {
+        'meta': {'commit': commit, 'dirty': dirty, 'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                 'python': sys.version.split()[0], 'platform': sys.platform},
+        'options': options,
+        'scenarios': {},
+    }
+    try:
+        for scenario in options['scenarios']:
+            print(f"Running {scenario}...", flush=True)
+            results['scenarios'][scenario] = run_scenario(api, scenario, options)
+    finally:
+        api.stop()
+    return results
+
+def report(results: Dict[str, Any]) -> str:
+    lines = []
+    for scenario, result in results['scenarios'].items():
+        if 'error' in result:
+            lines.append(f"{scenario}: FAILED ({result['error']})\n{result.get('stderr', '')}")
+            continue
+        lines.append(f"{scenario}  (wall {result['wall_s']}s, peak RSS {result['peak_rss_mb']} MB)")
+        for label, stats in result['timings'].items():
+            lines.append(f"  {label:<28} n={stats['count']:<5} p50 {stats['p50_ms']:>10.2f} ms   p99 {stats['p99_ms']:>10.2f} ms")
+        for phase, calls in result['upstream'].items():
+            rejected = f", {calls['rejected']} rejected" if calls['rejected'] else ''
+            lines.append(f"  upstream[{phase}] {calls['total']} calls{rejected} {calls['by_endpoint']}")
+        if 'throughput_rps' in result:
+            lines.append(f"  throughput {result['throughput_rps']} req/s")
+    return '\n'.join(lines)
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> Tuple[str, int]:
+    """
+    Lists p50/p99, upstream call and peak memory changes against baseline.
+
+    Returns:
+        The report and the number of regressions: latencies or memory more
+        than threshold (a fraction) above baseline, or more upstream calls.
+    """
+    lines = [f"Compared with {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')}):"]
+    regressions = 0
+
+    def line(name: str, before: float, after: float, unit: str, slack: float = 0.0):
+        nonlocal regressions
+        change = (after - before) / before if before else (0.0 if after == before else float('inf'))
+        worse = after > before * (1 + threshold) + slack
+        regressions += worse
+        lines.append(f"  {name:<44} {before:>10.2f} -> {after:>10.2f} {unit:<5} {change:+8.1%}{'  REGRESSION' if worse else ''}")
+
+    for scenario, result in current['scenarios'].items():
+        previous = baseline['scenarios'].get(scenario)
+        if not previous or 'error' in previous or 'error' in result:
+            continue
+        lines.append(scenario)
+        for label, stats in result['timings'].items():
+            if label in previous['timings']:
+                for key in ('p50_ms', 'p99_ms'):
+                    # Sub-millisecond noise is not a regression.
+                    line(f"{label} {key[:3]}", previous['timings'][label][key], stats[key], 'ms', slack=1.0)
+        for phase, calls in result['upstream'].items():
+            if phase in previous['upstream']:
+                before, after = previous['upstream'][phase]['total'], calls['total']
+                line(f"upstream[{phase}]", before, after, 'calls', slack=0.0 if before else 0.5)
+        if result.get('peak_rss_mb') and previous.get('peak_rss_mb'):
+            line('peak RSS', previous['peak_rss_mb'], result['peak_rss_mb'], 'MB')
+    return '\n'.join(lines), regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite against the stand-in MLB Stats API.')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--fixtures', default='synthetic', help="A directory written by benchmarks.record, or 'synthetic'.")
+    parser.add_argument('--seed', type=int, default=7, help='Seed of the synthetic league.')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Stand-in response latency.')
+    parser.add_argument('--jitter-ms', type=float, default=25.0, help='Extra random stand-in latency, up to this much.')
+    parser.add_argument('--rate-limit', type=int, default=80,
+                        help='Calls per minute allowed by the stand-in, also used as the app budget; 0 for no limit.')
+    parser.add_argument('--max-games', type=int, default=0, help="Only use this many of today's matchups; 0 for all.")
+    parser.add_argument('--iterations', type=int, default=5, help='Passes over the slate in the warm scenarios.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clients in the concurrent scenario.')
+    parser.add_argument('--micro-repeats', type=int, default=200, help='Repetitions of each aggregation micro-benchmark.')
+    parser.add_argument('--output', help='Where to write the results; defaults to benchmarks/results/<time>-<commit>.json.')
+    parser.add_argument('--compare', metavar='BASELINE', help='An earlier results file to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative slowdown counted as a regression.')
+    parser.add_argument('--fail-on-regression', action='store_true', help='Exit with status 1 if --compare finds a regression.')
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--options', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child, json.loads(args.options))
+        return 0
+
+    options = {
+        'scenarios': args.scenarios, 'fixtures': args.fixtures, 'seed': args.seed,
+        'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms, 'rate_limit': args.rate_limit,
+        'max_games': args.max_games, 'iterations': args.iterations, 'concurrency': args.concurrency,
+        'micro_repeats': args.micro_repeats,
+    }
+    results = run_suite(options)
+    print(report(results))
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        commit = results['meta']['commit'] or 'nogit'
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{commit}{'-dirty' if results['meta']['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    failed = any('error' in result for result in results['scenarios'].values())
+    if args.compare:
+        with open(args.compare) as f:
+            text, regressions = compare(json.load(f), results, args.threshold)
+        print(text)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# benchmarks/stand_in_api.py
+
+"""
+A local stand-in for the MLB Stats API.
+
+Serves the endpoints the app calls (schedule, teams, rosters, per-player and
+batched game logs) from a Fixtures set over HTTP/1.1 keep-alive. Each response
+is delayed by a configurable latency. A token bucket rejects calls over the
+rate limit with 429, the way the real API would throttle a misbehaving
+client.
+
+Calls are counted per endpoint, and the counts are served as JSON from
+/__stand_in__/counts, so benchmarks can read them from another process.
+
+Point the app at it with MLB_API_BASE, e.g. for a load test against gunicorn:
+
+    python -m benchmarks.stand_in_api --port 8099 --latency-ms 80
+    MLB_API_BASE=http://127.0.0.1:8099/api/v1 gunicorn app:app
+"""
+import re
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from benchmarks.fixtures import Fixtures, load_fixtures
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/v1'
+COUNTS_PATH = '/__stand_in__/counts'
+
+def endpoint_label(path: str) -> str:
+    """The path with ids replaced, e.g. '/teams/{id}/roster'."""
+    return re.sub(r'/\d+(?=/|$)', '/{id}', path)
+
+class StandInAPI:
+    """
+    The stand-in server, run on a background thread.
+
+    Args:
+        fixtures: The data to serve.
+        latency: Seconds added to every response.
+        jitter: Up to this many extra seconds, uniformly random, per response.
+        rate_limit: Calls allowed per minute (with an equal burst); None for no limit.
+    """
+    def __init__(self, fixtures: Fixtures, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.05, jitter: float = 0.025, rate_limit: Optional[int] = None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.calls: Counter = Counter()
+        self.rejected = 0
+        self.bytes_sent = 0
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """The value to use for MLB_API_BASE."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> 'StandInAPI':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stand-in-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def counts(self) -> Dict[str, Any]:
+        """Calls served so far: the total, per endpoint, rejected by the rate limit, and bytes sent."""
+        with self._lock:
+            return {'total': sum(self.calls.values()), 'by_endpoint': dict(self.calls),
+                    'rejected': self.rejected, 'bytes': self.bytes_sent}
+
+    def reset(self):
+        """Clears the counts and refills the rate-limit bucket."""
+        with self._lock:
+            self.calls.clear()
+            self.rejected = 0
+            self.bytes_sent = 0
+            self._tokens = float(self.rate_limit or 0)
+            self._refilled = time.monotonic()
+
+    def _admit(self) -> bool:
+        """Takes a rate-limit token; False if the bucket is empty."""
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(self.rate_limit), self._tokens + (now - self._refilled) * self.rate_limit / 60.0)
+            self._refilled = now
+            if self._tokens < 1.0:
+                self.rejected += 1
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def respond(self, path: str, params: Dict[str, str]) -> Tuple[int, Any]:
+        """Returns the (status, JSON payload) for an API path and its query parameters."""
+        fixtures = self.fixtures
+        if path == '/schedule':
+            team_id = int(params['teamId']) if 'teamId' in params else None
+            if 'date' in params:
+                return 200, fixtures.schedule(params['date'], params['date'], team_id)
+            return 200, fixtures.schedule(params.get('startDate'), params.get('endDate'), team_id)
+
+        match = re.fullmatch(r'/teams/(\d+)(/roster)?', path)
+        if match:
+            team_id = int(match.group(1))
+            payload = fixtures.roster(team_id) if match.group(2) else fixtures.team(team_id)
+            return (200, payload) if payload is not None else (404, {'message': f"Team {team_id} not found"})
+
+        match = re.fullmatch(r'/people/(\d+)/stats', path)
+        if match:
+            splits = fixtures.game_log_splits(int(match.group(1)), params.get('group', 'hitting'),
+                                              params.get('startDate'), params.get('endDate'))
+            return 200, {'stats': [{'type': {'displayName': 'gameLog'}, 'group': {'displayName': params.get('group')},
+                                    'splits': splits}]}
+
+        if path == '/people':
+            # hydrate=stats(group=[hitting],type=[gameLog],season=2025,startDate=...,endDate=...)
+            hydrate = params.get('hydrate', '')
+            group = re.search(r'group=\[(\w+)\]', hydrate)
+            group = group.group(1) if group else 'hitting'
+            start = re.search(r'startDate=([\d-]+)', hydrate)
+            end = re.search(r'endDate=([\d-]+)', hydrate)
+            people = []
+            for player_id in params.get('personIds', '').split(','):
+                if not player_id.isdigit():
+                    continue
+                splits = fixtures.game_log_splits(int(player_id), group, start and start.group(1), end and end.group(1))
+                people.append({'id': int(player_id), 'stats': [
+                    {'type': {'displayName': 'gameLog'}, 'group': {'displayName': group}, 'splits': splits}]})
+            return 200, {'people': people}
+
+        return 404, {'message': f"No stand-in for {path}"}
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+                return len(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == COUNTS_PATH:
+                    self._send(200, api.counts())
+                    return
+                if not url.path.startswith(API_PREFIX):
+                    self._send(404, {'message': 'Not found'})
+                    return
+                path = url.path[len(API_PREFIX):]
+                if not api._admit():
+                    self._send(429, {'message': 'Too many requests'}, {'Retry-After': '1'})
+                    return
+                time.sleep(api.latency + random.uniform(0, api.jitter))
+                try:
+                    status, payload = api.respond(path, {key: values[-1] for key, values in parse_qs(url.query).items()})
+                except Exception as e:
+                    logger.error(f"Stand-in failed on {self.path}: {e}", exc_info=True)
+                    status, payload = 500, {'message': str(e)}
+                with api._lock:
+                    # Counted before sending, so a client that has its response sees it counted.
+                    api.calls[endpoint_label(path)] += 1
+                sent = self._send(status, payload)
+                with api._lock:
+                    api.bytes_sent += sent
+
+        return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the stand-in MLB Stats API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--fixtures', default='synthetic', help="A directory written by benchmarks.record, or 'synthetic'.")
+    parser.add_argument('--seed', type=int, default=7, help='Seed of the synthetic league.')
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=25.0)
+    parser.add_argument('--rate-limit', type=int, default=0, help='Calls per minute; 0 for no limit.')
+    args = parser.parse_args(argv)
+
+    api = StandInAPI(load_fixtures(args.fixtures, seed=args.seed), host=args.host, port=args.port,
+                     latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, rate_limit=args.rate_limit or None)
+    print(f"Stand-in MLB Stats API at {api.base_url} (counts at {COUNTS_PATH})", flush=True)
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api._server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+# caching.py
+
+"""
+Helpers layered on top of the Flask-Caching memoize entries.
+
+Contains the single-flight lock that coalesces concurrent cache misses for the
+same memoized call into one upstream fetch, both across threads and across
+gunicorn workers on the same host, and the stale-while-revalidate cache that
+serves expired-but-usable entries while refreshing them in the background.
+"""
+import os
+import time
+import hashlib
+import logging
+import functools
+import threading
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Iterable, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process coalescing only
+    fcntl = None
+
+from extensions import cache
+from metrics import metrics
+from profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+def memoize_key(memoized_func, *args, **kwargs) -> str:
+    """Returns the cache key cache.memoize() would use for this call."""
+    return memoized_func.make_cache_key(memoized_func.uncached, *args, **kwargs)
+
+class SingleFlight:
+    """
+    Per-key locks so only one caller fetches a missing cache entry at a time.
+
+    Threads in a process wait on an in-memory lock per key. Processes on the
+    same host additionally take an flock on one of a fixed set of striped lock
+    files kept next to CACHE_DIR. If a lock can't be acquired within the
+    timeout the caller proceeds without it rather than failing the request.
+    """
+    def __init__(self, lock_dir: Optional[str] = None, stripes: int = 1024, timeout: float = 30.0):
+        self.lock_dir = lock_dir
+        self.stripes = stripes
+        self.timeout = timeout
+        self._locks: Dict[str, List] = {}  # key -> [lock, number of holders/waiters]
+        self._stripes: Dict[int, Dict[str, Any]] = {}  # stripe -> flocked file, holders, ready event
+        self._guard = threading.Lock()
+
+    def init_app(self, app):
+        """Places lock files next to the cache directory and reads the timeout."""
+        cache_dir = app.config.get('CACHE_DIR')
+        if cache_dir:
+            self.lock_dir = f"{cache_dir.rstrip(os.sep)}-locks"
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self.timeout = app.config.get('SINGLE_FLIGHT_TIMEOUT', self.timeout)
+
+    def _stripe(self, key: str) -> int:
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest(), 16) % self.stripes
+
+    @contextmanager
+    def _thread_lock(self, key: str, deadline: float):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(timeout=max(0.0, deadline - time.monotonic()))
+        try:
+            yield
+        finally:
+            if acquired:
+                entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def _flock(self, stripe: int, deadline: float):
+        """Opens and flocks a stripe's lock file; None if the deadline passes first."""
+        lock_file = open(os.path.join(self.lock_dir, f"{stripe}.lock"), 'a+')
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return lock_file
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Timed out waiting for cache lock stripe {stripe}; fetching without it.")
+                    lock_file.close()
+                    return None
+                time.sleep(0.05)
+
+    @contextmanager
+    def _file_lock(self, stripe: int, deadline: float):
+        if fcntl is None or not self.lock_dir:
+            yield
+            return
+        # A stripe already flocked by this process is shared rather than locked
+        # again: flock conflicts between open files even within one process, so
+        # a pool task could otherwise wait on a stripe held by the request that
+        # is waiting for it. Same-key exclusion in-process comes from the thread locks.
+        # The first thread registers the stripe before flocking it, and later ones
+        # wait for that flock instead of taking their own.
+        with self._guard:
+            entry = self._stripes.get(stripe)
+            opener = entry is None
+            if opener:
+                entry = self._stripes[stripe] = {'file': None, 'holders': 0, 'ready': threading.Event()}
+            entry['holders'] += 1
+        if opener:
+            entry['file'] = self._flock(stripe, deadline)
+            if entry['file'] is None:
+                with self._guard:
+                    del self._stripes[stripe]  # callers arriving later try the flock again
+            entry['ready'].set()
+        elif not entry['ready'].wait(timeout=max(0.0, deadline - time.monotonic())):
+            logger.warning(f"Timed out waiting for cache lock stripe {stripe}; fetching without it.")
+        try:
+            yield
+        finally:
+            with self._guard:
+                entry['holders'] -= 1
+                if entry['holders'] == 0 and self._stripes.get(stripe) is entry:
+                    del self._stripes[stripe]
+                    fcntl.flock(entry['file'].fileno(), fcntl.LOCK_UN)
+                    entry['file'].close()
+
+    @contextmanager
+    def lock_many(self, keys: Iterable[str]):
+        """
+        Holds the locks for several keys at once.
+
+        Thread locks are taken in key order and file locks in stripe order, so
+        overlapping callers can't deadlock each other.
+        """
+        keys = sorted(set(keys))
+        deadline = time.monotonic() + self.timeout
+        with ExitStack() as stack:
+            for key in keys:
+                stack.enter_context(self._thread_lock(key, deadline))
+            for stripe in sorted({self._stripe(key) for key in keys}):
+                stack.enter_context(self._file_lock(stripe, deadline))
+            yield
+
+    def lock(self, key: str):
+        """Holds the lock for a single key."""
+        return self.lock_many([key])
+
+single_flight = SingleFlight()
+
+class CacheEntry:
+    """A cached value together with the time it was stored."""
+    __slots__ = ('value', 'stored_at')
+
+    def __init__(self, value: Any, stored_at: Optional[float] = None):
+        self.value = value
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+class StaleWhileRevalidateCache:
+    """
+    Freshness-aware memoization over the shared cache.
+
+    Each entry has a soft TTL and a hard TTL. Within the soft TTL it is
+    served as-is. Past the soft TTL the stale value is still returned
+    immediately while a background worker refreshes it. Only a missing or
+    hard-expired entry makes the caller wait for the upstream fetch, and
+    concurrent waiters are coalesced through single_flight.
+
+    mark_all_stale() makes every entry stored before now stale at once,
+    which replaces wiping the cache on the daily rollover.
+
+    A memoized function that falls back to a placeholder or older copy
+    because upstream failed calls mark_degraded(). Its result is then not
+    stored over the cached value, which keeps being served as the last known
+    good one; with nothing cached it is stored for only negative_timeout
+    seconds, so the next fetch is soon tried again.
+    """
+    EPOCH_KEY = 'swr:stale_before'
+
+    def __init__(self, max_workers: int = 4, epoch_check_interval: float = 30.0, negative_timeout: int = 60,
+                 clock: Callable[[], float] = time.time):
+        self.max_workers = max_workers
+        self.epoch_check_interval = epoch_check_interval
+        self.negative_timeout = negative_timeout
+        self.clock = clock  # wall clock: store times are compared across processes
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._refreshing: Set[Any] = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._epoch = 0.0
+        self._epoch_checked_at = 0.0
+
+    def init_app(self, app):
+        """Reads the number of background refresh workers and the negative-cache TTL from the app config."""
+        self.max_workers = app.config.get('SWR_REFRESH_WORKERS', self.max_workers)
+        self.negative_timeout = app.config.get('NEGATIVE_CACHE_TIMEOUT', self.negative_timeout)
+
+    @property
+    def revalidating(self) -> bool:
+        """True while the current thread is running a background refresh."""
+        return getattr(self._local, 'revalidating', False)
+
+    @property
+    def stale_reads(self) -> int:
+        """Number of stale values served to the current thread so far."""
+        return getattr(self._local, 'stale_reads', 0)
+
+    def add_stale_reads(self, count: int):
+        """Credits stale values read on this thread's behalf, e.g. by pool workers."""
+        self._local.stale_reads = self.stale_reads + count
+
+    @property
+    def degraded_reads(self) -> int:
+        """Number of fallback values produced on the current thread so far."""
+        return getattr(self._local, 'degraded_reads', 0)
+
+    def mark_degraded(self):
+        """
+        Flags the value being computed on this thread as a fallback for a
+        failed upstream call. It also counts as a stale read, so views built
+        from it are stored stale and rebuilt once upstream is back.
+        """
+        self._local.degraded_reads = self.degraded_reads + 1
+        self.add_stale_reads(1)
+
+    def record_lookups(self, function: str, fresh: int = 0, stale: int = 0, miss: int = 0):
+        """Counts lookups of a memoized function's entries, including ones done in batch."""
+        for result, count in (('fresh', fresh), ('stale', stale), ('miss', miss)):
+            if count:
+                metrics.inc('mlb_cache_lookups_total', {'function': function, 'result': result}, count)
+                profiler.count(f"cache.{result}", count)
+
+    @contextmanager
+    def revalidation(self):
+        """Treats stale entries as misses in this thread, e.g. while warming the cache."""
+        previous = self.revalidating
+        self._local.revalidating = True
+        try:
+            yield
+        finally:
+            self._local.revalidating = previous
+
+    def _stale_before(self) -> float:
+        # The epoch is shared through the cache; re-read it at most every few seconds.
+        now = time.monotonic()
+        if now - self._epoch_checked_at > self.epoch_check_interval:
+            self._epoch = cache.get(self.EPOCH_KEY) or 0.0
+            self._epoch_checked_at = now
+        return self._epoch
+
+    def mark_all_stale(self, before: Optional[float] = None):
+        """
+        Makes every entry stored up to now stale, without deleting anything.
+
+        Args:
+            before: An earlier time to draw the line at instead, keeping
+                entries stored since then fresh, e.g. ones prefetched overnight.
+        """
+        now = self.clock()
+        self._epoch = now if before is None else min(before, now)
+        self._epoch_checked_at = time.monotonic()
+        cache.set(self.EPOCH_KEY, self._epoch, timeout=0)
+
+    def get(self, key: str, validate: Optional[Callable[[Any], bool]] = None) -> Optional[CacheEntry]:
+        """
+        Returns the entry stored under key, or None if it is missing or hard-expired.
+
+        Args:
+            validate: Optional check on the stored value, e.g. its schema
+                version. Values failing it are treated as missing.
+        """
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if not isinstance(entry, CacheEntry):
+            # Written before entries carried a timestamp; usable but stale.
+            entry = CacheEntry(entry, stored_at=0.0)
+        if validate is not None and not validate(entry.value):
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, stale: bool = False):
+        """
+        Stores value under key; timeout is the hard TTL. With stale=True the
+        entry is stored already stale, so its next read triggers a refresh.
+        """
+        cache.set(key, CacheEntry(value, stored_at=0.0 if stale else self.clock()), timeout=timeout)
+
+    def mark_stale(self, key: str, timeout: Optional[int] = None):
+        """Re-stores the entry under key as stale, so its next read triggers a refresh."""
+        entry = self.get(key)
+        if entry is not None:
+            self.set(key, entry.value, timeout=timeout, stale=True)
+
+    def is_fresh(self, entry: CacheEntry, soft_timeout: Optional[int]) -> bool:
+        """Whether entry is within its soft TTL and newer than the last mark_all_stale()."""
+        return self.is_fresh_at(entry.stored_at, soft_timeout)
+
+    def is_fresh_at(self, stored_at: float, soft_timeout: Optional[int]) -> bool:
+        """Whether data stored at the given time would still be fresh."""
+        if stored_at < self._stale_before():
+            return False
+        return soft_timeout is None or self.clock() - stored_at < soft_timeout
+
+    def refresh_in_background(self, task_key: Any, func: Callable, *args, **kwargs):
+        """
+        Runs func on a background worker unless a refresh for task_key is
+        already queued in this process. Inside func, stale entries are treated
+        as misses so the refresh pulls fresh data through its dependencies.
+        """
+        self.add_stale_reads(1)
+        with self._lock:
+            if task_key in self._refreshing:
+                return
+            self._refreshing.add(task_key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='swr-refresh')
+        self._executor.submit(self._run_refresh, task_key, func, args, kwargs)
+
+    def _run_refresh(self, task_key: Any, func: Callable, args, kwargs):
+        try:
+            with self.revalidation():
+                func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background refresh failed for {task_key}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(task_key)
+
+    def memoize(self, soft_timeout: Optional[int] = None, timeout: Optional[int] = None,
+                validate: Optional[Callable[[Any], bool]] = None):
+        """
+        Decorator memoizing a function with stale-while-revalidate semantics.
+
+        Keys are the ones cache.memoize() would produce, so memoize_key() and
+        cache.delete_memoized() keep working on the decorated function.
+
+        Args:
+            soft_timeout: Seconds an entry is served without a refresh.
+                None means it only goes stale through mark_all_stale().
+            timeout: Hard TTL in seconds; None uses CACHE_DEFAULT_TIMEOUT.
+            validate: Optional check on cached values; values failing it
+                (e.g. an outdated schema) are re-fetched as misses.
+        """
+        def decorator(f):
+            # Borrow Flask-Caching's key scheme (make_cache_key, uncached, ...).
+            memoized_func = cache.memoize(timeout=timeout)(f)
+            # Keys are hashed, so lookups are labelled by function here.
+            name = f.__name__
+
+            @functools.wraps(memoized_func)
+            def wrapper(*args, **kwargs):
+                key = memoize_key(memoized_func, *args, **kwargs)
+                entry = self.get(key, validate)
+                if entry is not None:
+                    if self.is_fresh(entry, soft_timeout):
+                        self.record_lookups(name, fresh=1)
+                        return entry.value
+                    if not self.revalidating:
+                        self.record_lookups(name, stale=1)
+                        self.refresh_in_background(key, wrapper, *args, **kwargs)
+                        return entry.value
+                self.record_lookups(name, miss=1)
+                with single_flight.lock(key):
+                    # Another caller may have refreshed it while we waited.
+                    entry = self.get(key, validate)
+                    if entry is not None and self.is_fresh(entry, soft_timeout):
+                        return entry.value
+                    degraded_reads = self.degraded_reads
+                    with profiler.span('cache_fill', function=name):
+                        rv = f(*args, **kwargs)
+                    if self.degraded_reads > degraded_reads:
+                        if entry is not None:
+                            logger.warning(f"Upstream failed for {name}; serving its last known good value.")
+                            return entry.value
+                        if rv is not None:
+                            self.set(key, rv, timeout=self.negative_timeout)
+                        return rv
+                    if rv is not None:
+                        self.set(key, rv, timeout=timeout)
+                    return rv
+
+            wrapper.soft_timeout = soft_timeout
+            wrapper.cache_timeout = timeout
+            wrapper.validate = validate
+            return wrapper
+        return decorator
+
+swr_cache = StaleWhileRevalidateCache()
+
+def _cache_tier_samples():
+    """Per-tier counters of the two-tier backend, when it is the one configured."""
+    backend = getattr(cache, 'cache', None)
+    if not hasattr(backend, 'stats'):
+        return []
+    stats = backend.stats()
+    tiers = {'l2': stats['l2']} if stats['l1'] is None else {'l1': stats['l1'], 'l2': stats['l2']}
+    samples = [('mlb_cache_tier_lookups_total', {'tier': tier, 'result': result}, counters[counter])
+               for tier, counters in tiers.items() for result, counter in (('hit', 'hits'), ('miss', 'misses'))]
+    if stats['l1'] is not None:
+        samples += [('mlb_cache_l1_evictions_total', {}, stats['l1']['evictions']),
+                    ('mlb_cache_l1_bytes', {}, stats['l1']['bytes']),
+                    ('mlb_cache_l1_entries', {}, stats['l1']['entries'])]
+    return samples
+
+metrics.register_collector(_cache_tier_samples)
@@ -5,6 +5,8 @@ Configuration settings for the MLB Stats Tracker application.
 """
 import os
 
+basedir = os.path.abspath(os.path.dirname(__file__))
+
 class Config:
     """Base configuration class."""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'a-super-secret-key-that-you-should-change')
@@ -12,9 +14,88 @@ class Config:
     TEMPLATES_AUTO_RELOAD = True
     
     # Flask-Caching settings
-    CACHE_TYPE = 'FileSystemCache'
-    CACHE_DIR = '/tmp/mlb-cache'
+    # FileSystemCache shared by all workers, fronted by a per-process in-memory LRU (see tiered_cache.py)
+    CACHE_TYPE = 'tiered_cache.TwoTierFileSystemCache'
+    CACHE_DIR = os.environ.get('CACHE_DIR', '/tmp/mlb-cache')
     CACHE_DEFAULT_TIMEOUT = 86400  
+    # Entries kept before FileSystemCache starts deleting the oldest on every write. A day's slate
+    # needs well over a thousand (two per player plus views), so the library default of 500 thrashes.
+    CACHE_THRESHOLD = int(os.environ.get('CACHE_THRESHOLD', 20000))
+    CACHE_L1_MAX_BYTES = int(os.environ.get('CACHE_L1_MAX_BYTES', 64 * 1024 * 1024))  # 0 disables the L1
+    CACHE_L1_TTL = float(os.environ.get('CACHE_L1_TTL', 300))
+    # Max seconds a caller waits on another's in-flight fetch of the same key
+    SINGLE_FLIGHT_TIMEOUT = 30
+    # Background workers refreshing stale cache entries
+    SWR_REFRESH_WORKERS = 4
+
+    # Background tasks: one elected process per host warms the cache and runs the daily refresh
+    RUN_BACKGROUND_TASKS = os.environ.get('RUN_BACKGROUND_TASKS', 'true').lower() == 'true'
+    WARMUP_MAX_WORKERS = int(os.environ.get('WARMUP_MAX_WORKERS', 8))
+    # Seconds between polls of today's schedule for games going Final
+    GAME_STATUS_POLL_INTERVAL = int(os.environ.get('GAME_STATUS_POLL_INTERVAL', 120))
+    # Prefetch the next day's slate with spare rate-limit budget once the day's games are over
+    PREFETCH_NEXT_SLATE = os.environ.get('PREFETCH_NEXT_SLATE', 'true').lower() == 'true'
+    PREFETCH_INTERVAL = int(os.environ.get('PREFETCH_INTERVAL', 600))  # seconds between prefetch passes
+    # Days a session's favorite teams count towards the prefetch order after it was last seen
+    FAVORITES_WINDOW_DAYS = int(os.environ.get('FAVORITES_WINDOW_DAYS', 30))
+
+    # Shared page-building pool: max fetch threads per process and seconds a page build may take
+    FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', 16))
+    FETCH_DEADLINE = float(os.environ.get('FETCH_DEADLINE', 20))
+    # Stream cold details pages piece by piece instead of rendering them once everything is fetched
+    STREAM_DETAILS_PAGE = os.environ.get('STREAM_DETAILS_PAGE', 'true').lower() == 'true'
+
+    # Prometheus metrics: each worker writes a snapshot here (default: next to CACHE_DIR) that /metrics merges
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 10))
+    # Seconds an exited worker's counters are still reported
+    METRICS_RETENTION = float(os.environ.get('METRICS_RETENTION', 3600))
+    # Scrapes of /metrics must carry this as a bearer token; unset allows them only in debug
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Per-request profiling (?profile=...): requests must carry this token; unset allows it only in debug
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILE_TTL = int(os.environ.get('PROFILE_TTL', 3600))  # seconds a stored profile is kept
+    PROFILE_CPROFILE_TOP = 25  # functions listed by ?profile=cprofile
+
+    # Persistent SQLite stats store shared by all workers; point it at a volume to survive redeploys
+    STATS_DB_PATH = os.environ.get('STATS_DB_PATH', os.path.join(basedir, 'instance', 'mlb_stats.db'))
+    # Dataset snapshot loaded into the stats store at startup and re-exported after each warmup
+    SNAPSHOT_PATH = os.environ.get('SNAPSHOT_PATH')
+    # Seconds after which a snapshot is stale and loaded without team info and rosters
+    SNAPSHOT_MAX_AGE = float(os.environ.get('SNAPSHOT_MAX_AGE', 2 * 86400))
+
+    # Leaderboard qualifiers: plate appearances per game for hitters, innings per appearance for pitchers
+    LEADERBOARD_MIN_PA_PER_GAME = float(os.environ.get('LEADERBOARD_MIN_PA_PER_GAME', 3.1))
+    LEADERBOARD_MIN_IP_PER_APPEARANCE = float(os.environ.get('LEADERBOARD_MIN_IP_PER_APPEARANCE', 2.0))
+    # Leaders shown by default, and the most a request may ask for
+    LEADERBOARD_SIZE = 10
+    LEADERBOARD_MAX_SIZE = 100
+    # Warmup also syncs every team's roster and game logs, so the leaderboards cover the whole league
+    LEADERBOARD_LEAGUE_WIDE = os.environ.get('LEADERBOARD_LEAGUE_WIDE', 'true').lower() == 'true'
+
+    # MLB API transport settings
+    MLB_API_POOL_CONNECTIONS = 4  # number of per-host pools kept
+    # Max connections per host. Callers past it wait for a free one, so by default there is one for every
+    # pool thread of a process that may call upstream at once: page builds, background refreshes and warmup.
+    MLB_API_POOL_MAXSIZE = int(os.environ.get('MLB_API_POOL_MAXSIZE',
+                                              FETCH_MAX_WORKERS + SWR_REFRESH_WORKERS + WARMUP_MAX_WORKERS))
+    MLB_API_CONNECT_TIMEOUT = float(os.environ.get('MLB_API_CONNECT_TIMEOUT', 3.05))
+    MLB_API_READ_TIMEOUT = float(os.environ.get('MLB_API_READ_TIMEOUT', 10))
+    # Retries of transient failures (connection errors, timeouts, 429, 5xx): attempts, base backoff
+    # in seconds, and the total seconds a call may take including retries
+    MLB_API_MAX_RETRIES = int(os.environ.get('MLB_API_MAX_RETRIES', 2))
+    MLB_API_RETRY_BACKOFF = 0.25
+    MLB_API_RETRY_BUDGET = float(os.environ.get('MLB_API_RETRY_BUDGET', 4))
+    # Per-endpoint circuit breaker: consecutive failures that open it, seconds before a probe call
+    MLB_API_BREAKER_THRESHOLD = int(os.environ.get('MLB_API_BREAKER_THRESHOLD', 5))
+    MLB_API_BREAKER_COOLDOWN = float(os.environ.get('MLB_API_BREAKER_COOLDOWN', 30))
+    # Seconds a fallback result is cached when upstream failed and there was no earlier value
+    NEGATIVE_CACHE_TIMEOUT = int(os.environ.get('NEGATIVE_CACHE_TIMEOUT', 60))
+    # MLB API rate limit: calls per window (seconds). When shared, all workers on the host draw from one budget.
+    MLB_API_RATE_LIMIT = int(os.environ.get('MLB_API_RATE_LIMIT', 80))
+    MLB_API_RATE_WINDOW = 60
+    MLB_API_SHARED_RATE_LIMIT = os.environ.get('MLB_API_SHARED_RATE_LIMIT', 'true').lower() == 'true'
 
 class DevelopmentConfig(Config):
     """Development configuration."""
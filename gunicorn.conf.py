@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+
+"""
+Gunicorn settings, picked up automatically by `gunicorn app:app`.
+
+Each worker starts the background tasks once its app is loaded; the workers
+then elect a single leader per host to actually run them.
+"""
+import os
+
+# Threaded workers: a cold details page streams for as long as its build
+# takes, and on a sync worker it would hold the only request slot and could
+# run into the worker timeout. gthread workers keep heartbeating from their
+# main thread and serve other requests on the remaining threads meanwhile.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+def post_worker_init(worker):
+    from tasks import start_background_tasks
+    start_background_tasks(worker.wsgi)
@@ -0,0 +1,197 @@
+# leaderboards.py
+
+"""
+League-wide rolling leaderboards, served from an index kept in the stats store.
+
+Whenever a player's game logs are synced, MLBStatsAPI hands the rebuilt stat
+columns to leaderboard_index.update, which computes the player's rolling
+windows (the details page's HITTER_PERIODS and PITCHER_PERIODS) once and
+writes them to the store: one formatted stat line per window and one
+leaderboard entry per ranked stat, flagged with whether the window meets its
+qualifier. A leaderboard is then read by walking the store's ordered
+(stat, period, qualified, value) index from the best end and stopping after
+`limit` rows, so a request costs the same whether 50 or 1,500 players are
+indexed, and the index is shared by every gunicorn worker.
+
+Ranked stats are AVG, OBP, SLG and HR for hitters and ERA, WHIP and K for
+pitchers. A hitter qualifies for a window with LEADERBOARD_MIN_PA_PER_GAME
+plate appearances (AB + BB) per game in it; a pitcher with
+LEADERBOARD_MIN_IP_PER_APPEARANCE innings per appearance. A season-to-date
+window has no fixed game count, so there the rate is applied to the games
+the player actually appeared in.
+
+The index covers every player whose logs the app has synced. With
+LEADERBOARD_LEAGUE_WIDE the cache warmup also syncs every team's active
+roster, not just the teams on today's slate. The whole index is rebuilt from
+the stored game logs when it has never been built for the season under the
+current qualifiers, and after a snapshot brings in new logs.
+"""
+import math
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from aggregation import StatWindows, format_player_stats, hitting_rates, pitching_rates
+from stat_columns import HITTER_PERIODS, PITCHER_PERIODS, GameLog, PlayerStatColumns
+from store import StatsStore, stats_store
+
+logger = logging.getLogger(__name__)
+
+# Ranked stats: stat -> (stat group, whether higher is better).
+LEADERBOARD_STATS: Dict[str, Tuple[str, bool]] = {
+    'avg': ('hitting', True), 'obp': ('hitting', True), 'slg': ('hitting', True), 'hr': ('hitting', True),
+    'era': ('pitching', False), 'whip': ('pitching', False), 'k': ('pitching', True),
+}
+
+def periods_for(stat_group: str) -> Dict[str, Optional[int]]:
+    """The rolling windows of a stat group."""
+    return HITTER_PERIODS if stat_group == 'hitting' else PITCHER_PERIODS
+
+class LeaderboardIndex:
+    """
+    Maintains the leaderboard tables of a StatsStore and reads leaders from them.
+
+    Args:
+        store: The stats store holding the index.
+        min_pa_per_game: Plate appearances per game a hitter needs to qualify for a window.
+        min_ip_per_appearance: Innings per appearance a pitcher needs to qualify for a window.
+        size: Leaders returned when no limit is given.
+        max_size: The largest limit allowed.
+    """
+    def __init__(self, store: StatsStore = stats_store, min_pa_per_game: float = 3.1,
+                 min_ip_per_appearance: float = 2.0, size: int = 10, max_size: int = 100):
+        self.store = store
+        self.min_pa_per_game = min_pa_per_game
+        self.min_ip_per_appearance = min_ip_per_appearance
+        self.size = size
+        self.max_size = max_size
+
+    def init_app(self, app):
+        """Reads the qualifiers and leaderboard sizes from the app config."""
+        self.min_pa_per_game = app.config.get('LEADERBOARD_MIN_PA_PER_GAME', self.min_pa_per_game)
+        self.min_ip_per_appearance = app.config.get('LEADERBOARD_MIN_IP_PER_APPEARANCE', self.min_ip_per_appearance)
+        self.size = app.config.get('LEADERBOARD_SIZE', self.size)
+        self.max_size = app.config.get('LEADERBOARD_MAX_SIZE', self.max_size)
+
+    def qualifier(self, stat_group: str, period: str) -> Dict[str, Any]:
+        """
+        The minimum plate appearances or innings for a window, as served with
+        its leaderboard. Season-to-date windows serve the per-game rate instead.
+        """
+        num_games = periods_for(stat_group)[period]
+        if num_games is None:
+            if stat_group == 'hitting':
+                return {'min_pa_per_game': self.min_pa_per_game}
+            return {'min_ip_per_appearance': self.min_ip_per_appearance}
+        if stat_group == 'hitting':
+            return {'min_pa': math.ceil(self.min_pa_per_game * num_games)}
+        return {'min_ip': round(self.min_ip_per_appearance * num_games, 1)}
+
+    def _minimum(self, stat_group: str, period: str, games: int) -> int:
+        """The plate appearances or outs a window of `games` games needs to qualify."""
+        num_games = periods_for(stat_group)[period]
+        if num_games is None:
+            num_games = games
+        if stat_group == 'hitting':
+            return math.ceil(self.min_pa_per_game * num_games)
+        return math.ceil(3 * round(self.min_ip_per_appearance * num_games, 1))
+
+    # Maintenance
+
+    def update(self, player_id: int, stat_group: str, season: int, columns: PlayerStatColumns,
+               team_id: Optional[int] = None):
+        """
+        Recomputes one player's windows and leaderboard entries from their stat columns.
+
+        Args:
+            team_id: The team of the player's latest game, shown with their
+                lines; None falls back to the rosters they are stored on.
+        """
+        if not self.store.enabled:
+            return
+        periods = periods_for(stat_group)
+        windows = StatWindows(stat_group, [columns], periods)
+        lines = format_player_stats(windows)[0]
+        games = windows.games[0].tolist()
+        if stat_group == 'hitting':
+            rates = hitting_rates(windows.stat('h'), windows.stat('ab'), windows.stat('bb'), windows.stat('tb'))
+            values = {'avg': rates['avg'], 'obp': rates['obp'], 'slg': rates['slg'], 'hr': windows.stat('hr')}
+            sample = (windows.stat('ab') + windows.stat('bb'))[0].tolist()
+        else:
+            rates = pitching_rates(windows.stat('outs'), windows.stat('er'), windows.stat('bb'), windows.stat('h'))
+            values = {'era': rates['era'], 'whip': rates['whip'], 'k': windows.stat('k')}
+            sample = windows.stat('outs')[0].tolist()
+
+        window_rows = {}
+        entries = {}
+        for j, period in enumerate(periods):
+            window_rows[period] = (games[j], lines[period]) if games[j] else None
+            qualified = sample[j] >= self._minimum(stat_group, period, games[j])
+            for stat, by_period in values.items():
+                entries[(stat, period)] = (float(by_period[0][j]), qualified) if games[j] else None
+        self.store.put_player_windows(season, stat_group, player_id, team_id, window_rows, entries)
+
+    def _marker(self, season: int) -> str:
+        """The fetch_log resource recording a full build of the season's index under the current qualifiers."""
+        return f"leaderboards:{season}:pa={self.min_pa_per_game}:ip={self.min_ip_per_appearance}"
+
+    def rebuild(self, season: Optional[int] = None) -> int:
+        """
+        Re-indexes every player with a stored season log.
+
+        Returns:
+            The number of player logs indexed.
+        """
+        if season is None:
+            season = datetime.now().year
+        if not self.store.enabled:
+            return 0
+        players = self.store.game_log_players(season)
+        for player_id, stat_group in players:
+            games = self.store.get_game_logs(player_id, stat_group, season)
+            if games is None:
+                continue
+            team_id = games[0].get('team', {}).get('id') if games else None
+            self.update(player_id, stat_group, season, PlayerStatColumns(stat_group, GameLog(stat_group, games)), team_id)
+        self.store.mark_fetched(self._marker(season))
+        logger.info(f"Rebuilt the {season} leaderboards from {len(players)} stored player logs")
+        return len(players)
+
+    def rebuild_if_needed(self, season: Optional[int] = None) -> int:
+        """Rebuilds the index unless it was built for the season under the current qualifiers."""
+        if season is None:
+            season = datetime.now().year
+        if not self.store.enabled or self.store.fetched_at(self._marker(season)):
+            return 0
+        return self.rebuild(season)
+
+    # Reading
+
+    def top(self, stat: str, period: str, limit: Optional[int] = None, season: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Returns the leaders for a stat over a rolling window.
+
+        Args:
+            stat: One of LEADERBOARD_STATS.
+            period: One of the stat group's period keys.
+            limit: Number of leaders, at most max_size; defaults to size.
+
+        Returns:
+            The stat, period, stat group and qualifier, and the qualified
+            leaders best first, each with their rank, the stat's formatted
+            value and their whole stat line for the window.
+        """
+        stat_group, descending = LEADERBOARD_STATS[stat]
+        if season is None:
+            season = datetime.now().year
+        limit = max(1, min(limit or self.size, self.max_size))
+        leaders = self.store.get_leaders(season, stat, stat_group, period, limit, descending)
+        for rank, leader in enumerate(leaders, 1):
+            leader['rank'] = rank
+            leader['value'] = leader['line'][stat]
+            if leader['name'] is None:
+                leader['name'] = f"Player {leader['id']}"
+        return {'stat': stat, 'period': period, 'group': stat_group,
+                'qualifier': self.qualifier(stat_group, period), 'leaders': leaders}
+
+leaderboard_index = LeaderboardIndex()
@@ -0,0 +1,351 @@
+# metrics.py
+
+"""
+Prometheus-style metrics aggregated across gunicorn workers.
+
+Each process records counters, histograms and gauges in memory and writes a
+snapshot of them to its own JSON file in METRICS_DIR every few seconds. The
+/metrics route merges the snapshots of every process on the host and renders
+them in the Prometheus text exposition format, so whichever worker answers
+the scrape reports for all of them.
+
+Counters and histograms from workers that have exited are kept, so totals
+never go backwards, until their files are older than METRICS_RETENTION.
+Gauges only count live processes and are summed or maxed across them
+depending on what they measure.
+
+Every metric is declared in DEFINITIONS; recording an undeclared name raises.
+
+Scrapes must carry METRICS_TOKEN as a bearer token (or a token parameter);
+without a configured token only debug apps serve /metrics.
+"""
+import os
+import hmac
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WAIT_BUCKETS = (0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# name -> (type, help, histogram buckets or gauge merge mode)
+DEFINITIONS: Dict[str, Tuple[str, str, Any]] = {
+    # Upstream MLB API
+    'mlb_api_requests_total': ('counter', 'MLB API requests by endpoint and status.', None),
+    'mlb_api_request_duration_seconds': ('histogram', 'MLB API request latency by endpoint.', LATENCY_BUCKETS),
+    'mlb_api_response_bytes_total': ('counter', 'MLB API response body bytes by endpoint.', None),
+    'mlb_api_retries_total': ('counter', 'MLB API calls retried after a transient failure, by endpoint.', None),
+    'mlb_api_circuit_rejections_total': ('counter', 'MLB API calls failed fast by an open circuit, by endpoint.', None),
+    'mlb_api_circuits_open': ('gauge', 'MLB API endpoints with an open circuit, in the worst worker.', 'max'),
+    # Caching
+    'mlb_cache_lookups_total': ('counter', 'Memoized lookups by function and result (fresh, stale, miss).', None),
+    'mlb_cache_tier_lookups_total': ('counter', 'Cache backend lookups by tier (l1, l2) and result (hit, miss).', None),
+    'mlb_cache_l1_evictions_total': ('counter', 'Entries evicted from the in-memory L1 to stay under its byte limit.', None),
+    'mlb_cache_l1_bytes': ('gauge', 'Bytes held by the in-memory L1, summed over workers.', 'sum'),
+    'mlb_cache_l1_entries': ('gauge', 'Entries held by the in-memory L1, summed over workers.', 'sum'),
+    # Rate limiter
+    'mlb_rate_limit_wait_seconds': ('histogram', 'Time spent waiting for a rate-limit token, by priority.', WAIT_BUCKETS),
+    'mlb_rate_limit_throttled_total': ('counter', 'Calls that had to wait for a rate-limit token, by priority.', None),
+    'mlb_rate_limit_tokens': ('gauge', 'Rate-limit tokens currently available.', 'max'),
+    # Page-building fan-outs
+    'mlb_fanout_tasks_total': ('counter', 'Fan-out tasks by result (ok, failed, dropped).', None),
+    'mlb_fanout_task_duration_seconds': ('histogram', 'Run time of fan-out tasks on the shared pool.', LATENCY_BUCKETS),
+    'mlb_fetch_pool_queue_depth': ('gauge', 'Fan-out tasks queued for the shared pool, summed over workers.', 'sum'),
+    # Routes
+    'mlb_http_request_duration_seconds': ('histogram', 'Route latency, including streamed bodies, by endpoint and status.', LATENCY_BUCKETS),
+    'mlb_http_request_upstream_calls': ('histogram', 'MLB API calls made while serving a request, by endpoint.', COUNT_BUCKETS),
+    # Background tasks
+    'mlb_warmup_tasks': ('gauge', 'Tasks of the current cache warmup by state (total, done, failed).', 'max'),
+    'mlb_warmup_eta_seconds': ('gauge', 'Estimated seconds until the current cache warmup finishes.', 'max'),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metrics:
+    """
+    The process's metric registry plus the cross-worker snapshot files.
+
+    Collectors registered with register_collector() are called whenever a
+    snapshot is taken and return (name, labels, value) samples, for values
+    that are kept elsewhere (queue depths, the cache's own counters, ...).
+    """
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 10.0, retention: float = 3600.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self._values: Dict[str, Dict[LabelKey, Any]] = {name: {} for name in DEFINITIONS}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._flusher_pid: Optional[int] = None
+        self.token: Optional[str] = None
+        self.allow_without_token = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def init_app(self, app):
+        """Places the snapshot files next to CACHE_DIR, reads the scrape token and instruments every route."""
+        cache_dir = app.config.get('CACHE_DIR')
+        self.directory = app.config.get('METRICS_DIR') or (f"{cache_dir.rstrip(os.sep)}-metrics" if cache_dir else None)
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+        self.retention = app.config.get('METRICS_RETENTION', self.retention)
+        self.token = app.config.get('METRICS_TOKEN') or None
+        self.allow_without_token = app.debug
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def authorized(self) -> bool:
+        """Whether the current request may scrape the metrics."""
+        if self.token is None:
+            return self.allow_without_token
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        supplied = credentials if scheme.lower() == 'bearer' else request.args.get('token') or ''
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._values = {name: {} for name in DEFINITIONS}
+        self._flusher_pid = None
+
+    # Recording
+
+    def _series(self, name: str, kind: str) -> Dict[LabelKey, Any]:
+        definition = DEFINITIONS.get(name)
+        if definition is None or definition[0] != kind:
+            raise KeyError(f"{name} is not a declared {kind}")
+        self._ensure_flusher()
+        return self._values[name]
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1):
+        """Adds value to a counter."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series(name, 'counter')
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        """Records one observation in a histogram."""
+        buckets = DEFINITIONS[name][2]
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series(name, 'histogram')
+            state = series.get(key)
+            if state is None:
+                # [count per bucket..., +Inf count, sum]
+                state = series[key] = [0] * (len(buckets) + 1) + [0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(buckets)] += 1
+            state[-1] += value
+
+    @contextmanager
+    def timer(self, name: str, labels: Optional[Dict[str, Any]] = None):
+        """Observes the duration of the with-block in a histogram; labels may be filled in inside it."""
+        labels = {} if labels is None else labels
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, Any], float]]]):
+        """Adds a callback returning (name, labels, value) samples to every snapshot."""
+        self._collectors.append(collector)
+
+    # Upstream calls made on behalf of the current request
+
+    @property
+    def upstream_calls(self) -> int:
+        """MLB API calls made by (or credited to) the current thread so far."""
+        return getattr(self._local, 'upstream_calls', 0)
+
+    def add_upstream_calls(self, count: int):
+        """Credits calls made on this thread's behalf, e.g. by pool workers."""
+        self._local.upstream_calls = self.upstream_calls + count
+
+    # Route instrumentation
+
+    def _start_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_upstream_calls = self.upstream_calls
+
+    def _finish_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        calls_before = g.get('metrics_upstream_calls', 0)
+
+        def record():
+            # Runs once the body has been sent, so streamed pages count in full.
+            labels = {'endpoint': endpoint, 'status': response.status_code}
+            self.observe('mlb_http_request_duration_seconds', time.perf_counter() - started, labels)
+            self.observe('mlb_http_request_upstream_calls', self.upstream_calls - calls_before, {'endpoint': endpoint})
+
+        response.call_on_close(record)
+        return response
+
+    # Snapshots
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's metrics, collectors included, in the snapshot file format."""
+        samples: Dict[str, Dict[LabelKey, Any]] = {}
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    samples.setdefault(name, {})[_label_key(labels)] = value
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        with self._lock:
+            for name, series in self._values.items():
+                for key, value in series.items():
+                    samples.setdefault(name, {})[key] = list(value) if isinstance(value, list) else value
+        return {'pid': os.getpid(), 'written_at': time.time(),
+                'metrics': {name: [[list(map(list, key)), value] for key, value in series.items()]
+                            for name, series in samples.items()}}
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"{pid}.json")
+
+    def flush(self):
+        """Writes this process's snapshot file."""
+        if not self.directory:
+            return
+        path = self._snapshot_path(os.getpid())
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot {path}: {e}")
+
+    def _ensure_flusher(self):
+        # Called with self._lock held; one flusher thread per process, restarted after a fork.
+        if self._flusher_pid == os.getpid() or not self.directory:
+            return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while self._flusher_pid == pid:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    @staticmethod
+    def _is_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _read_snapshots(self) -> List[Tuple[Dict[str, Any], bool]]:
+        """Returns every (snapshot, process is alive) in the directory, pruning expired ones."""
+        snapshots = []
+        now = time.time()
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = self._is_alive(data.get('pid', -1))
+            if not alive and now - data.get('written_at', 0) > self.retention:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            snapshots.append((data, alive))
+        return snapshots
+
+    def collect(self) -> Dict[str, Dict[LabelKey, Any]]:
+        """Merges the snapshots of every process on the host."""
+        if self.directory:
+            self.flush()
+            snapshots = self._read_snapshots()
+        else:
+            snapshots = [(self.snapshot(), True)]
+        merged: Dict[str, Dict[LabelKey, Any]] = {}
+        for data, alive in snapshots:
+            for name, series in data.get('metrics', {}).items():
+                definition = DEFINITIONS.get(name)
+                if definition is None:
+                    continue
+                kind, _, extra = definition
+                if kind == 'gauge' and not alive:
+                    continue
+                target = merged.setdefault(name, {})
+                for raw_key, value in series:
+                    key = tuple(tuple(pair) for pair in raw_key)
+                    current = target.get(key)
+                    if current is None:
+                        target[key] = list(value) if isinstance(value, list) else value
+                    elif kind == 'histogram':
+                        target[key] = [a + b for a, b in zip(current, value)]
+                    elif kind == 'gauge' and extra == 'max':
+                        target[key] = max(current, value)
+                    else:
+                        target[key] = current + value
+        return merged
+
+    def render(self) -> str:
+        """All processes' metrics in the Prometheus text exposition format."""
+        merged = self.collect()
+        lines = []
+        for name, (kind, help_text, extra) in DEFINITIONS.items():
+            series = merged.get(name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(extra) + [float('inf')], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
@@ -6,79 +6,498 @@ Module for interacting with the MLB Stats API.
 This module contains the MLBStatsAPI class which handles all API requests,
 data fetching, parsing, and includes a rate limiter to avoid being blocked.
 """
+import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import time
+import random
+import struct
 import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the rate limit stays per process
+    fcntl = None
 
 from extensions import cache 
+from caching import memoize_key, single_flight, swr_cache
+from metrics import metrics
+from profiling import profiler
+from stat_columns import GameLog, PlayerStatColumns, is_current
+from store import stats_store
+from leaderboards import leaderboard_index
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# MLB Stats API base URL
-MLB_API_BASE = "https://statsapi.mlb.com/api/v1"
+# MLB Stats API base URL; overridable to run against a local stand-in (see benchmarks/)
+MLB_API_BASE = os.environ.get('MLB_API_BASE', "https://statsapi.mlb.com/api/v1").rstrip('/')
 
 class RateLimiter:
-    """A simple thread-safe rate limiter. Prevents exceeding the API call limit."""
-    def __init__(self, max_calls: int = 80, time_window: int = 60):
+    """
+    A thread-safe, priority-aware token bucket. Prevents exceeding the API call limit.
+
+    Tokens refill continuously at max_calls per time_window, up to a burst of
+    max_calls. Taking a token is O(1); a caller that has to wait sleeps on a
+    condition variable, never while holding the lock. The condition's lock
+    only guards the queue of waiters: the bucket itself is taken outside it,
+    so a shared bucket's file lock never holds up the other threads' queueing.
+
+    Lower-priority callers may only take a token while the bucket holds more
+    than their reserve, and never while a higher-priority caller is waiting,
+    so interactive page loads pre-empt background refreshes and warmup.
+
+    With a shared state file (see init_app) the bucket lives in that file
+    under an flock, so all worker processes on the host draw from one budget.
+    """
+    INTERACTIVE = 0
+    BACKGROUND = 1  # stale-while-revalidate refreshes, cache warmup
+    PREFETCH = 2    # speculative work that can always wait
+    PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background', PREFETCH: 'prefetch'}
+    # Fraction of the burst each priority must leave in the bucket for higher ones.
+    RESERVES = {INTERACTIVE: 0.0, BACKGROUND: 0.25, PREFETCH: 0.5}
+
+    _STATE = struct.Struct('dd')  # tokens, last refill (wall clock, shared across processes)
+
+    def __init__(self, max_calls: int = 80, time_window: int = 60, clock: Callable[[], float] = time.time):
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls: List[float] = []
+        self.clock = clock
+        self.state_path: Optional[str] = None
+        self.tokens = float(max_calls)
+        self.updated = clock()
         self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self._bucket_lock = threading.Lock()  # the in-memory bucket; held only for arithmetic
+        self._waiting = {priority: 0 for priority in self.PRIORITY_NAMES}
+        self._local = threading.local()
+        self._stats = {name: {'acquired': 0, 'throttled': 0, 'wait_seconds': 0.0, 'max_wait': 0.0}
+                       for name in self.PRIORITY_NAMES.values()}
+
+    def init_app(self, app):
+        """Reads the budget from the app config and, if shared, places its state file next to CACHE_DIR."""
+        self.max_calls = app.config.get('MLB_API_RATE_LIMIT', self.max_calls)
+        self.time_window = app.config.get('MLB_API_RATE_WINDOW', self.time_window)
+        with self._bucket_lock:
+            self.tokens = min(self.tokens, float(self.max_calls))
+        cache_dir = app.config.get('CACHE_DIR')
+        if app.config.get('MLB_API_SHARED_RATE_LIMIT') and cache_dir and fcntl is not None:
+            lock_dir = f"{cache_dir.rstrip(os.sep)}-locks"
+            os.makedirs(lock_dir, exist_ok=True)
+            self.state_path = os.path.join(lock_dir, 'rate_limit.bucket')
+        else:
+            self.state_path = None
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self.max_calls / self.time_window
+
+    @contextmanager
+    def priority(self, priority: int):
+        """Runs the calls made by the current thread at the given priority."""
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self) -> int:
+        """The explicit priority of this thread, else BACKGROUND inside a cache refresh, else INTERACTIVE."""
+        priority = getattr(self._local, 'priority', None)
+        if priority is not None:
+            return priority
+        return self.BACKGROUND if swr_cache.revalidating else self.INTERACTIVE
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(float(self.max_calls), tokens + max(0.0, now - updated) * self.rate)
+
+    def _try_take(self, floor: float) -> float:
+        """
+        Takes a token if more than floor would remain. Returns 0 on success,
+        otherwise the seconds until enough tokens will have refilled.
+        """
+        now = self.clock()
+        if self.state_path is None:
+            with self._bucket_lock:
+                self.tokens = self._refill(self.tokens, self.updated, now)
+                self.updated = now
+                if self.tokens - 1.0 >= floor:
+                    self.tokens -= 1.0
+                    return 0.0
+                return (floor + 1.0 - self.tokens) / self.rate
+        with open(self.state_path, 'a+b') as state_file:
+            fcntl.flock(state_file.fileno(), fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                raw = state_file.read(self._STATE.size)
+                tokens, updated = self._STATE.unpack(raw) if len(raw) == self._STATE.size else (float(self.max_calls), now)
+                tokens = self._refill(tokens, updated, now)
+                wait = 0.0
+                if tokens - 1.0 >= floor:
+                    tokens -= 1.0
+                else:
+                    wait = (floor + 1.0 - tokens) / self.rate
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(self._STATE.pack(tokens, now))
+                state_file.flush()
+                with self._bucket_lock:
+                    self.tokens, self.updated = tokens, now
+                return wait
+            finally:
+                fcntl.flock(state_file.fileno(), fcntl.LOCK_UN)
+
+    def acquire(self, priority: Optional[int] = None):
+        """
+        Blocks until a call can be made at the given priority.
+
+        Args:
+            priority: One of INTERACTIVE, BACKGROUND or PREFETCH. Defaults to
+                current_priority().
+        """
+        if priority is None:
+            priority = self.current_priority()
+        floor = self.RESERVES.get(priority, 0.0) * self.max_calls
+        started = time.monotonic()
+        throttled = False
+        with self.cond:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                with self.cond:
+                    # Higher-priority callers are waiting for the bucket; let them go first.
+                    while any(count for p, count in self._waiting.items() if p < priority):
+                        throttled = True
+                        self.cond.wait(timeout=0.1)
+                # Taken outside the condition's lock: a shared bucket means file I/O and an flock.
+                wait = self._try_take(floor)
+                if wait <= 0:
+                    break
+                if not throttled:
+                    throttled = True
+                    logger.warning(f"Rate limit reached. Waiting ~{wait:.2f}s ({self.PRIORITY_NAMES[priority]} priority).")
+                with self.cond:
+                    # Woken early when a waiter leaves.
+                    self.cond.wait(timeout=wait)
+        finally:
+            with self.cond:
+                self._waiting[priority] -= 1
+                self.cond.notify_all()
+        with self.lock:
+            waited = time.monotonic() - started
+            stats = self._stats[self.PRIORITY_NAMES[priority]]
+            stats['acquired'] += 1
+            if throttled:
+                stats['throttled'] += 1
+                stats['wait_seconds'] += waited
+                stats['max_wait'] = max(stats['max_wait'], waited)
+        labels = {'priority': self.PRIORITY_NAMES[priority]}
+        metrics.observe('mlb_rate_limit_wait_seconds', waited, labels)
+        if throttled:
+            metrics.inc('mlb_rate_limit_throttled_total', labels)
+            profiler.record('rate_limit_wait', waited, **labels)
 
     def wait_if_needed(self):
         """Blocks until a call can be made, if necessary."""
+        self.acquire()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the current token level and per-priority wait and throttling counters."""
+        with self._bucket_lock:
+            tokens = self._refill(self.tokens, self.updated, self.clock())
         with self.lock:
-            now = time.time()
-            # Remove calls that are outside the time window
-            self.calls = [t for t in self.calls if now - t < self.time_window]
-            if len(self.calls) >= self.max_calls:
-                # Calculate wait time based on the oldest call
-                wait_duration = self.time_window - (now - self.calls[0])
-                logger.warning(f"Rate limit reached. Waiting for {wait_duration:.2f} seconds.")
-                if wait_duration > 0:
-                    time.sleep(wait_duration)
-            self.calls.append(time.time())
+            return {
+                'tokens': round(tokens, 2),
+                'capacity': self.max_calls,
+                'shared': self.state_path is not None,
+                'priorities': {name: dict(counters) for name, counters in self._stats.items()},
+            }
 
 rate_limiter = RateLimiter()
+metrics.register_collector(lambda: [('mlb_rate_limit_tokens', {}, rate_limiter.stats()['tokens'])])
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an MLB API endpoint whose circuit is open."""
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breakers for the MLB API.
+
+    After `threshold` consecutive failed calls to an endpoint (connection
+    errors, timeouts, 429s and 5xx responses) its circuit opens: calls fail
+    at once with CircuitOpenError instead of each tying up a worker until it
+    times out. After `cooldown` seconds one probe call is let through; if it
+    succeeds the circuit closes, otherwise it stays open for another cooldown.
+
+    Endpoints are the metric labels, e.g. '/people/{id}/stats', so one
+    player's bad id can't open a circuit but an outage of the service can.
+    Circuits are per process.
+    """
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._circuits: Dict[str, List] = {}  # endpoint -> [consecutive failures, opened at or None, probe in flight]
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        """Reads the failure threshold and cooldown from the app config."""
+        self.threshold = app.config.get('MLB_API_BREAKER_THRESHOLD', self.threshold)
+        self.cooldown = app.config.get('MLB_API_BREAKER_COOLDOWN', self.cooldown)
+
+    def allow(self, endpoint: str) -> bool:
+        """Whether a call to endpoint may go ahead; the first call after a cooldown becomes the probe."""
+        with self.lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit[1] is None:
+                return True
+            if circuit[2] or self.clock() - circuit[1] < self.cooldown:
+                return False
+            circuit[2] = True
+            return True
+
+    def record(self, endpoint: str, ok: bool):
+        """Records the outcome of a call that allow() let through."""
+        with self.lock:
+            circuit = self._circuits.setdefault(endpoint, [0, None, False])
+            probing, circuit[2] = circuit[2], False
+            if ok:
+                if circuit[1] is not None:
+                    logger.info(f"Circuit for {endpoint} closed; upstream recovered.")
+                circuit[0], circuit[1] = 0, None
+                return
+            circuit[0] += 1
+            if probing or (circuit[1] is None and circuit[0] >= self.threshold):
+                if circuit[1] is None:
+                    logger.warning(f"Circuit for {endpoint} opened after {circuit[0]} consecutive failures.")
+                circuit[1] = self.clock()
+
+    def open_circuits(self) -> List[str]:
+        """Endpoints whose circuit is currently open."""
+        with self.lock:
+            return [endpoint for endpoint, circuit in self._circuits.items() if circuit[1] is not None]
+
+circuit_breaker = CircuitBreaker()
+metrics.register_collector(lambda: [('mlb_api_circuits_open', {}, len(circuit_breaker.open_circuits()))])
+
+class HTTPTransport:
+    """
+    A shared, thread-safe HTTP transport for the MLB API.
+
+    All fetchers go through one pooled requests.Session so keep-alive
+    connections to statsapi.mlb.com are reused instead of paying a new
+    TCP+TLS handshake on every call.
+
+    The transport also holds the retry policy: failed calls are retried at
+    most max_retries times with full-jitter exponential backoff, and only
+    while the call's total time stays within retry_budget seconds, so a
+    timed-out call is never retried into a multiple of the timeout.
+    """
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 10,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_retries: int = 2, retry_backoff: float = 0.25, retry_budget: float = 4.0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_budget = retry_budget
+        self._session: Optional[requests.Session] = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        """Reads pool, timeout and retry settings from the app config."""
+        self.pool_connections = app.config.get('MLB_API_POOL_CONNECTIONS', self.pool_connections)
+        self.pool_maxsize = app.config.get('MLB_API_POOL_MAXSIZE', self.pool_maxsize)
+        self.connect_timeout = app.config.get('MLB_API_CONNECT_TIMEOUT', self.connect_timeout)
+        self.read_timeout = app.config.get('MLB_API_READ_TIMEOUT', self.read_timeout)
+        self.max_retries = app.config.get('MLB_API_MAX_RETRIES', self.max_retries)
+        self.retry_backoff = app.config.get('MLB_API_RETRY_BACKOFF', self.retry_backoff)
+        self.retry_budget = app.config.get('MLB_API_RETRY_BUDGET', self.retry_budget)
+        self.close()
+
+    @property
+    def session(self) -> requests.Session:
+        """Lazily builds the session so each gunicorn worker gets its own pool after fork."""
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        # pool_block caps the number of open connections per host at pool_maxsize;
+        # extra threads wait for a free connection rather than opening new ones.
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=True,
+                              max_retries=0)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        return session
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout=None) -> requests.Response:
+        """Issues a GET over the pooled session using (connect, read) timeouts by default."""
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        return self.session.get(url, params=params, timeout=timeout)
+
+    def close(self):
+        """Closes pooled connections; the next request builds a fresh session."""
+        with self.lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def retry_delay(self, error: requests.exceptions.RequestException, attempt: int, elapsed: float) -> Optional[float]:
+        """
+        Seconds to wait before retrying a failed call, or None if it should not be retried.
+
+        Connection errors, timeouts, 429s and 5xx responses are retried; other
+        HTTP errors would fail the same way again. A 429's Retry-After is
+        honoured when it fits in the budget.
+
+        Args:
+            error: The exception the attempt raised.
+            attempt: Number of retries made so far.
+            elapsed: Seconds since the first attempt started.
+        """
+        if attempt >= self.max_retries or isinstance(error, CircuitOpenError):
+            return None
+        if isinstance(error, requests.exceptions.HTTPError):
+            status = error.response.status_code if error.response is not None else None
+            if status is None or (status != 429 and status < 500):
+                return None
+        elif not isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return None
+        delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+        if isinstance(error, requests.exceptions.HTTPError) and error.response.status_code == 429:
+            try:
+                delay = max(delay, float(error.response.headers.get('Retry-After', 0)))
+            except ValueError:
+                pass
+        if elapsed + delay > self.retry_budget:
+            return None
+        return delay
+
+transport = HTTPTransport()
 
 class MLBStatsAPI:
     """
     A wrapper for the MLB Stats API with caching, rate limiting, and error handling.
     """
+    # Number of player IDs sent per /people request by the batched fetchers.
+    PLAYER_BATCH_SIZE = 50
+    # Keep each player's season log and only fetch games since the last sync.
+    INCREMENTAL_GAME_LOGS = True
+    # Stale-while-revalidate TTLs in seconds. Past the soft TTL an entry is
+    # still served while it refreshes in the background; the hard TTL spans
+    # the daily rollover so mornings never start from an empty cache.
+    SCHEDULE_SOFT_TIMEOUT = 15 * 60
+    ROSTER_SOFT_TIMEOUT = 6 * 3600
+    GAME_LOG_SOFT_TIMEOUT = 6 * 3600
+    TEAM_INFO_SOFT_TIMEOUT = 24 * 3600
+    HARD_TIMEOUT = 3 * 86400
+
     @staticmethod
-    def _make_api_request(url: str, params: Optional[Dict[str, Any]] = None, timeout: int = 10) -> Dict[str, Any]:
+    def _make_api_request(url: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
         """
-        Makes a rate-limited GET request to the MLB API.
+        Makes a rate-limited GET request to the MLB API over the shared transport.
+
+        Transient failures are retried under the transport's retry policy,
+        each attempt taking its own rate-limit token. While the endpoint's
+        circuit is open the call fails at once without reaching upstream.
 
         Args:
             url: The API endpoint URL.
             params: A dictionary of query parameters.
-            timeout: Request timeout in seconds.
+            timeout: Request timeout in seconds. Defaults to the transport's
+                (connect, read) timeouts.
 
         Returns:
             A dictionary containing the JSON response.
             
         Raises:
-            requests.exceptions.RequestException: For network or HTTP errors.
+            requests.exceptions.RequestException: For network or HTTP errors,
+                including CircuitOpenError.
         """
-        rate_limiter.wait_if_needed()
+        endpoint = MLBStatsAPI._endpoint_label(url)
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return MLBStatsAPI._attempt_api_request(url, params, timeout, endpoint)
+            except requests.exceptions.RequestException as e:
+                delay = transport.retry_delay(e, attempt, time.monotonic() - started)
+                if delay is None:
+                    raise
+            attempt += 1
+            logger.warning(f"Retrying {url} in {delay:.2f}s (retry {attempt} of {transport.max_retries})")
+            metrics.inc('mlb_api_retries_total', {'endpoint': endpoint})
+            with profiler.span('retry_backoff', endpoint=endpoint):
+                time.sleep(delay)
+
+    @staticmethod
+    def _attempt_api_request(url: str, params: Optional[Dict[str, Any]], timeout: Optional[float], endpoint: str) -> Dict[str, Any]:
+        """One attempt of _make_api_request, reported to the endpoint's circuit breaker."""
+        if not circuit_breaker.allow(endpoint):
+            metrics.inc('mlb_api_circuit_rejections_total', {'endpoint': endpoint})
+            raise CircuitOpenError(f"Circuit open for {endpoint}; not calling {url}")
+        rate_limiter.acquire()
+        metrics.add_upstream_calls(1)
+        labels = {'endpoint': endpoint, 'status': 'error'}
+        failed = True
+        started = time.perf_counter()
         try:
-            response = requests.get(url, params=params, timeout=timeout)
+            with profiler.span('upstream', endpoint=endpoint):
+                response = transport.get(url, params=params, timeout=timeout)
+                labels['status'] = response.status_code
+                profiler.annotate(status=response.status_code, bytes=len(response.content))
+            # A 4xx other than 429 is a problem with the request, not with upstream.
+            failed = response.status_code == 429 or response.status_code >= 500
+            metrics.inc('mlb_api_response_bytes_total', {'endpoint': endpoint}, len(response.content))
             response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
             return response.json()
         except requests.exceptions.Timeout as e:
+            labels['status'] = 'timeout'
             logger.error(f"Request timed out for URL: {url}. Error: {e}")
             raise
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed for URL: {url}. Error: {e}")
             raise
+        finally:
+            circuit_breaker.record(endpoint, not failed)
+            metrics.observe('mlb_api_request_duration_seconds', time.perf_counter() - started, {'endpoint': endpoint})
+            metrics.inc('mlb_api_requests_total', labels)
+
+    @staticmethod
+    def _endpoint_label(url: str) -> str:
+        """The API path of url with ids replaced, e.g. '/teams/{id}/roster', to keep label sets small."""
+        path = url[len(MLB_API_BASE):] if url.startswith(MLB_API_BASE) else url
+        return re.sub(r'/\d+(?=/|$)', '/{id}', path.split('?', 1)[0]) or '/'
 
     @staticmethod
-    @cache.memoize()
+    def _stored_is_fresh(resource: str, soft_timeout: int) -> bool:
+        """Whether the stats store holds a copy of resource recent enough to skip upstream."""
+        fetched_at = stats_store.fetched_at(resource)
+        return fetched_at is not None and swr_cache.is_fresh_at(fetched_at, soft_timeout)
+
+    @staticmethod
+    @swr_cache.memoize(soft_timeout=SCHEDULE_SOFT_TIMEOUT, timeout=HARD_TIMEOUT)
     def get_todays_games(date_str: str) -> List[Dict[str, Any]]:
         """
         Fetches all MLB games for a given date.
@@ -89,19 +508,86 @@ class MLBStatsAPI:
         Returns:
             A list of dictionaries, each representing a game.
         """
+        resource = f"schedule:{date_str}"
+        if MLBStatsAPI._stored_is_fresh(resource, MLBStatsAPI.SCHEDULE_SOFT_TIMEOUT):
+            dates = stats_store.get_schedule(date_str, date_str)
+            return dates[0]['games'] if dates else []
+
         logger.info(f"Fetching games for date: {date_str}")
         url = f"{MLB_API_BASE}/schedule"
         params = {'sportId': 1, 'date': date_str, 'hydrate': 'team'}
         try:
             data = MLBStatsAPI._make_api_request(url, params)
+            stats_store.put_schedule(resource, data.get('dates', []))
             if 'dates' in data and data['dates']:
                 return data['dates'][0].get('games', [])
             return []
         except requests.exceptions.RequestException:
-            return []
+            swr_cache.mark_degraded()
+            dates = stats_store.get_schedule(date_str, date_str)
+            return dates[0]['games'] if dates else []
+
+    @staticmethod
+    @swr_cache.memoize(soft_timeout=SCHEDULE_SOFT_TIMEOUT, timeout=HARD_TIMEOUT)
+    def get_league_schedule(start_date: str, end_date: str) -> Optional[Dict[int, List[Dict[str, Any]]]]:
+        """
+        Fetches every MLB game in a date range with a single schedule request
+        and indexes the final games by team.
+
+        Args:
+            start_date: First date in 'YYYY-MM-DD' format.
+            end_date: Last date in 'YYYY-MM-DD' format.
+
+        Returns:
+            A dictionary mapping team ID to that team's final games, most
+            recent first, or None on error. Each game has 'gamePk', 'date'
+            (the official date), 'gameDate', 'gameType', 'opponent', 'score'
+            and 'opp_score'.
+        """
+        resource = f"league_schedule:{start_date}:{end_date}"
+        if MLBStatsAPI._stored_is_fresh(resource, MLBStatsAPI.SCHEDULE_SOFT_TIMEOUT):
+            return MLBStatsAPI._index_final_games(stats_store.get_schedule(start_date, end_date) or [])
+
+        logger.info(f"Fetching league schedule from {start_date} to {end_date}")
+        url = f"{MLB_API_BASE}/schedule"
+        params = {'sportId': 1, 'startDate': start_date, 'endDate': end_date, 'hydrate': 'team'}
+        try:
+            data = MLBStatsAPI._make_api_request(url, params)
+        except requests.exceptions.RequestException:
+            swr_cache.mark_degraded()
+            dates = stats_store.get_schedule(start_date, end_date)
+            return MLBStatsAPI._index_final_games(dates) if dates else None
+        stats_store.put_schedule(resource, data.get('dates', []))
+        return MLBStatsAPI._index_final_games(data.get('dates', []))
+
+    @staticmethod
+    def _index_final_games(dates: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Indexes the final games of a schedule 'dates' list by team, most recent first."""
+        index: Dict[int, List[Dict[str, Any]]] = {}
+        for date_entry in dates:
+            for game in date_entry.get('games', []):
+                if game.get('status', {}).get('abstractGameState') != 'Final':
+                    continue
+                try:
+                    home, away = game['teams']['home'], game['teams']['away']
+                    for ours, theirs in ((home, away), (away, home)):
+                        index.setdefault(ours['team']['id'], []).append({
+                            'gamePk': game.get('gamePk'),
+                            'gameType': game.get('gameType'),
+                            'date': game.get('officialDate') or date_entry.get('date', ''),
+                            'gameDate': game.get('gameDate'),
+                            'opponent': theirs.get('team', {}).get('name'),
+                            'score': ours.get('score', 0),
+                            'opp_score': theirs.get('score', 0),
+                        })
+                except KeyError as e:
+                    logger.warning(f"Could not index game pk {game.get('gamePk')}. Missing {e}")
+        for games in index.values():
+            games.sort(key=lambda g: g.get('gameDate') or '', reverse=True)
+        return index
 
     @staticmethod
-    @cache.memoize()
+    @swr_cache.memoize(soft_timeout=ROSTER_SOFT_TIMEOUT, timeout=HARD_TIMEOUT)
     def get_team_roster(team_id: int) -> Dict[str, List[Dict[str, Any]]]:
         """
         Fetches the roster for a given team ID.
@@ -112,6 +598,11 @@ class MLBStatsAPI:
         Returns:
             A dictionary with 'batters' and 'pitchers' lists.
         """
+        if MLBStatsAPI._stored_is_fresh(f"roster:{team_id}", MLBStatsAPI.ROSTER_SOFT_TIMEOUT):
+            stored = stats_store.get_roster(team_id)
+            if stored is not None:
+                return stored
+
         logger.info(f"Fetching roster for team ID: {team_id}")
         url = f"{MLB_API_BASE}/teams/{team_id}/roster"
         params = {'rosterType': 'active'}
@@ -128,13 +619,15 @@ class MLBStatsAPI:
                     roster['pitchers'].append(player_info)
                 else:
                     roster['batters'].append(player_info)
+            stats_store.put_roster(team_id, roster)
             return roster
         except requests.exceptions.RequestException:
-            return roster
+            swr_cache.mark_degraded()
+            return stats_store.get_roster(team_id) or roster
 
     @staticmethod
-    @cache.memoize()
-    def get_player_game_logs(player_id: int, stat_group: str, season: int = None) -> List[Dict[str, Any]]:
+    @swr_cache.memoize(soft_timeout=GAME_LOG_SOFT_TIMEOUT, timeout=HARD_TIMEOUT, validate=is_current)
+    def get_player_game_logs(player_id: int, stat_group: str, season: int = None) -> GameLog:
         if season is None:
             season = datetime.now().year
         """
@@ -146,24 +639,291 @@ class MLBStatsAPI:
             season: The year of the season.
 
         Returns:
-            A list of game log splits.
+            The player's GameLog, most recent game first.
         """
-        logger.info(f"Fetching {season} game logs for player {player_id} ({stat_group})")
+        if MLBStatsAPI._stored_is_fresh(stats_store.game_log_resource(player_id, stat_group, season), MLBStatsAPI.GAME_LOG_SOFT_TIMEOUT):
+            stored = stats_store.get_game_logs(player_id, stat_group, season)
+            if stored is not None:
+                return GameLog(stat_group, stored)
+
         url = f"{MLB_API_BASE}/people/{player_id}/stats"
         params = {'stats': 'gameLog', 'group': stat_group, 'season': season}
+        start_date = MLBStatsAPI._season_log_delta(player_id, stat_group, season)
+        if start_date:
+            logger.info(f"Syncing {season} game logs for player {player_id} ({stat_group}) since {start_date}")
+            params.update({'startDate': start_date, 'endDate': datetime.now().strftime('%Y-%m-%d')})
+        else:
+            logger.info(f"Fetching {season} game logs for player {player_id} ({stat_group})")
         try:
             data = MLBStatsAPI._make_api_request(url, params)
+            splits = []
             if data.get('stats') and data['stats'][0].get('splits'):
-                # Sort by date descending to have the most recent games first
-                games = data['stats'][0]['splits']
-                games.sort(key=lambda x: x.get('date', ''), reverse=True)
-                return games
-            return []
+                splits = data['stats'][0]['splits']
+            return MLBStatsAPI._store_season_log(player_id, stat_group, season, splits)
         except requests.exceptions.RequestException:
-            return []
+            # Serve whatever was synced before rather than nothing.
+            swr_cache.mark_degraded()
+            return GameLog(stat_group, stats_store.get_game_logs(player_id, stat_group, season) or [])
+
+    @staticmethod
+    def _season_log_delta(player_id: int, stat_group: str, season: int) -> Optional[str]:
+        """
+        Looks up a player's stored season log for an incremental sync.
+
+        Returns:
+            The date to resume fetching from, or None if the full season
+            must be fetched.
+        """
+        if not MLBStatsAPI.INCREMENTAL_GAME_LOGS:
+            return None
+        synced_at, last_game_date = stats_store.get_game_log_sync(player_id, stat_group, season)
+        if synced_at is None:
+            return None
+        # Re-fetch from the last stored game's date (inclusive) so doubleheaders
+        # and games stored mid-flight are picked up; duplicates are merged by gamePk.
+        return last_game_date or datetime.fromtimestamp(synced_at).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _store_season_log(player_id: int, stat_group: str, season: int, splits: List[Dict[str, Any]]) -> GameLog:
+        """
+        Merges newly fetched splits into the player's season log in the stats store.
+
+        Splits are upserted by gamePk (newer data wins) and read back sorted by
+        date descending so the most recent games come first. The player's
+        stat columns and leaderboard entries are rebuilt from the merged log.
+
+        Returns:
+            The merged log projected to a GameLog.
+        """
+        stats_store.put_game_logs(player_id, stat_group, season, splits)
+        games = stats_store.get_game_logs(player_id, stat_group, season)
+        if games is None:
+            # Store unavailable: only a full-season fetch was made, so the splits are the log.
+            games = sorted(splits, key=lambda x: x.get('date', ''), reverse=True)
+        game_log = GameLog(stat_group, games)
+        # Keep the derived stat columns and leaderboard entries in step with the logs they are built from.
+        columns = PlayerStatColumns(stat_group, game_log)
+        swr_cache.set(memoize_key(MLBStatsAPI.get_player_stat_columns, player_id, stat_group, season),
+                      columns, timeout=MLBStatsAPI.HARD_TIMEOUT)
+        leaderboard_index.update(player_id, stat_group, season, columns,
+                                 team_id=games[0].get('team', {}).get('id') if games else None)
+        return game_log
+
+    @staticmethod
+    def get_player_game_logs_batch(player_ids: List[int], stat_group: str, season: int = None) -> Dict[int, GameLog]:
+        """
+        Fetches game logs for many players at once via /people?personIds=.
+
+        Each player's logs are stored under the same key that
+        get_player_game_logs is memoized with, so later per-player calls are
+        cache hits. Fresh cached players are not re-fetched; stale ones are
+        returned as-is and refreshed together in the background.
+
+        Args:
+            player_ids: The MLB player IDs.
+            stat_group: 'hitting' or 'pitching'.
+            season: The year of the season.
+
+        Returns:
+            A dictionary mapping player ID to its GameLog.
+            Players that could not be fetched are omitted.
+        """
+        if season is None:
+            season = datetime.now().year
+
+        soft_timeout = MLBStatsAPI.get_player_game_logs.soft_timeout
+        results: Dict[int, GameLog] = {}
+        stale: List[int] = []
+        keys = {player_id: memoize_key(MLBStatsAPI.get_player_game_logs, player_id, stat_group, season)
+                for player_id in dict.fromkeys(player_ids)}
+        for player_id, key in keys.items():
+            entry = swr_cache.get(key, is_current)
+            if entry is None:
+                continue
+            if swr_cache.is_fresh(entry, soft_timeout):
+                results[player_id] = entry.value
+            elif swr_cache.revalidating:
+                continue
+            else:
+                results[player_id] = entry.value
+                stale.append(player_id)
+        if stale:
+            # Serve the stale logs now and refresh them together in one batch.
+            swr_cache.refresh_in_background(('game_logs', stat_group, season, tuple(stale)),
+                                            MLBStatsAPI.get_player_game_logs_batch, stale, stat_group, season)
+        pending = [player_id for player_id in keys if player_id not in results]
+        swr_cache.record_lookups('get_player_game_logs', fresh=len(results) - len(stale), stale=len(stale), miss=len(pending))
+        if not pending:
+            return results
+
+        # Hold the per-player single-flight locks so concurrent pages don't
+        # fetch the same players, then re-check what another caller filled in.
+        with single_flight.lock_many(keys[player_id] for player_id in pending):
+            # Group cache misses by the date their incremental sync resumes from,
+            # so players needing a full season don't widen everyone else's delta.
+            missing: Dict[Optional[str], List[int]] = {}
+            for player_id in pending:
+                entry = swr_cache.get(keys[player_id], is_current)
+                if entry is not None and swr_cache.is_fresh(entry, soft_timeout):
+                    results[player_id] = entry.value
+                    continue
+                if MLBStatsAPI._stored_is_fresh(stats_store.game_log_resource(player_id, stat_group, season), soft_timeout):
+                    games = stats_store.get_game_logs(player_id, stat_group, season)
+                    if games is not None:
+                        game_log = GameLog(stat_group, games)
+                        swr_cache.set(keys[player_id], game_log, timeout=MLBStatsAPI.HARD_TIMEOUT)
+                        results[player_id] = game_log
+                        continue
+                missing.setdefault(MLBStatsAPI._season_log_delta(player_id, stat_group, season), []).append(player_id)
+
+            url = f"{MLB_API_BASE}/people"
+            for start_date, group_ids in missing.items():
+                date_range = f",startDate={start_date},endDate={datetime.now().strftime('%Y-%m-%d')}" if start_date else ""
+                for start in range(0, len(group_ids), MLBStatsAPI.PLAYER_BATCH_SIZE):
+                    chunk = group_ids[start:start + MLBStatsAPI.PLAYER_BATCH_SIZE]
+                    logger.info(f"Fetching {season} game logs for {len(chunk)} players ({stat_group}) in one batch"
+                                + (f" since {start_date}" if start_date else ""))
+                    params = {
+                        'personIds': ','.join(str(player_id) for player_id in chunk),
+                        'hydrate': f"stats(group=[{stat_group}],type=[gameLog],season={season}{date_range})",
+                    }
+                    try:
+                        data = MLBStatsAPI._make_api_request(url, params)
+                    except requests.exceptions.RequestException:
+                        # Leave the chunk uncached; get_player_game_logs falls back to per-player requests.
+                        continue
+
+                    for person in data.get('people', []):
+                        player_id = person.get('id')
+                        if player_id not in chunk:
+                            continue
+                        splits = []
+                        for stat in person.get('stats', []):
+                            if stat.get('group', {}).get('displayName') == stat_group and stat.get('splits'):
+                                splits = stat['splits']
+                                break
+                        game_log = MLBStatsAPI._store_season_log(player_id, stat_group, season, splits)
+                        swr_cache.set(keys[player_id], game_log, timeout=MLBStatsAPI.HARD_TIMEOUT)
+                        results[player_id] = game_log
+
+        return results
 
     @staticmethod
-    @cache.memoize()
+    @swr_cache.memoize(soft_timeout=GAME_LOG_SOFT_TIMEOUT, timeout=HARD_TIMEOUT, validate=is_current)
+    def get_player_stat_columns(player_id: int, stat_group: str, season: int = None) -> PlayerStatColumns:
+        """
+        Builds prefix-summed stat columns from a player's season game logs.
+
+        Args:
+            player_id: The MLB player ID.
+            stat_group: 'hitting' or 'pitching'.
+            season: The year of the season.
+
+        Returns:
+            A PlayerStatColumns instance for the player's appearances.
+        """
+        if season is None:
+            season = datetime.now().year
+        return PlayerStatColumns(stat_group, MLBStatsAPI.get_player_game_logs(player_id, stat_group, season=season))
+
+    @staticmethod
+    def get_player_stat_columns_batch(player_ids: List[int], stat_group: str, season: int = None) -> Dict[int, PlayerStatColumns]:
+        """
+        Returns stat columns for many players, batching the game-log fetches
+        for any that are not cached yet. Stale columns are returned as-is and
+        refreshed together in the background.
+
+        Args:
+            player_ids: The MLB player IDs.
+            stat_group: 'hitting' or 'pitching'.
+            season: The year of the season.
+
+        Returns:
+            A dictionary mapping player ID to its PlayerStatColumns.
+            Players that could not be fetched are omitted.
+        """
+        if season is None:
+            season = datetime.now().year
+
+        soft_timeout = MLBStatsAPI.get_player_stat_columns.soft_timeout
+        results: Dict[int, PlayerStatColumns] = {}
+        missing: List[int] = []
+        stale: List[int] = []
+        for player_id in dict.fromkeys(player_ids):
+            entry = swr_cache.get(memoize_key(MLBStatsAPI.get_player_stat_columns, player_id, stat_group, season), is_current)
+            if entry is None:
+                missing.append(player_id)
+            elif swr_cache.is_fresh(entry, soft_timeout):
+                results[player_id] = entry.value
+            elif swr_cache.revalidating:
+                missing.append(player_id)
+            else:
+                results[player_id] = entry.value
+                stale.append(player_id)
+        if stale:
+            swr_cache.refresh_in_background(('stat_columns', stat_group, season, tuple(stale)),
+                                            MLBStatsAPI.get_player_stat_columns_batch, stale, stat_group, season)
+        swr_cache.record_lookups('get_player_stat_columns', fresh=len(results) - len(stale), stale=len(stale), miss=len(missing))
+
+        if missing:
+            for player_id, game_log in MLBStatsAPI.get_player_game_logs_batch(missing, stat_group, season).items():
+                columns = PlayerStatColumns(stat_group, game_log)
+                swr_cache.set(memoize_key(MLBStatsAPI.get_player_stat_columns, player_id, stat_group, season),
+                              columns, timeout=MLBStatsAPI.HARD_TIMEOUT)
+                results[player_id] = columns
+        return results
+
+    @staticmethod
+    def _memoized_functions():
+        return (MLBStatsAPI.get_todays_games, MLBStatsAPI.get_league_schedule, MLBStatsAPI.get_team_roster,
+                MLBStatsAPI.get_player_game_logs, MLBStatsAPI.get_player_stat_columns,
+                MLBStatsAPI.get_team_info)
+
+    @staticmethod
+    def ensure_memoize_versions():
+        """
+        Creates each memoized function's version hash if it is missing.
+
+        Flask-Caching creates it lazily on first use; if concurrent first
+        callers each generated one they would compute different keys and
+        defeat single-flight coalescing.
+        """
+        for func in MLBStatsAPI._memoized_functions():
+            memoize_key(func)
+
+    @staticmethod
+    def _expire(memoized_func, args: tuple, resource: str):
+        """
+        Marks one memoized call and its stats store copy stale. Nothing is
+        deleted: the old value is still served and the stored season logs
+        still seed incremental syncs until the next fetch replaces them.
+        """
+        swr_cache.mark_stale(memoize_key(memoized_func, *args), timeout=MLBStatsAPI.HARD_TIMEOUT)
+        stats_store.expire(resource)
+
+    @staticmethod
+    def expire_todays_games(date_str: str):
+        MLBStatsAPI._expire(MLBStatsAPI.get_todays_games, (date_str,), f"schedule:{date_str}")
+
+    @staticmethod
+    def expire_league_schedule(start_date: str, end_date: str):
+        MLBStatsAPI._expire(MLBStatsAPI.get_league_schedule, (start_date, end_date),
+                            f"league_schedule:{start_date}:{end_date}")
+
+    @staticmethod
+    def expire_team_roster(team_id: int):
+        MLBStatsAPI._expire(MLBStatsAPI.get_team_roster, (team_id,), f"roster:{team_id}")
+
+    @staticmethod
+    def expire_player_game_logs(player_id: int, stat_group: str, season: int):
+        """Marks a player's game logs, and the stat columns built from them, stale."""
+        resource = stats_store.game_log_resource(player_id, stat_group, season)
+        MLBStatsAPI._expire(MLBStatsAPI.get_player_game_logs, (player_id, stat_group, season), resource)
+        swr_cache.mark_stale(memoize_key(MLBStatsAPI.get_player_stat_columns, player_id, stat_group, season),
+                             timeout=MLBStatsAPI.HARD_TIMEOUT)
+
+    @staticmethod
+    @swr_cache.memoize(soft_timeout=TEAM_INFO_SOFT_TIMEOUT, timeout=HARD_TIMEOUT)
     def get_team_info(team_id: int) -> Optional[Dict[str, Any]]:
         """
         Fetches basic information for a team.
@@ -174,9 +934,17 @@ class MLBStatsAPI:
         Returns:
             A dictionary with team info or None on error.
         """
+        if MLBStatsAPI._stored_is_fresh(f"team:{team_id}", MLBStatsAPI.TEAM_INFO_SOFT_TIMEOUT):
+            stored = stats_store.get_team_info(team_id)
+            if stored is not None:
+                return stored
+
         logger.info(f"Fetching info for team ID: {team_id}")
         url = f"{MLB_API_BASE}/teams/{team_id}"
         try:
-            return MLBStatsAPI._make_api_request(url, {'sportId': 1})
+            data = MLBStatsAPI._make_api_request(url, {'sportId': 1})
+            stats_store.put_team_info(team_id, data)
+            return data
         except requests.exceptions.RequestException:
-            return None
+            swr_cache.mark_degraded()
+            return stats_store.get_team_info(team_id)
@@ -0,0 +1,281 @@
+# profiling.py
+
+"""
+Opt-in per-request profiling as a tree of timed spans.
+
+An authorized request with ?profile=<flags> (or an X-Profile header) records
+the phases it runs: the fetch fan-outs, each roster group, game history,
+aggregation, sorting and rendering. It also records every upstream call and
+rate-limit wait, and counts cache lookups. Flags are comma-separated:
+
+    store    (default) keep the profile in the cache for PROFILE_TTL seconds;
+             its id is returned in X-Profile-Id and it is served by
+             /admin/profiles/<id>
+    json     return the profile as JSON instead of the page
+    cprofile also run cProfile over rendering and attach the top functions
+
+Requests must carry PROFILING_TOKEN in an X-Profile-Token header or a
+profile_token parameter; without a configured token only debug apps profile.
+
+Spans live on a thread-local stack. When no profile is active every hook is
+one attribute lookup, so instrumentation stays in place permanently. Work run
+on the shared fetch pool is attached to the span that submitted it.
+"""
+import io
+import hmac
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+from flask import request, jsonify
+
+from extensions import cache
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """One timed phase; children may be added from other threads."""
+    __slots__ = ('name', 'attrs', 'counters', 'children', 'start', 'end', 'thread', 'profile')
+
+    def __init__(self, name: str, attrs: Dict[str, Any], profile: 'Profile', start: Optional[float] = None):
+        self.name = name
+        self.attrs = attrs
+        self.counters: Dict[str, int] = {}
+        self.children: List['Span'] = []
+        self.start = time.perf_counter() if start is None else start
+        self.end: Optional[float] = None
+        self.thread = threading.current_thread().name
+        self.profile = profile
+
+    def add_child(self, span: 'Span'):
+        with self.profile.lock:
+            self.children.append(span)
+
+    def to_dict(self, origin: float, parent_thread: Optional[str] = None) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        node = {'name': self.name, 'start_ms': round((self.start - origin) * 1000, 3),
+                'duration_ms': round((end - self.start) * 1000, 3)}
+        if self.thread != parent_thread:
+            node['thread'] = self.thread
+        if self.attrs:
+            node['attrs'] = self.attrs
+        if self.counters:
+            node['counters'] = self.counters
+        with self.profile.lock:
+            children = sorted(self.children, key=lambda child: child.start)
+        if children:
+            node['children'] = [child.to_dict(origin, self.thread) for child in children]
+        return node
+
+class Profile:
+    """The span tree of one profiled request."""
+    def __init__(self, flags: set):
+        self.id = uuid.uuid4().hex[:16]
+        self.flags = flags
+        self.lock = threading.Lock()
+        self.root = Span('request', {'method': request.method, 'path': request.full_path.rstrip('?'),
+                                     'endpoint': request.endpoint}, self)
+        self.finished = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        tree = self.root.to_dict(self.root.start)
+        totals = {'upstream_calls': 0, 'upstream_ms': 0.0, 'rate_limit_wait_ms': 0.0, 'counters': {}}
+
+        def walk(node):
+            if node['name'] == 'upstream':
+                totals['upstream_calls'] += 1
+                totals['upstream_ms'] += node['duration_ms']
+            elif node['name'] == 'rate_limit_wait':
+                totals['rate_limit_wait_ms'] += node['duration_ms']
+            for name, count in node.get('counters', {}).items():
+                totals['counters'][name] = totals['counters'].get(name, 0) + count
+            for child in node.get('children', []):
+                walk(child)
+
+        walk(tree)
+        totals['upstream_ms'] = round(totals['upstream_ms'], 3)
+        totals['rate_limit_wait_ms'] = round(totals['rate_limit_wait_ms'], 3)
+        return {'id': self.id, 'duration_ms': tree['duration_ms'], 'totals': totals, 'tree': tree}
+
+class Profiler:
+    """Request activation, the per-thread span stack and profile storage."""
+    FLAGS = {'1', 'store', 'json', 'cprofile'}
+
+    def __init__(self, token: Optional[str] = None, ttl: int = 3600, cprofile_top: int = 25):
+        self.token = token
+        self.ttl = ttl
+        self.cprofile_top = cprofile_top
+        self.allow_without_token = False
+        self._local = threading.local()
+
+    def init_app(self, app):
+        """Reads the token and retention from the app config and hooks request start and finish."""
+        self.token = app.config.get('PROFILING_TOKEN') or None
+        self.ttl = app.config.get('PROFILE_TTL', self.ttl)
+        self.cprofile_top = app.config.get('PROFILE_CPROFILE_TOP', self.cprofile_top)
+        self.allow_without_token = app.debug
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def authorized(self) -> bool:
+        """Whether the current request may profile or read profiles."""
+        if self.token is None:
+            return self.allow_without_token
+        supplied = request.headers.get('X-Profile-Token') or request.args.get('profile_token') or ''
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    # Recording
+
+    def _stack(self) -> Optional[List[Span]]:
+        return getattr(self._local, 'stack', None)
+
+    @property
+    def active(self) -> bool:
+        """True while the current thread is recording a profile."""
+        return bool(getattr(self._local, 'stack', None))
+
+    def span(self, name: str, **attrs):
+        """Times the with-block as a child of the current span; a no-op when not profiling."""
+        stack = getattr(self._local, 'stack', None)
+        if not stack:
+            return nullcontext()
+        return self._span(stack, name, attrs)
+
+    @contextmanager
+    def _span(self, stack: List[Span], name: str, attrs: Dict[str, Any]):
+        parent = stack[-1]
+        span = Span(name, attrs, parent.profile)
+        parent.add_child(span)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            stack.pop()
+
+    def annotate(self, **attrs):
+        """Adds attributes to the current span."""
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            stack[-1].attrs.update(attrs)
+
+    def count(self, name: str, value: int = 1):
+        """Adds to a counter on the current span, e.g. cache lookups by result."""
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            span = stack[-1]
+            with span.profile.lock:  # pool tasks may count on the span that submitted them
+                span.counters[name] = span.counters.get(name, 0) + value
+
+    def record(self, name: str, duration: float, **attrs):
+        """Adds an already finished span that ended now, e.g. a measured wait."""
+        stack = getattr(self._local, 'stack', None)
+        if stack:
+            end = time.perf_counter()
+            span = Span(name, attrs, stack[-1].profile, start=end - duration)
+            span.end = end
+            stack[-1].add_child(span)
+
+    def current(self) -> Optional[Span]:
+        """The current span, to hand to work running on another thread."""
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    def attached(self, parent: Optional[Span]):
+        """Records spans on this thread under parent, a span from another thread."""
+        if parent is None:
+            return nullcontext()
+        return self._attached(parent)
+
+    @contextmanager
+    def _attached(self, parent: Span):
+        previous = self._stack()
+        self._local.stack = [parent]
+        try:
+            yield
+        finally:
+            self._local.stack = previous
+
+    @contextmanager
+    def cprofiled(self, name: str, **attrs):
+        """A span that, when the profile asked for cprofile, also runs cProfile over the block."""
+        stack = getattr(self._local, 'stack', None)
+        if not stack or 'cprofile' not in stack[0].profile.flags:
+            with self.span(name, **attrs):
+                yield
+            return
+        profile = cProfile.Profile()
+        with self.span(name, **attrs) as span:
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                out = io.StringIO()
+                pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(self.cprofile_top)
+                span.attrs['cprofile'] = out.getvalue()
+
+    # Request lifecycle
+
+    def _flags(self) -> Optional[set]:
+        raw = request.args.get('profile') or request.headers.get('X-Profile')
+        if not raw:
+            return None
+        flags = {flag.strip() for flag in raw.lower().split(',')} & self.FLAGS
+        return flags or None
+
+    def _start_request(self):
+        self._local.stack = None  # a profile left open by a response that was never closed
+        flags = self._flags()
+        if flags is None:
+            return
+        if not self.authorized():
+            logger.warning(f"Ignoring unauthorized profiling request for {request.path}")
+            return
+        profile = Profile(flags)
+        self._local.stack = [profile.root]
+
+    def _finish(self, profile: Profile) -> Dict[str, Any]:
+        if not profile.finished:
+            profile.finished = True
+            profile.root.end = time.perf_counter()
+            if self.current() is profile.root:
+                self._local.stack = None
+        return profile.to_dict()
+
+    def _finish_request(self, response):
+        stack = self._stack()
+        if not stack:
+            return response
+        profile = stack[0].profile
+        profile.root.attrs['status'] = response.status_code
+        if 'json' in profile.flags:
+            response.get_data()  # runs a streamed body to the end inside the profile
+            response.close()
+            return jsonify(self._finish(profile))
+
+        response.headers['X-Profile-Id'] = profile.id
+        if not response.is_streamed:
+            # Top-level phase timings for the browser's network panel; streamed bodies are still running.
+            now = time.perf_counter()
+            with profile.lock:
+                children = list(profile.root.children)
+            response.headers['Server-Timing'] = ', '.join(
+                f"{child.name};dur={((child.end or now) - child.start) * 1000:.1f}" for child in children)
+
+        def store():
+            cache.set(f"profile:{profile.id}", self._finish(profile), timeout=self.ttl)
+
+        response.call_on_close(store)
+        return response
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """A stored profile by id, or None."""
+        return cache.get(f"profile:{profile_id}")
+
+profiler = Profiler()
@@ -4,18 +4,28 @@
 Flask routes for the MLB Stats Tracker application.
 """
 
+import json
+import secrets
+import hashlib
 import logging
+from contextlib import closing
 from datetime import datetime
 import pytz
-from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
-from typing import Dict, Any
+from flask import (Blueprint, render_template, stream_template, get_template_attribute, session, redirect,
+                   url_for, request, jsonify, current_app, Response)
+from markupsafe import Markup
+from typing import Dict, Any, Iterator, List, Optional
 
 from mlb_api import MLBStatsAPI
 from utils import (
     TEAM_ABBREVIATIONS, get_team_logo_url, format_game_time,
-    process_team_roster_in_parallel, calculate_rolling_team_stats, get_team_game_history
+    get_matchup_view, get_stored_matchup_view, stream_matchup_view, matchup_period_slice, HITTER_PERIODS
 )
 from extensions import cache
+from metrics import metrics
+from store import stats_store
+from profiling import profiler
+from leaderboards import LEADERBOARD_STATS, leaderboard_index
 
 logger = logging.getLogger(__name__)
 
@@ -51,65 +61,171 @@ def home():
         })
 
     favorites = session.get('favorites', [])
+    if favorites and session.get('favorites_seen') != datetime.now(pacific_tz).strftime('%Y-%m-%d'):
+        _record_favorites(favorites)
     current_date = datetime.now(pacific_tz).strftime('%A, %B %d, %Y')
     
     return render_template('home.html', games=games, favorites=favorites, current_date=current_date)
 
+def _details_macro(name: str):
+    return get_template_attribute('_details_macros.html', name)
+
+def _stream_matchup_page(home_id: int, away_id: int, periods: List[str], favorites: List[str]) -> Iterator[Markup]:
+    """
+    Yields the details page content as the matchup is built: the skeleton once
+    both teams are known, each roster table as its stats finish, then the team
+    comparison once the rollups are in.
+    """
+    matchup_page, team_card, stream_fill = (_details_macro(name) for name in ('matchup_page', 'team_card', 'stream_fill'))
+    tables = {'batters': _details_macro('batters_table'), 'pitchers': _details_macro('pitchers_table')}
+    initial = periods[0]
+    skeleton_sent = False
+    try:
+        # Closed with this generator, so a client going away cancels the build at once.
+        with closing(stream_matchup_view(home_id, away_id)) as events:
+            for event, value in events:
+                if event == 'teams':
+                    home_team, away_team = value
+                    with profiler.span('render', part='skeleton'):
+                        html = matchup_page(home_team, away_team, periods, favorites, streaming=True)
+                    yield html
+                    skeleton_sent = True
+                elif event == 'group':
+                    team, kind = value
+                    side = 'home' if team['id'] == home_id else 'away'
+                    with profiler.span('render', part=f"{side}-{kind}"):
+                        html = stream_fill(f"{side}-{kind}", tables[kind](team, initial))
+                    yield html
+                elif value is None:
+                    logger.error(f"Could not build the details page for {home_id} vs {away_id}")
+                    break
+                elif not skeleton_sent:
+                    # Another request built the view while this one waited; render it whole.
+                    with profiler.span('render', part='page'):
+                        html = matchup_page(value['home_team'], value['away_team'], periods, favorites)
+                    yield html
+                    return
+                else:
+                    with profiler.span('render', part='comparison'):
+                        html = stream_fill('comparison', team_card(value['away_team'], initial, favorites)
+                                           + team_card(value['home_team'], initial, favorites))
+                    yield html
+                    return
+    except Exception as e:
+        logger.error(f"Error streaming game_details for {home_id} vs {away_id}: {e}", exc_info=True)
+    # Headers are already sent, so send the browser home the way a redirect would.
+    yield Markup('<script>location.replace({});</script>').format(Markup(json.dumps(url_for('main.home'))))
+
 @main_bp.route('/details/<int:home_id>/<int:away_id>')
 def game_details(home_id: int, away_id: int):
-    """Renders the details page for a specific game."""
-    try:
-        home_team_data = MLBStatsAPI.get_team_info(home_id)
-        away_team_data = MLBStatsAPI.get_team_info(away_id)
+    """
+    Renders the details page for a specific game from its materialized view.
 
-        if not home_team_data or not away_team_data or 'teams' not in home_team_data or not home_team_data['teams']:
-            logger.error(f"Could not retrieve team info for home_id={home_id} or away_id={away_id}")
+    With no stored view the page is streamed (STREAM_DETAILS_PAGE): the page
+    header goes out at once and the rest follows as the fetches complete,
+    instead of holding the connection silent until every fetch is done.
+    """
+    periods = list(HITTER_PERIODS)
+    favorites = session.get('favorites', [])
+    try:
+        with profiler.span('stored_view'):
+            view = get_stored_matchup_view(home_id, away_id)
+        if view is None and current_app.config.get('STREAM_DETAILS_PAGE', True):
+            response = current_app.response_class(
+                stream_template('details.html', stream=_stream_matchup_page(home_id, away_id, periods, favorites),
+                                periods=periods, favorites=favorites),
+                mimetype='text/html')
+            # Keep reverse proxies from buffering the stream.
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        if view is None:
+            view = get_matchup_view(home_id, away_id)
+        if view is None:
             return redirect(url_for('main.home'))
 
-        home_team_info = home_team_data['teams'][0]
-        away_team_info = away_team_data['teams'][0]
-
-        home_roster = MLBStatsAPI.get_team_roster(home_id)
-        away_roster = MLBStatsAPI.get_team_roster(away_id)
-        
-        hitter_periods = {'7': 7, '10': 10, '21': 21}
-        pitcher_periods = {'7': 2, '10': 3, '21': 4}
-
-        home_batters = process_team_roster_in_parallel(home_roster['batters'][:15], 'hitting', hitter_periods)
-        away_batters = process_team_roster_in_parallel(away_roster['batters'][:15], 'hitting', hitter_periods)
-        home_pitchers = process_team_roster_in_parallel(home_roster['pitchers'][:15], 'pitching', pitcher_periods)
-        away_pitchers = process_team_roster_in_parallel(away_roster['pitchers'][:15], 'pitching', pitcher_periods)
-
-        home_team = {'id': home_id, 'name': home_team_info.get('name'), 'fullRoster': {'batters': {}, 'pitchers': {}}, 'rollingTeamStats': {}, 'gameHistory': {}}
-        away_team = {'id': away_id, 'name': away_team_info.get('name'), 'fullRoster': {'batters': {}, 'pitchers': {}}, 'rollingTeamStats': {}, 'gameHistory': {}}
-
-        for period in ['7', '10', '21']:
-            # Sort batters by At-Bats (ab) for the current period
-            home_team['fullRoster']['batters'][period] = sorted(home_batters, key=lambda p: p['stats_by_period'][period].get('ab', 0), reverse=True)
-            away_team['fullRoster']['batters'][period] = sorted(away_batters, key=lambda p: p['stats_by_period'][period].get('ab', 0), reverse=True)
-            
-            # Sort pitchers by Games Started (gs) for the current period
-            home_team['fullRoster']['pitchers'][period] = sorted(home_pitchers, key=lambda p: p['stats_by_period'][period].get('gs', 0), reverse=True)
-            away_team['fullRoster']['pitchers'][period] = sorted(away_pitchers, key=lambda p: p['stats_by_period'][period].get('gs', 0), reverse=True)
-
-            # Get game history and calculate rolling team stats
-            home_history = get_team_game_history(home_id, int(period))
-            away_history = get_team_game_history(away_id, int(period))
-            home_team['gameHistory'][period] = home_history
-            away_team['gameHistory'][period] = away_history
-            home_team['rollingTeamStats'][period] = calculate_rolling_team_stats(home_batters, home_pitchers, period, home_history['games_played'])
-            away_team['rollingTeamStats'][period] = calculate_rolling_team_stats(away_batters, away_pitchers, period, away_history['games_played'])
-
-        favorites = session.get('favorites', [])
-
-        return render_template('details.html', home_team=home_team, away_team=away_team, favorites=favorites)
+        # Only the first period is rendered; stats.js loads the others from load_stats_api on demand.
+        with profiler.cprofiled('render'):
+            return render_template('details.html', home_team=view['home_team'], away_team=view['away_team'], favorites=favorites, periods=periods)
     except Exception as e:
         logger.error(f"Error in game_details for {home_id} vs {away_id}: {e}", exc_info=True)
         return redirect(url_for('main.home'))
 
-@main_bp.route('/api/load-stats/<int:home_id>/<int:away_id>/<int:days>')
-def load_stats_api(home_id: int, away_id: int, days: int):
-    return jsonify({"message": "This API endpoint is no longer used by the primary UI.", "status": "success"})
+@main_bp.route('/api/load-stats/<int:home_id>/<int:away_id>/<period>')
+def load_stats_api(home_id: int, away_id: int, period: str):
+    """
+    Serves one period of a matchup's stats as JSON, for one team with
+    ?team=<id> or both teams otherwise.
+
+    The response carries a strong ETag of its body, so clients and caches
+    revalidating with If-None-Match get a 304 until the underlying data changes.
+    """
+    if period not in HITTER_PERIODS:
+        return jsonify({"status": "error", "message": f"Unknown period {period}."}), 404
+    team_id: Optional[int] = request.args.get('team', type=int)
+    if team_id is not None and team_id not in (home_id, away_id):
+        return jsonify({"status": "error", "message": f"Team {team_id} is not in this matchup."}), 404
+    try:
+        view = get_matchup_view(home_id, away_id)
+    except Exception as e:
+        logger.error(f"Error in load_stats_api for {home_id} vs {away_id}: {e}", exc_info=True)
+        view = None
+    if view is None:
+        return jsonify({"status": "error", "message": "Stats are unavailable for this matchup."}), 503
+
+    return _conditional_json({"status": "success", **matchup_period_slice(view, period, team_id)})
+
+def _conditional_json(payload: Dict[str, Any]) -> Response:
+    """A JSON response with a strong ETag of its body, answered with a 304 when the client's copy matches."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.sha1(body.encode('utf-8')).hexdigest())
+    # Always revalidate; an unchanged body costs a 304 with no body.
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def _with_team_abbreviations(board: Dict[str, Any]) -> Dict[str, Any]:
+    for leader in board['leaders']:
+        leader['team_abbr'] = TEAM_ABBREVIATIONS.get(leader['team'] or '', '')
+    return board
+
+@main_bp.route('/leaderboards')
+def leaderboards():
+    """Renders the league leaders in every ranked stat for one rolling window (?period=)."""
+    periods = list(HITTER_PERIODS)
+    period = request.args.get('period', periods[0])
+    if period not in HITTER_PERIODS:
+        period = periods[0]
+    boards = {stat: _with_team_abbreviations(leaderboard_index.top(stat, period)) for stat in LEADERBOARD_STATS}
+    current_date = datetime.now(pytz.timezone('US/Pacific')).strftime('%A, %B %d, %Y')
+    return render_template('leaderboards.html', boards=boards, periods=periods, period=period, current_date=current_date)
+
+@main_bp.route('/api/leaderboards/<stat>/<period>')
+def leaderboards_api(stat: str, period: str):
+    """
+    Serves the leaders in one stat over one rolling window as JSON, with
+    ?limit=<n> leaders (LEADERBOARD_SIZE by default). Like the stats API,
+    responses carry an ETag of their body.
+    """
+    stat = stat.lower()
+    if stat not in LEADERBOARD_STATS:
+        return jsonify({"status": "error", "message": f"Unknown stat {stat}; one of {', '.join(LEADERBOARD_STATS)}."}), 404
+    if period not in HITTER_PERIODS:
+        return jsonify({"status": "error", "message": f"Unknown period {period}."}), 404
+    board = leaderboard_index.top(stat, period, limit=request.args.get('limit', type=int))
+    return _conditional_json({"status": "success", **_with_team_abbreviations(board)})
+
+def _record_favorites(favorites: List[str]):
+    """
+    Records this session's favorite teams server-side, where the number of
+    recently seen sessions favoriting each team orders the overnight prefetch.
+    A session counts once per team however often it toggles, and drops out
+    FAVORITES_WINDOW_DAYS after it was last seen; the home page re-records
+    it at most once a day.
+    """
+    session_id = session.setdefault('session_id', secrets.token_urlsafe(16))
+    stats_store.set_favorites(session_id, [team_name for team_name in favorites if team_name in TEAM_ABBREVIATIONS])
+    session['favorites_seen'] = datetime.now(pytz.timezone('US/Pacific')).strftime('%Y-%m-%d')
 
 @main_bp.route('/favorites', methods=['POST'])
 def toggle_favorite():
@@ -121,13 +237,32 @@ def toggle_favorite():
         else:
             favorites.append(team_name)
         session['favorites'] = favorites
+        _record_favorites(favorites)
     return redirect(request.referrer or url_for('main.home'))
 
 @main_bp.route('/reset_favorites', methods=['POST'])
 def reset_favorites():
     session['favorites'] = []
+    _record_favorites([])
     return redirect(url_for('main.home'))
 
+@main_bp.route('/metrics')
+def metrics_endpoint():
+    """Exposes every worker's metrics in the Prometheus text format."""
+    if not metrics.authorized():
+        return jsonify({"status": "error", "message": "Metrics are not enabled for this client."}), 403
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@main_bp.route('/admin/profiles/<profile_id>')
+def get_profile(profile_id: str):
+    """Serves a stored request profile (see profiling.py)."""
+    if not profiler.authorized():
+        return jsonify({"status": "error", "message": "Profiling is not enabled for this client."}), 403
+    profile = profiler.get(profile_id)
+    if profile is None:
+        return jsonify({"status": "error", "message": f"No profile {profile_id}."}), 404
+    return jsonify(profile)
+
 @main_bp.route('/admin/clear-cache')
 def clear_cache():
     cache.clear()
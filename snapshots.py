@@ -0,0 +1,247 @@
+# snapshots.py
+
+"""
+Portable snapshots of the stats store, for warm starts.
+
+A snapshot is the store's dataset as one gzip-compressed file: the schedule,
+team info, rosters, player game logs and their fetch times. The league
+schedule also carries every team's game history. A new instance loads it at
+startup (SNAPSHOT_PATH) in seconds instead of spending tens of minutes of
+rate-limited calls to rebuild the day. Everything loaded keeps the fetch time
+it had when exported, so the usual freshness checks decide what is served
+as-is, and incremental syncs fetch only the games since the snapshot.
+
+The file is JSON lines: a header with the format version, creation time,
+season and each table's columns; one line per row; then a manifest with
+each table's row count and SHA-256 over its lines. Tables failing their
+check are skipped and the rest is loaded. A snapshot older than
+SNAPSHOT_MAX_AGE is loaded without the parts that go out of date, team info
+and rosters, and its game logs only seed incremental syncs.
+
+The leader exports a new snapshot to SNAPSHOT_PATH after each cache warmup.
+Snapshots can also be handled from the command line:
+
+    python -m snapshots export /data/mlb-snapshot.json.gz
+    python -m snapshots import /data/mlb-snapshot.json.gz
+    python -m snapshots info /data/mlb-snapshot.json.gz
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import logging
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers may each load the snapshot
+    fcntl = None
+
+from leaderboards import LeaderboardIndex, leaderboard_index
+from store import SNAPSHOT_TABLES, StatsStore, stats_store
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 'mlb-stats-snapshot'
+FORMAT_VERSION = 1
+# Parts of the dataset that change from day to day; a stale snapshot is loaded without them.
+VOLATILE_TABLES = ('teams', 'roster_entries')
+
+class SnapshotError(Exception):
+    """A snapshot file that can't be read, has an unsupported format, or is truncated."""
+
+def export_snapshot(path: str, store: StatsStore = stats_store) -> Dict[str, Any]:
+    """
+    Writes the store's dataset to a snapshot at path.
+
+    The file is written next to path and moved into place, so a reader
+    never sees a partial snapshot.
+
+    Returns:
+        The snapshot's header fields plus its manifest and size in bytes.
+    """
+    header = {'format': FORMAT, 'version': FORMAT_VERSION, 'created_at': time.time(),
+              'season': datetime.now().year, 'tables': {table: list(columns) for table, columns in SNAPSHOT_TABLES.items()}}
+    manifest = {}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    partial = f"{path}.{os.getpid()}.partial"
+    try:
+        with gzip.open(partial, 'wt', encoding='utf-8', compresslevel=6) as f, store.snapshot_view() as rows:
+            f.write(json.dumps(header) + '\n')
+            for table in SNAPSHOT_TABLES:
+                digest = hashlib.sha256()
+                count = 0
+                for row in rows(table):
+                    line = json.dumps([table, row], separators=(',', ':')) + '\n'
+                    digest.update(line.encode('utf-8'))
+                    f.write(line)
+                    count += 1
+                manifest[table] = {'rows': count, 'sha256': digest.hexdigest()}
+            f.write(json.dumps({'manifest': manifest}) + '\n')
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    size = os.path.getsize(path)
+    logger.info(f"Exported snapshot to {path}: {sum(t['rows'] for t in manifest.values())} rows, {size / 1e6:.1f} MB")
+    return dict(header, manifest=manifest, bytes=size)
+
+def read_header(path: str) -> Dict[str, Any]:
+    """Reads just a snapshot's header, checking its format and version."""
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+    except (OSError, EOFError, ValueError) as e:
+        raise SnapshotError(f"Could not read snapshot {path}: {e}")
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise SnapshotError(f"{path} is not a stats snapshot")
+    if header.get('version') != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot {path} has format version {header.get('version')}; this build reads {FORMAT_VERSION}")
+    return header
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], Dict[str, List[tuple]], List[str]]:
+    """
+    Reads a snapshot and checks every table against the manifest.
+
+    Returns:
+        The header, the rows of each table that passed its checks, and the
+        names of the tables that failed them (or whose columns no longer
+        match this build's schema).
+
+    Raises:
+        SnapshotError: If the file can't be read, is not a supported
+            snapshot, or is truncated.
+    """
+    header = read_header(path)
+    rows: Dict[str, List[tuple]] = {table: [] for table in header['tables']}
+    digests = {table: hashlib.sha256() for table in header['tables']}
+    trailer = None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                if line.startswith('{'):
+                    trailer = json.loads(line)
+                    break
+                table, row = json.loads(line)
+                digests[table].update(line.encode('utf-8'))
+                rows[table].append(tuple(row))
+            f.read()  # reaching the end verifies the gzip CRC
+    except (OSError, EOFError, ValueError, KeyError) as e:
+        raise SnapshotError(f"Could not read snapshot {path}: {e}")
+    if trailer is None or 'manifest' not in trailer:
+        raise SnapshotError(f"Snapshot {path} is truncated: it has no manifest")
+
+    verified, failed = {}, []
+    for table, expected in trailer['manifest'].items():
+        if (tuple(header['tables'].get(table, ())) != SNAPSHOT_TABLES.get(table)
+                or len(rows.get(table, ())) != expected['rows'] or digests[table].hexdigest() != expected['sha256']):
+            failed.append(table)
+        else:
+            verified[table] = rows[table]
+    return header, verified, failed
+
+def _marker(header: Dict[str, Any]) -> str:
+    """The fetch_log resource recording that a snapshot was loaded."""
+    return f"snapshot:{header['created_at']!r}"
+
+def import_snapshot(path: str, store: StatsStore = stats_store, max_age: float = 2 * 86400,
+                    index: Optional[LeaderboardIndex] = None) -> Dict[str, Any]:
+    """
+    Loads a snapshot into the store; see StatsStore.merge_snapshot for how
+    it is merged with what the store already holds.
+
+    Args:
+        max_age: Seconds after which the snapshot is stale and loaded
+            without its team info and rosters.
+        index: The store's leaderboard index, rebuilt if any game logs
+            were merged.
+
+    Returns:
+        The snapshot's age, the rows merged per table, and the tables skipped.
+    """
+    started = time.monotonic()
+    header, tables, skipped = read_snapshot(path)
+    for table in skipped:
+        logger.warning(f"Snapshot table {table} failed its integrity check; skipping it.")
+    age = time.time() - header['created_at']
+    if age > max_age:
+        for table in VOLATILE_TABLES:
+            if tables.pop(table, None) is not None:
+                skipped.append(table)
+    if header.get('season') != datetime.now().year and tables.pop('player_game_logs', None) is not None:
+        skipped.append('player_game_logs')  # last season's logs seed nothing
+    merged = store.merge_snapshot(tables, marker=_marker(header))
+    if index is not None and merged.get('player_game_logs'):
+        index.rebuild()
+    logger.info(f"Loaded snapshot {path} ({age / 3600:.1f}h old) in {time.monotonic() - started:.1f}s: "
+                f"{merged}" + (f", skipped {skipped}" if skipped else ""))
+    return {'created_at': header['created_at'], 'age': age, 'merged': merged, 'skipped': skipped}
+
+def load_on_startup(app) -> Optional[Dict[str, Any]]:
+    """
+    Loads SNAPSHOT_PATH into the stats store unless this host already has.
+
+    Workers take an flock next to CACHE_DIR, so the first one loads the
+    snapshot and the others find it recorded in the store and skip it.
+    A bad snapshot is logged and the app starts cold.
+    """
+    path = app.config.get('SNAPSHOT_PATH')
+    if not path or not stats_store.enabled or not os.path.exists(path):
+        return None
+    lock_file = None
+    cache_dir = app.config.get('CACHE_DIR')
+    if fcntl is not None and cache_dir:
+        lock_dir = f"{cache_dir.rstrip(os.sep)}-locks"
+        os.makedirs(lock_dir, exist_ok=True)
+        lock_file = open(os.path.join(lock_dir, 'snapshot.lock'), 'a+')
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+    try:
+        if stats_store.fetched_at(_marker(read_header(path))) is not None:
+            return None
+        return import_snapshot(path, max_age=app.config.get('SNAPSHOT_MAX_AGE', 2 * 86400), index=leaderboard_index)
+    except (SnapshotError, OSError) as e:
+        logger.error(f"Not loading snapshot {path}: {e}")
+        return None
+    finally:
+        if lock_file is not None:
+            lock_file.close()  # releases the flock
+
+def main(argv=None):
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Export, import or inspect stats store snapshots.')
+    parser.add_argument('command', choices=('export', 'import', 'info'))
+    parser.add_argument('path')
+    parser.add_argument('--db', default=Config.STATS_DB_PATH, help='The stats store (default: STATS_DB_PATH).')
+    parser.add_argument('--max-age', type=float, default=Config.SNAPSHOT_MAX_AGE,
+                        help='Seconds after which a snapshot is loaded without team info and rosters.')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        if args.command == 'info':
+            header, tables, failed = read_snapshot(args.path)
+            print(json.dumps({'created_at': datetime.fromtimestamp(header['created_at']).isoformat(timespec='seconds'),
+                              'season': header.get('season'), 'rows': {table: len(rows) for table, rows in tables.items()},
+                              'failed': failed}, indent=2))
+            return
+        store = StatsStore()
+        store.open(args.db)
+        if args.command == 'export':
+            export_snapshot(args.path, store)
+        else:
+            index = LeaderboardIndex(store, min_pa_per_game=Config.LEADERBOARD_MIN_PA_PER_GAME,
+                                     min_ip_per_appearance=Config.LEADERBOARD_MIN_IP_PER_APPEARANCE)
+            import_snapshot(args.path, store, max_age=args.max_age, index=index)
+    except SnapshotError as e:
+        parser.exit(1, f"{e}\n")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# stat_columns.py
+
+"""
+Compact, columnar storage for a player's game logs.
+
+Raw Stats API splits are projected once into a GameLog: fixed integer columns
+per game, most recent game first, with innings stored as outs. That is what
+gets cached, instead of the full split dicts. PlayerStatColumns then reduces
+a GameLog to running totals, so totals for any window of recent games
+(last 3, last 21, season-to-date, ...) are a single subtraction.
+
+Both carry SCHEMA_VERSION; cached entries written under another version are
+treated as misses and rebuilt (see is_current).
+"""
+from array import array
+from datetime import date
+from typing import Dict, Any, List, Optional
+
+# Bump whenever the layout of GameLog or PlayerStatColumns changes.
+SCHEMA_VERSION = 2
+
+# Columns kept for each stat group. Innings are stored as integer outs.
+HITTING_COLUMNS = ('ab', 'h', 'hr', 'rbi', 'bb', 'tb', 'k')
+PITCHING_COLUMNS = ('outs', 'er', 'h', 'r', 'bb', 'k', 'sv', 'gs')
+
+# Stats API split field behind each column.
+HITTING_FIELDS = {
+    'ab': 'atBats', 'h': 'hits', 'hr': 'homeRuns', 'rbi': 'rbi',
+    'bb': 'baseOnBalls', 'tb': 'totalBases', 'k': 'strikeOuts',
+}
+PITCHING_FIELDS = {
+    'er': 'earnedRuns', 'h': 'hits', 'r': 'runs', 'bb': 'baseOnBalls',
+    'k': 'strikeOuts', 'sv': 'saves', 'gs': 'gamesStarted',
+}
+
+# Rolling windows shown on the details page and the leaderboards, keyed by tab. Values are
+# the number of most recent games (appearances for pitchers); None is season-to-date.
+HITTER_PERIODS: Dict[str, Optional[int]] = {'7': 7, '10': 10, '21': 21}
+PITCHER_PERIODS: Dict[str, Optional[int]] = {'7': 2, '10': 3, '21': 4}
+# Days of team game history behind each tab's record and team stats; None is season-to-date.
+PERIOD_DAYS: Dict[str, Optional[int]] = {'7': 7, '10': 10, '21': 21}
+# Tab labels for each period key.
+PERIOD_LABELS: Dict[str, str] = {'7': '7 Days', '10': '10 Days', '21': '21 Days'}
+
+def innings_to_outs(innings_pitched: Any) -> int:
+    """Converts an inningsPitched value such as '6.2' (6 innings, 2 outs) to outs recorded."""
+    ip_str = str(innings_pitched or '0')
+    if '.' in ip_str:
+        whole, partial = ip_str.split('.', 1)
+        return int(whole or 0) * 3 + int(partial or 0)
+    return int(float(ip_str) * 3)
+
+def is_current(value: Any) -> bool:
+    """Whether a cached GameLog or PlayerStatColumns was written with the current schema."""
+    return getattr(value, 'schema', None) == SCHEMA_VERSION
+
+class GameLog:
+    """
+    A player's season game log as fixed-schema integer columns, most recent game first.
+
+    Every game in the log is kept, including ones without an at-bat or an out
+    recorded; PlayerStatColumns decides which count as appearances.
+    """
+    __slots__ = ('schema', 'stat_type', 'game_pks', 'dates', 'values')
+
+    def __init__(self, stat_type: str, splits: List[Dict[str, Any]]):
+        """
+        Args:
+            stat_type: 'hitting' or 'pitching'.
+            splits: Game log splits from the Stats API, sorted by date descending.
+        """
+        self.schema = SCHEMA_VERSION
+        self.stat_type = stat_type
+        names = HITTING_COLUMNS if stat_type == 'hitting' else PITCHING_COLUMNS
+        fields = HITTING_FIELDS if stat_type == 'hitting' else PITCHING_FIELDS
+        # 32-bit columns: per-game counts, gamePks and date ordinals all fit.
+        self.game_pks = array('i')
+        self.dates = array('i')  # proleptic Gregorian ordinals
+        self.values: Dict[str, array] = {name: array('i') for name in names}
+
+        for split in splits:
+            stat = split.get('stat', {})
+            self.game_pks.append(split.get('game', {}).get('gamePk') or 0)
+            self.dates.append(date.fromisoformat(split['date']).toordinal() if split.get('date') else 0)
+            for name, column in self.values.items():
+                if name == 'outs':
+                    column.append(innings_to_outs(stat.get('inningsPitched', '0')))
+                else:
+                    column.append(int(stat.get(fields[name], 0) or 0))
+
+    def __len__(self) -> int:
+        return len(self.game_pks)
+
+    @property
+    def latest_date(self) -> Optional[str]:
+        """ISO date of the most recent game in the log, or None if it is empty."""
+        return date.fromordinal(self.dates[0]).isoformat() if self.dates and self.dates[0] else None
+
+class PlayerStatColumns:
+    """
+    Prefix sums over one player's appearances, most recent first.
+
+    Only games the player actually appeared in are kept: hitting logs with
+    at least one at-bat and pitching logs with at least one out recorded.
+    """
+    __slots__ = ('schema', 'stat_type', 'games', 'sums')
+
+    def __init__(self, stat_type: str, game_log: GameLog):
+        """
+        Args:
+            stat_type: 'hitting' or 'pitching'.
+            game_log: The player's GameLog for that stat group.
+        """
+        self.schema = SCHEMA_VERSION
+        self.stat_type = stat_type
+        names = HITTING_COLUMNS if stat_type == 'hitting' else PITCHING_COLUMNS
+        self.sums: Dict[str, array] = {name: array('l', [0]) for name in names}
+
+        appeared = game_log.values['ab' if stat_type == 'hitting' else 'outs']
+        for i in range(len(game_log)):
+            if appeared[i] <= 0:
+                continue
+            for name, column in self.sums.items():
+                column.append(column[-1] + game_log.values[name][i])
+
+        self.games = len(self.sums[names[0]]) - 1
+
+    def __len__(self) -> int:
+        return self.games
+
+    def window(self, num_games: Optional[int] = None, skip: int = 0) -> Dict[str, int]:
+        """
+        Returns stat totals over a window of recent games.
+
+        Args:
+            num_games: Number of games in the window; None for season-to-date.
+            skip: Number of most recent games to skip before the window starts.
+
+        Returns:
+            A dictionary of column totals plus 'games', the number of games
+            actually covered.
+        """
+        start = min(skip, self.games)
+        end = self.games if num_games is None else min(start + num_games, self.games)
+        totals = {name: column[end] - column[start] for name, column in self.sums.items()}
+        totals['games'] = end - start
+        return totals
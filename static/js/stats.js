@@ -4,6 +4,100 @@ document.addEventListener('DOMContentLoaded', function() {
     const statsControls = document.querySelector('.stats-controls');
     if (!statsControls) return; // Exit if not on the details page
 
+    const teamView = document.querySelector('.team-view');
+    const homeId = teamView.dataset.homeId;
+    const awayId = teamView.dataset.awayId;
+    const loading = {}; // period -> Promise of its rendered windows
+
+    const escapeHtml = (value) => String(value ?? '').replace(/[&<>"']/g, ch => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    }[ch]));
+
+    // The favorite forms depend on the session, so they are copied from the
+    // server-rendered cards rather than served by the (cacheable) stats API.
+    const [awayFavorite, homeFavorite] = Array.from(
+        document.querySelectorAll(`.stat-${teamView.dataset.initialPeriod} .favorite-control`), el => el.outerHTML);
+
+    const teamCard = (team, favoriteControl) => {
+        const s = team.team_stats;
+        const item = (label, value) => `<div class="stat-item"><div class="stat-label">${label}</div><div class="stat-value">${escapeHtml(value)}</div></div>`;
+        return `
+            <div class="team-card">
+                <h4>${escapeHtml(team.name)}</h4>
+                <div class="record">(${escapeHtml(team.record)})</div>
+                <div class="team-stats">
+                    ${item('Team AVG', s.AVG)}${item('Team OBP', s.OBP)}${item('Team SLG', s.SLG)}
+                    ${item('Home Runs', s.HR)}${item('Avg Hits', s.AVG_HITS)}${item('Avg K', s.AVG_K)}
+                </div>
+                ${favoriteControl || ''}
+            </div>`;
+    };
+
+    const cell = (row, stat) => `<td class="${row.classes[stat] || ''}">${escapeHtml(row.stats[stat])}</td>`;
+    const plain = (row, stat) => `<td>${escapeHtml(row.stats[stat])}</td>`;
+
+    const battersTable = (rows) => `
+        <table class="stats-table batters-table">
+            <thead><tr><th>Player</th><th>Pos</th><th>AVG</th><th>SLG</th><th>OBP</th><th>HR</th><th>K</th><th>RBI</th><th>H</th><th>AB</th></tr></thead>
+            <tbody>${rows.length ? rows.map(row => `
+                <tr>
+                    <td class="player-name">${escapeHtml(row.name)}</td>
+                    <td><span class="position">${escapeHtml(row.position)}</span></td>
+                    ${cell(row, 'avg')}${cell(row, 'slg')}${cell(row, 'obp')}
+                    ${['hr', 'k', 'rbi', 'h', 'ab'].map(stat => plain(row, stat)).join('')}
+                </tr>`).join('') : '<tr><td colspan="10" class="loading-message">No batter data.</td></tr>'}
+            </tbody>
+        </table>`;
+
+    const pitchersTable = (rows) => `
+        <table class="stats-table pitchers-table">
+            <thead><tr><th>Player</th><th>ERA</th><th>WHIP</th><th>GS</th><th>IP</th><th>SV</th><th>H</th><th>R</th><th>K</th><th>BB</th></tr></thead>
+            <tbody>${rows.length ? rows.map(row => `
+                <tr>
+                    <td class="player-name">${escapeHtml(row.name)}</td>
+                    ${cell(row, 'era')}${cell(row, 'whip')}
+                    ${['gs', 'ip', 'sv', 'h', 'r', 'k', 'bb'].map(stat => plain(row, stat)).join('')}
+                </tr>`).join('') : '<tr><td colspan="10" class="loading-message">No pitcher data.</td></tr>'}
+            </tbody>
+        </table>`;
+
+    // Fetches a period from the stats API once and fills in its placeholders.
+    // The browser revalidates with the response's ETag, so reloads get a 304.
+    const loadPeriod = (period) => {
+        const placeholders = document.querySelectorAll(`.stat-window[data-period="${period}"]`);
+        if (!placeholders.length) return Promise.resolve();
+        if (!loading[period]) {
+            placeholders.forEach(el => { el.innerHTML = '<div class="loading-message">Loading stats...</div>'; });
+            loading[period] = fetch(`/api/load-stats/${homeId}/${awayId}/${period}`)
+                .then(response => {
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    return response.json();
+                })
+                .then(data => {
+                    const { home, away } = data.teams;
+                    const slots = {
+                        'comparison': teamCard(away, awayFavorite) + teamCard(home, homeFavorite),
+                        'away-batters': battersTable(away.batters),
+                        'away-pitchers': pitchersTable(away.pitchers),
+                        'home-batters': battersTable(home.batters),
+                        'home-pitchers': pitchersTable(home.pitchers),
+                    };
+                    placeholders.forEach(el => {
+                        el.innerHTML = slots[el.dataset.slot];
+                        delete el.dataset.period;
+                    });
+                })
+                .catch(error => {
+                    delete loading[period]; // let the next click retry
+                    placeholders.forEach(el => {
+                        el.innerHTML = '<div class="loading-message">Could not load stats. Try again.</div>';
+                    });
+                    console.error(`Failed to load ${period} stats:`, error);
+                });
+        }
+        return loading[period];
+    };
+
     statsControls.addEventListener('click', (e) => {
         if (e.target.matches('.tab-btn') && !e.target.classList.contains('active-tab')) {
             const period = e.target.id.replace('tab-', '');
@@ -21,6 +115,7 @@ document.addEventListener('DOMContentLoaded', function() {
             document.querySelectorAll(`.stat-${period}`).forEach(el => {
                 el.style.display = el.classList.contains('team-comparison') ? 'flex' : 'block';
             });
+            loadPeriod(period);
         }
     });
 });
@@ -0,0 +1,523 @@
+# store.py
+
+"""
+Persistent stats store shared by all gunicorn workers.
+
+An embedded SQLite database in WAL mode holding normalized tables for games,
+teams, rosters and player game logs. MLBStatsAPI writes every upstream
+response through to it and reads from it before going upstream, so a restart
+or redeploy doesn't throw away data already fetched under the rate limit.
+WAL lets any number of readers run alongside the single writer.
+"""
+import os
+import json
+import time
+import logging
+import sqlite3
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetch_log (
+    resource TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    game_pk INTEGER PRIMARY KEY,
+    official_date TEXT NOT NULL,
+    game_date TEXT,
+    abstract_state TEXT,
+    detailed_state TEXT,
+    home_id INTEGER,
+    away_id INTEGER,
+    home_score INTEGER,
+    away_score INTEGER,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_by_date ON games (official_date);
+CREATE TABLE IF NOT EXISTS teams (
+    team_id INTEGER PRIMARY KEY,
+    name TEXT,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roster_entries (
+    team_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    player_id INTEGER NOT NULL,
+    name TEXT,
+    position TEXT,
+    is_pitcher INTEGER NOT NULL,
+    PRIMARY KEY (team_id, slot)
+);
+CREATE INDEX IF NOT EXISTS roster_entries_by_player ON roster_entries (player_id);
+CREATE TABLE IF NOT EXISTS player_game_logs (
+    player_id INTEGER NOT NULL,
+    stat_group TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    game_pk INTEGER NOT NULL,
+    game_date TEXT,
+    split TEXT NOT NULL,
+    PRIMARY KEY (player_id, stat_group, season, game_pk)
+);
+CREATE TABLE IF NOT EXISTS player_windows (
+    season INTEGER NOT NULL,
+    stat_group TEXT NOT NULL,
+    period TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    team_id INTEGER,
+    line TEXT NOT NULL,
+    PRIMARY KEY (season, stat_group, period, player_id)
+);
+CREATE TABLE IF NOT EXISTS leaderboard_entries (
+    season INTEGER NOT NULL,
+    stat TEXT NOT NULL,
+    period TEXT NOT NULL,
+    player_id INTEGER NOT NULL,
+    value REAL NOT NULL,
+    qualified INTEGER NOT NULL,
+    PRIMARY KEY (season, stat, period, player_id)
+);
+CREATE INDEX IF NOT EXISTS leaderboard_rank ON leaderboard_entries (season, stat, period, qualified, value, player_id);
+-- Replaced by favorite_sessions: its running totals could be inflated by toggling.
+DROP TABLE IF EXISTS team_favorites;
+CREATE TABLE IF NOT EXISTS favorite_sessions (
+    session_id TEXT NOT NULL,
+    team_name TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (session_id, team_name)
+);
+CREATE INDEX IF NOT EXISTS favorite_sessions_by_time ON favorite_sessions (seen_at);
+"""
+
+# Tables and columns carried by dataset snapshots (see snapshots.py).
+SNAPSHOT_TABLES: Dict[str, Tuple[str, ...]] = {
+    'fetch_log': ('resource', 'fetched_at'),
+    'games': ('game_pk', 'official_date', 'game_date', 'abstract_state', 'detailed_state',
+              'home_id', 'away_id', 'home_score', 'away_score', 'payload'),
+    'teams': ('team_id', 'name', 'payload'),
+    'roster_entries': ('team_id', 'slot', 'player_id', 'name', 'position', 'is_pitcher'),
+    'player_game_logs': ('player_id', 'stat_group', 'season', 'game_pk', 'game_date', 'split'),
+}
+
+# The fetch_log resources whose rows live in each table, as (resource prefix, SQL building it from a row).
+_RESOURCE_KEYS = {
+    'teams': ('team:', "'team:' || s.team_id"),
+    'roster_entries': ('roster:', "'roster:' || s.team_id"),
+    'player_game_logs': ('game_logs:', "'game_logs:' || s.stat_group || ':' || s.season || ':' || s.player_id"),
+}
+
+def _safe(default=None):
+    """Logs and swallows SQLite errors; the store is never allowed to fail a fetch."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.Error as e:
+                logger.error(f"Stats store error in {method.__name__}: {e}")
+                return default
+        return wrapper
+    return decorator
+
+class StatsStore:
+    """Thread-safe access to the SQLite stats store, one connection per thread."""
+    def __init__(self, path: Optional[str] = None, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def init_app(self, app):
+        """Opens the database at STATS_DB_PATH and creates the schema."""
+        self.open(app.config.get('STATS_DB_PATH', self.path))
+
+    def open(self, path: Optional[str]):
+        """Opens the database at path, creating it and the schema if needed."""
+        self.path = path
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections must not cross a fork; gunicorn workers each open their own.
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _mark_fetched(conn: sqlite3.Connection, resource: str, fetched_at: Optional[float] = None):
+        conn.execute('INSERT OR REPLACE INTO fetch_log (resource, fetched_at) VALUES (?, ?)',
+                     (resource, time.time() if fetched_at is None else fetched_at))
+
+    @_safe()
+    def fetched_at(self, resource: str) -> Optional[float]:
+        """Returns when a resource was last fetched from upstream, or None."""
+        if not self.enabled:
+            return None
+        row = self._connection().execute('SELECT fetched_at FROM fetch_log WHERE resource = ?', (resource,)).fetchone()
+        return row[0] if row else None
+
+    @_safe()
+    def mark_fetched(self, resource: str):
+        """Records that a resource was fetched, or a derived one built, just now."""
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            self._mark_fetched(conn, resource)
+
+    @_safe()
+    def expire(self, resource: str):
+        """Marks a resource as needing a fetch, keeping its stored rows."""
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            conn.execute('UPDATE fetch_log SET fetched_at = 0 WHERE resource = ?', (resource,))
+
+    # Games and schedules
+
+    @staticmethod
+    def _upsert_game(conn: sqlite3.Connection, game: Dict[str, Any], official_date: str):
+        teams = game.get('teams', {})
+        home, away = teams.get('home', {}), teams.get('away', {})
+        status = game.get('status', {})
+        conn.execute(
+            'INSERT OR REPLACE INTO games (game_pk, official_date, game_date, abstract_state, detailed_state, '
+            'home_id, away_id, home_score, away_score, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (game.get('gamePk'), game.get('officialDate') or official_date, game.get('gameDate'),
+             status.get('abstractGameState'), status.get('detailedState'),
+             home.get('team', {}).get('id'), away.get('team', {}).get('id'),
+             home.get('score'), away.get('score'), json.dumps(game)))
+
+    @_safe()
+    def put_schedule(self, resource: str, dates: List[Dict[str, Any]]):
+        """Upserts every game in a schedule response's 'dates' list."""
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            for date_entry in dates:
+                for game in date_entry.get('games', []):
+                    if game.get('gamePk') is not None:
+                        self._upsert_game(conn, game, date_entry.get('date', ''))
+            self._mark_fetched(conn, resource)
+
+    @_safe()
+    def get_schedule(self, start_date: str, end_date: str) -> Optional[List[Dict[str, Any]]]:
+        """Returns stored games between two dates as a schedule-style 'dates' list."""
+        if not self.enabled:
+            return None
+        rows = self._connection().execute(
+            'SELECT official_date, payload FROM games WHERE official_date BETWEEN ? AND ? '
+            'ORDER BY official_date, game_date, game_pk', (start_date, end_date)).fetchall()
+        dates: List[Dict[str, Any]] = []
+        for official_date, payload in rows:
+            if not dates or dates[-1]['date'] != official_date:
+                dates.append({'date': official_date, 'games': []})
+            dates[-1]['games'].append(json.loads(payload))
+        return dates
+
+    # Teams and rosters
+
+    @_safe()
+    def put_team_info(self, team_id: int, payload: Dict[str, Any]):
+        if not self.enabled:
+            return
+        teams = payload.get('teams') or [{}]
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO teams (team_id, name, payload) VALUES (?, ?, ?)',
+                         (team_id, teams[0].get('name'), json.dumps(payload)))
+            self._mark_fetched(conn, f"team:{team_id}")
+
+    @_safe()
+    def get_team_info(self, team_id: int) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        row = self._connection().execute('SELECT payload FROM teams WHERE team_id = ?', (team_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @_safe()
+    def put_roster(self, team_id: int, roster: Dict[str, List[Dict[str, Any]]]):
+        """Replaces a team's stored roster, keeping the API's player order."""
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM roster_entries WHERE team_id = ?', (team_id,))
+            players = [(p, 0) for p in roster.get('batters', [])] + [(p, 1) for p in roster.get('pitchers', [])]
+            conn.executemany(
+                'INSERT INTO roster_entries (team_id, slot, player_id, name, position, is_pitcher) VALUES (?, ?, ?, ?, ?, ?)',
+                [(team_id, slot, p['id'], p['name'], p['position'], is_pitcher) for slot, (p, is_pitcher) in enumerate(players)])
+            self._mark_fetched(conn, f"roster:{team_id}")
+
+    @_safe()
+    def get_roster(self, team_id: int) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        if not self.enabled or self.fetched_at(f"roster:{team_id}") is None:
+            return None
+        roster = {'batters': [], 'pitchers': []}
+        for player_id, name, position, is_pitcher in self._connection().execute(
+                'SELECT player_id, name, position, is_pitcher FROM roster_entries WHERE team_id = ? ORDER BY slot', (team_id,)):
+            roster['pitchers' if is_pitcher else 'batters'].append({'id': player_id, 'name': name, 'position': position})
+        return roster
+
+    # Player game logs
+
+    @staticmethod
+    def game_log_resource(player_id: int, stat_group: str, season: int) -> str:
+        return f"game_logs:{stat_group}:{season}:{player_id}"
+
+    @_safe()
+    def put_game_logs(self, player_id: int, stat_group: str, season: int, splits: List[Dict[str, Any]]):
+        """Upserts game log splits by gamePk and records the sync time."""
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO player_game_logs (player_id, stat_group, season, game_pk, game_date, split) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(player_id, stat_group, season, split['game']['gamePk'], split.get('date'), json.dumps(split))
+                 for split in splits if split.get('game', {}).get('gamePk') is not None])
+            self._mark_fetched(conn, self.game_log_resource(player_id, stat_group, season))
+
+    @_safe()
+    def get_game_logs(self, player_id: int, stat_group: str, season: int) -> Optional[List[Dict[str, Any]]]:
+        """Returns a player's stored season log, most recent first, or None if it was never synced."""
+        if not self.enabled or self.fetched_at(self.game_log_resource(player_id, stat_group, season)) is None:
+            return None
+        rows = self._connection().execute(
+            'SELECT split FROM player_game_logs WHERE player_id = ? AND stat_group = ? AND season = ? '
+            'ORDER BY game_date DESC, game_pk DESC', (player_id, stat_group, season)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    @_safe(default=(None, None))
+    def get_game_log_sync(self, player_id: int, stat_group: str, season: int) -> Tuple[Optional[float], Optional[str]]:
+        """Returns (last sync time, date of the latest stored game) for a player's season log."""
+        if not self.enabled:
+            return None, None
+        synced_at = self.fetched_at(self.game_log_resource(player_id, stat_group, season))
+        row = self._connection().execute(
+            'SELECT MAX(game_date) FROM player_game_logs WHERE player_id = ? AND stat_group = ? AND season = ?',
+            (player_id, stat_group, season)).fetchone()
+        return synced_at, row[0] if row else None
+
+    @_safe(default=[])
+    def game_log_players(self, season: int) -> List[Tuple[int, str]]:
+        """Returns (player_id, stat_group) for every player with a stored season log."""
+        if not self.enabled:
+            return []
+        return self._connection().execute(
+            'SELECT DISTINCT player_id, stat_group FROM player_game_logs WHERE season = ?', (season,)).fetchall()
+
+    # Leaderboards
+
+    @_safe()
+    def put_player_windows(self, season: int, stat_group: str, player_id: int, team_id: Optional[int],
+                           windows: Dict[str, Optional[Tuple[int, Dict[str, Any]]]],
+                           entries: Dict[Tuple[str, str], Optional[Tuple[float, bool]]]):
+        """
+        Replaces a player's rolling-window lines and leaderboard entries.
+
+        Args:
+            windows: Period to (games in the window, formatted stat line),
+                or None to remove the period.
+            entries: (stat, period) to (value, qualified), or None to remove
+                the player from that leaderboard.
+        """
+        if not self.enabled:
+            return
+        with self._transaction() as conn:
+            conn.executemany('DELETE FROM player_windows WHERE season = ? AND stat_group = ? AND period = ? AND player_id = ?',
+                             [(season, stat_group, period, player_id) for period, window in windows.items() if window is None])
+            conn.executemany(
+                'INSERT OR REPLACE INTO player_windows (season, stat_group, period, player_id, games, team_id, line) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(season, stat_group, period, player_id, window[0], team_id, json.dumps(window[1]))
+                 for period, window in windows.items() if window is not None])
+            conn.executemany('DELETE FROM leaderboard_entries WHERE season = ? AND stat = ? AND period = ? AND player_id = ?',
+                             [(season, stat, period, player_id) for (stat, period), entry in entries.items() if entry is None])
+            conn.executemany(
+                'INSERT OR REPLACE INTO leaderboard_entries (season, stat, period, player_id, value, qualified) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(season, stat, period, player_id, entry[0], int(entry[1]))
+                 for (stat, period), entry in entries.items() if entry is not None])
+
+    @_safe(default=[])
+    def get_leaders(self, season: int, stat: str, stat_group: str, period: str, limit: int,
+                    descending: bool = True) -> List[Dict[str, Any]]:
+        """
+        Returns the top qualified players for a stat and period, best first.
+
+        Walks the leaderboard_rank index from the best end, so the cost
+        depends on limit and not on how many players are indexed. Ties are
+        broken by player id.
+        """
+        if not self.enabled:
+            return []
+        order = 'DESC' if descending else 'ASC'
+        # A traded player can be on more than one stored roster: their team is the one of
+        # their latest game, else the most recently fetched roster listing them.
+        latest_roster = ("(SELECT r.{column} FROM roster_entries r LEFT JOIN fetch_log f ON f.resource = 'roster:' || r.team_id "
+                         "WHERE r.player_id = l.player_id ORDER BY f.fetched_at DESC, r.team_id LIMIT 1)")
+        rows = self._connection().execute(
+            'SELECT l.player_id, l.value, w.games, w.line, '
+            '(SELECT name FROM roster_entries WHERE player_id = l.player_id AND team_id = w.team_id LIMIT 1), '
+            f"{latest_roster.format(column='name')}, "
+            f"COALESCE(w.team_id, {latest_roster.format(column='team_id')}) "
+            'FROM leaderboard_entries l JOIN player_windows w ON w.season = l.season AND w.stat_group = ? '
+            'AND w.period = l.period AND w.player_id = l.player_id '
+            'WHERE l.season = ? AND l.stat = ? AND l.period = ? AND l.qualified = 1 '
+            f"ORDER BY l.value {order}, l.player_id {order} LIMIT ?",
+            (stat_group, season, stat, period, limit)).fetchall()
+        team_names = {}
+        leaders = []
+        for player_id, value, games, line, name_on_team, latest_name, team_id in rows:
+            name = name_on_team or latest_name
+            if team_id is not None and team_id not in team_names:
+                row = self._connection().execute('SELECT name FROM teams WHERE team_id = ?', (team_id,)).fetchone()
+                team_names[team_id] = row[0] if row else None
+            leaders.append({'id': player_id, 'value': value, 'games': games, 'line': json.loads(line), 'name': name,
+                            'team_id': team_id, 'team': team_names.get(team_id)})
+        return leaders
+
+    # Team popularity
+
+    @_safe()
+    def set_favorites(self, session_id: str, team_names: Iterable[str]):
+        """Records a session's current favorite teams, replacing the ones recorded before."""
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM favorite_sessions WHERE session_id = ?', (session_id,))
+            conn.executemany('INSERT OR IGNORE INTO favorite_sessions (session_id, team_name, seen_at) VALUES (?, ?, ?)',
+                             [(session_id, team_name, now) for team_name in team_names])
+
+    @_safe(default={})
+    def favorite_counts(self, max_age: float) -> Dict[str, int]:
+        """
+        Returns how many sessions seen in the last max_age seconds have each
+        team as a favorite, by team name. Older sessions are pruned.
+        """
+        if not self.enabled:
+            return {}
+        cutoff = time.time() - max_age
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM favorite_sessions WHERE seen_at < ?', (cutoff,))
+            return dict(conn.execute('SELECT team_name, COUNT(*) FROM favorite_sessions GROUP BY team_name'))
+
+    # Snapshots
+
+    @contextmanager
+    def snapshot_view(self) -> Iterator[Callable[[str], Iterable[tuple]]]:
+        """
+        A consistent read of all snapshot tables: yields rows(table), which
+        iterates over one table's rows in SNAPSHOT_TABLES column order.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            yield lambda table: conn.execute(f"SELECT {', '.join(SNAPSHOT_TABLES[table])} FROM {table}")
+        finally:
+            conn.execute('COMMIT')
+
+    def merge_snapshot(self, tables: Dict[str, Iterable[tuple]], marker: Optional[str] = None) -> Dict[str, int]:
+        """
+        Merges snapshot rows into the store in one transaction; where both
+        have the same data, the more recently fetched copy wins.
+
+        A team's info or roster, or a player's season log, is taken only if the
+        snapshot fetched it later than this store did, and its fetch time comes
+        with it, so freshness checks and incremental syncs carry on from where
+        the exporting instance left off. Games are upserted, except over a game
+        already final here. Tables left out of `tables` are not touched, and
+        neither are their fetch_log entries.
+
+        Args:
+            tables: Rows by table name, in SNAPSHOT_TABLES column order.
+            marker: A fetch_log resource to record in the same transaction,
+                e.g. to tell that this snapshot has been loaded.
+
+        Returns:
+            The number of rows merged into each table.
+        """
+        if not self.enabled:
+            return {}
+        merged: Dict[str, int] = {}
+        with self._transaction() as conn:
+            for table, rows in tables.items():
+                columns = ', '.join(SNAPSHOT_TABLES[table])
+                conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS staged_{table} AS SELECT {columns} FROM {table} WHERE 0")
+                conn.execute(f"DELETE FROM staged_{table}")
+                conn.executemany(f"INSERT INTO staged_{table} VALUES ({', '.join('?' * len(SNAPSHOT_TABLES[table]))})", rows)
+
+            # The resources the snapshot holds a newer copy of, limited to the tables being merged.
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS taken (resource TEXT PRIMARY KEY, fetched_at REAL)')
+            conn.execute('DELETE FROM taken')
+            prefixes = [prefix for table, (prefix, _) in _RESOURCE_KEYS.items() if table in tables]
+            if 'games' in tables:
+                prefixes += ['schedule:', 'league_schedule:']
+            if 'fetch_log' in tables and prefixes:
+                conn.execute(
+                    'INSERT INTO taken SELECT s.resource, s.fetched_at FROM staged_fetch_log s '
+                    'LEFT JOIN fetch_log f ON f.resource = s.resource '
+                    'WHERE (f.resource IS NULL OR f.fetched_at < s.fetched_at) AND ('
+                    + ' OR '.join('s.resource LIKE ?' for _ in prefixes) + ')',
+                    [f"{prefix}%" for prefix in prefixes])
+
+            for table in tables:
+                if table == 'fetch_log':
+                    continue
+                columns = ', '.join(SNAPSHOT_TABLES[table])
+                staged = ', '.join(f"s.{column}" for column in SNAPSHOT_TABLES[table])
+                if table == 'roster_entries':
+                    # A roster is replaced whole, as put_roster does.
+                    conn.execute("DELETE FROM roster_entries WHERE 'roster:' || team_id IN (SELECT resource FROM taken)")
+                before = conn.total_changes
+                if table == 'games':
+                    updates = ', '.join(f"{column} = excluded.{column}" for column in SNAPSHOT_TABLES['games'][1:])
+                    conn.execute(f"INSERT INTO games ({columns}) SELECT {staged} FROM staged_games s WHERE true "
+                                 f"ON CONFLICT (game_pk) DO UPDATE SET {updates} WHERE games.abstract_state IS NOT 'Final'")
+                else:
+                    key = _RESOURCE_KEYS[table][1]
+                    conn.execute(f"INSERT OR REPLACE INTO {table} ({columns}) SELECT {staged} FROM staged_{table} s "
+                                 f"WHERE {key} IN (SELECT resource FROM taken)")
+                merged[table] = conn.total_changes - before
+            before = conn.total_changes
+            conn.execute('INSERT OR REPLACE INTO fetch_log (resource, fetched_at) SELECT resource, fetched_at FROM taken')
+            merged['fetch_log'] = conn.total_changes - before
+            if marker:
+                self._mark_fetched(conn, marker)
+
+            conn.execute('DROP TABLE taken')
+            for table in tables:
+                conn.execute(f"DROP TABLE staged_{table}")
+        return merged
+
+stats_store = StatsStore()
@@ -2,91 +2,449 @@
 
 """
 Background caching tasks for the app.
+
+Under gunicorn every worker calls start_background_tasks(); the workers elect
+one leader per host through an flock, and only the leader warms the cache,
+watches today's games for final scores and runs the daily refresh. The others
+keep retrying the election, so the tasks move to another worker if the leader
+exits.
 """
+import os
 import time
 import logging
+import threading
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import pytz
 
-from mlb_api import MLBStatsAPI
-from extensions import cache
-from utils import process_team_roster_in_parallel
+try:
+    import fcntl
+except ImportError:  # Windows: every process considers itself the leader
+    fcntl = None
+
+from mlb_api import MLBStatsAPI, rate_limiter
+from caching import swr_cache
+from leaderboards import leaderboard_index
+from metrics import metrics
+from snapshots import export_snapshot
+from store import stats_store
+from utils import get_league_schedule_index, league_schedule_window, materialize_matchup_view, ROSTER_DISPLAY_LIMIT
 
 logger = logging.getLogger(__name__)
 
+# Seconds between a follower's attempts to take over the leader lock.
+LEADER_RETRY_INTERVAL = 60
+# Hour (US/Pacific) of the daily refresh, which warms that day's slate.
+DAILY_REFRESH_HOUR = 6
+
+# Slate date -> when the first prefetch pass for it started; see prefetch_next_slate().
+_prefetch_started: Dict[str, float] = {}
+
+_leader_lock_file = None
+
+class WarmupProgress:
+    """Thread-safe progress and ETA tracking for one warmup run."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset(0)
+
+    def reset(self, total: int, stage: str = 'idle'):
+        with self.lock:
+            self.stage = stage
+            self.total = total
+            self.done = 0
+            self.failed = 0
+            self.started = time.monotonic()
+
+    def add(self, count: int, stage: str):
+        with self.lock:
+            self.total += count
+            self.stage = stage
+
+    def task_done(self, failed: bool = False):
+        with self.lock:
+            self.done += 1
+            self.failed += int(failed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns the stage, task counts, elapsed seconds and ETA (None until a task finishes)."""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            remaining = self.total - self.done
+            eta = elapsed / self.done * remaining if self.done else None
+            return {'stage': self.stage, 'total': self.total, 'done': self.done, 'failed': self.failed,
+                    'elapsed': round(elapsed, 1), 'eta': None if eta is None else round(eta, 1)}
+
+warmup_progress = WarmupProgress()
+
+def _warmup_samples():
+    progress = warmup_progress.snapshot()
+    samples = [('mlb_warmup_tasks', {'state': state}, progress[state]) for state in ('total', 'done', 'failed')]
+    if progress['eta'] is not None:
+        samples.append(('mlb_warmup_eta_seconds', {}, progress['eta']))
+    return samples
+
+metrics.register_collector(_warmup_samples)
+
+def _warmup_workers(app, tasks: int) -> int:
+    """
+    Sizes the warmup pool against the rate-limit budget: never more workers
+    than calls the background priority can make without waiting for refill.
+    """
+    budget = int(rate_limiter.max_calls * (1 - rate_limiter.RESERVES[rate_limiter.BACKGROUND]))
+    return max(1, min(app.config.get('WARMUP_MAX_WORKERS', 8), budget, tasks))
+
+def _run_stage(app, executor: ThreadPoolExecutor, stage: str, tasks: List[Tuple[str, Callable, tuple]]) -> Dict[str, Any]:
+    """
+    Runs one stage's tasks on the pool as background-priority revalidations.
+
+    Returns:
+        A dictionary mapping each task's label to its result; failed tasks are omitted.
+    """
+    def run(func, args):
+        with app.app_context(), swr_cache.revalidation(), rate_limiter.priority(rate_limiter.BACKGROUND):
+            return func(*args)
+
+    warmup_progress.add(len(tasks), stage)
+    futures = {executor.submit(run, func, args): label for label, func, args in tasks}
+    results = {}
+    for future in as_completed(futures):
+        label = futures[future]
+        try:
+            results[label] = future.result()
+            warmup_progress.task_done()
+        except Exception as e:
+            warmup_progress.task_done(failed=True)
+            logger.error(f"Warmup task {label} failed: {e}", exc_info=True)
+        progress = warmup_progress.snapshot()
+        eta = f"{progress['eta']:.0f}s" if progress['eta'] is not None else '?'
+        logger.info(f"Warmup [{stage}] {progress['done']}/{progress['total']} done, ETA {eta}")
+    return results
+
 def warm_cache_on_startup(app):
     """
-    Pre-loads data for all of today's games into the cache on startup.
-    This runs inside the app context.
+    Pre-loads data for all of today's games into the cache.
+
+    Builds one deduplicated work set across the whole slate, so a team playing
+    a doubleheader or a player listed twice is fetched once, and runs it on a
+    worker pool in stages: teams, then player stat columns in batches, then
+    the matchup views, which by then are built entirely from cache, then
+    (LEADERBOARD_LEAGUE_WIDE) the rest of the league's rosters and players
+    for the leaderboards. All work runs as a background-priority revalidation: stale entries are re-fetched
+    rather than served.
     """
-    with app.app_context():
+    with app.app_context(), swr_cache.revalidation(), rate_limiter.priority(rate_limiter.BACKGROUND):
         try:
             logger.info("🔥 Warming cache for ALL today's games...")
+            warmup_progress.reset(0, 'schedule')
             pacific_tz = pytz.timezone('US/Pacific')
             today_str = datetime.now(pacific_tz).strftime('%Y-%m-%d')
             games = MLBStatsAPI.get_todays_games(today_str)
-            
-            logger.info(f"Found {len(games)} games today.")
-            
-            # Define periods to pre-cache
-            hitter_periods = {'7': 7, '10': 10, '21': 21}
-            pitcher_periods = {'7': 2, '10': 3, '21': 4}
-            
-            for i, game in enumerate(games):
+
+            matchups: Dict[Tuple[int, int], str] = {}
+            for game in games:
                 if 'postponed' in game.get('status', {}).get('detailedState', '').lower():
                     logger.info(f"⏭️ Skipping postponed game.")
                     continue
-                
-                home_id = game['teams']['home']['team']['id']
-                away_id = game['teams']['away']['team']['id']
-                logger.info(f"Loading game {i+1}/{len(games)}: {game['teams']['away']['team']['name']} @ {game['teams']['home']['team']['name']}...")
-
-                home_roster = MLBStatsAPI.get_team_roster(home_id)
-                away_roster = MLBStatsAPI.get_team_roster(away_id)
-
-                # cache all periods at once, with fewer workers
-                if home_roster.get('batters'):
-                    process_team_roster_in_parallel(home_roster['batters'][:15], 'hitting', hitter_periods, max_workers=5)
-                if home_roster.get('pitchers'):
-                    process_team_roster_in_parallel(home_roster['pitchers'][:15], 'pitching', pitcher_periods, max_workers=5)
-                
-                if away_roster.get('batters'):
-                    process_team_roster_in_parallel(away_roster['batters'][:15], 'hitting', hitter_periods, max_workers=5)
-                if away_roster.get('pitchers'):
-                    process_team_roster_in_parallel(away_roster['pitchers'][:15], 'pitching', pitcher_periods, max_workers=5)
-
-                logger.info(f" ✓ Cached initial data for game {i+1}")
-                time.sleep(5) 
-
-            logger.info("✅ Cache warming complete for ALL games!")
-            
+                home, away = game['teams']['home']['team'], game['teams']['away']['team']
+                matchups.setdefault((home['id'], away['id']), f"{away['name']} @ {home['name']}")
+            team_ids = list(dict.fromkeys(team_id for matchup in matchups for team_id in matchup))
+            logger.info(f"Found {len(games)} games today: {len(matchups)} matchups, {len(team_ids)} teams.")
+
+            # One league-wide schedule fetch serves every team's game history.
+            get_league_schedule_index()
+
+            workers = _warmup_workers(app, max(len(team_ids) * 2, 1))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='warmup') as executor:
+                team_tasks = [(f"team:{team_id}", MLBStatsAPI.get_team_info, (team_id,)) for team_id in team_ids]
+                team_tasks += [(f"roster:{team_id}", MLBStatsAPI.get_team_roster, (team_id,)) for team_id in team_ids]
+                team_results = _run_stage(app, executor, 'teams', team_tasks)
+
+                players: Dict[str, List[int]] = {'hitting': [], 'pitching': []}
+                for team_id in team_ids:
+                    roster = team_results.get(f"roster:{team_id}") or {}
+                    players['hitting'] += [p['id'] for p in roster.get('batters', [])[:ROSTER_DISPLAY_LIMIT]]
+                    players['pitching'] += [p['id'] for p in roster.get('pitchers', [])[:ROSTER_DISPLAY_LIMIT]]
+                season = datetime.now().year
+                player_tasks = []
+                for stat_group, player_ids in players.items():
+                    player_ids = list(dict.fromkeys(player_ids))
+                    size = MLBStatsAPI.PLAYER_BATCH_SIZE
+                    for i in range(0, len(player_ids), size):
+                        player_tasks.append((f"{stat_group}:{i // size}", MLBStatsAPI.get_player_stat_columns_batch,
+                                             (player_ids[i:i + size], stat_group, season)))
+                _run_stage(app, executor, 'players', player_tasks)
+
+                view_tasks = [(label, materialize_matchup_view, (home_id, away_id))
+                              for (home_id, away_id), label in matchups.items()]
+                _run_stage(app, executor, 'views', view_tasks)
+
+                if app.config.get('LEADERBOARD_LEAGUE_WIDE', True):
+                    rosters = {team_id: team_results.get(f"roster:{team_id}") or {} for team_id in team_ids}
+                    _warm_league(app, executor, rosters, players, season)
+
+            progress = warmup_progress.snapshot()
+            warmup_progress.add(0, 'complete')
+            logger.info(f"✅ Cache warming complete for ALL games in {progress['elapsed']:.1f}s "
+                        f"({progress['done']} tasks, {progress['failed']} failed, {workers} workers)")
+
+            # Hand the freshly warmed dataset to the next instance that starts.
+            if app.config.get('SNAPSHOT_PATH'):
+                try:
+                    export_snapshot(app.config['SNAPSHOT_PATH'])
+                except Exception as e:
+                    logger.error(f"❌ Snapshot export failed: {e}", exc_info=True)
+
         except Exception as e:
+            warmup_progress.add(0, 'failed')
             logger.error(f"❌ Cache warming failed: {e}", exc_info=True)
 
+def _warm_league(app, executor: ThreadPoolExecutor, rosters: Dict[int, Dict[str, Any]],
+                 synced: Dict[str, List[int]], season: int):
+    """
+    Syncs the rosters and game logs of every team in the league, after
+    today's slate, so the leaderboards rank the whole league rather than the
+    teams playing today. Players the slate already synced are skipped.
+
+    Args:
+        rosters: The slate's rosters by team ID.
+        synced: The player IDs the slate synced, by stat group.
+    """
+    other_teams = [team_id for team_id in get_league_schedule_index() if team_id not in rosters]
+    results = _run_stage(app, executor, 'league-rosters',
+                         [(f"roster:{team_id}", MLBStatsAPI.get_team_roster, (team_id,)) for team_id in other_teams])
+    rosters = {**rosters, **{team_id: results.get(f"roster:{team_id}") or {} for team_id in other_teams}}
+
+    player_tasks = []
+    for stat_group, kind in (('hitting', 'batters'), ('pitching', 'pitchers')):
+        done = set(synced[stat_group])
+        player_ids = list(dict.fromkeys(p['id'] for roster in rosters.values() for p in roster.get(kind, [])
+                                        if p['id'] not in done))
+        size = MLBStatsAPI.PLAYER_BATCH_SIZE
+        for i in range(0, len(player_ids), size):
+            player_tasks.append((f"league-{stat_group}:{i // size}", MLBStatsAPI.get_player_stat_columns_batch,
+                                 (player_ids[i:i + size], stat_group, season)))
+    _run_stage(app, executor, 'league-players', player_tasks)
+
 def daily_cache_refresh(app):
-    """Clears and refreshes the cache once daily at 6 AM PST."""
+    """
+    Refreshes the cache once daily at 6 AM PST.
+    Nothing is deleted: every entry is marked stale, so pages keep serving the
+    previous values while the warmup revalidates them in the background.
+    """
     while True:
         try:
             pst = pytz.timezone('US/Pacific')
             now = datetime.now(pst)
-            target_time = now.replace(hour=6, minute=0, second=0, microsecond=0)
-            
+            target_time = now.replace(hour=DAILY_REFRESH_HOUR, minute=0, second=0, microsecond=0)
+
             if now >= target_time:
                 target_time += timedelta(days=1)
-            
+
             wait_seconds = (target_time - now).total_seconds()
-            
+
             logger.info(f"⏰ Next cache refresh scheduled for {target_time.strftime('%Y-%m-%d %I:%M %p PST')}")
             logger.info(f"   Waiting {wait_seconds/3600:.1f} hours...")
-            
+
             time.sleep(wait_seconds)
-            
+
             logger.info("\n🌅 6 AM PST - Starting daily cache refresh...")
+            # Whatever the overnight prefetch stored for today's slate stays fresh.
+            prefetched_since = _prefetch_started.pop(datetime.now(pst).strftime('%Y-%m-%d'), None)
             with app.app_context():
-                cache.clear()
-            
+                swr_cache.mark_all_stale(before=prefetched_since)
+
             warm_cache_on_startup(app)
-            
+
         except Exception as e:
             logger.error(f"❌ Daily refresh error: {e}", exc_info=True)
             time.sleep(3600)
+
+def refresh_finished_games(app, finished: List[Dict[str, Any]], todays_games: List[Dict[str, Any]]):
+    """
+    Re-fetches only what the given final games changed: the league schedule
+    (team histories), both teams' rosters and their listed players' game logs,
+    then rebuilds today's matchup views involving those teams. Everything else
+    in the cache is left alone.
+    """
+    team_ids = list(dict.fromkeys(team_id for game in finished
+                                  for team_id in (game['teams']['home']['team']['id'], game['teams']['away']['team']['id'])))
+    with app.app_context(), swr_cache.revalidation(), rate_limiter.priority(rate_limiter.BACKGROUND):
+        MLBStatsAPI.expire_league_schedule(*league_schedule_window())
+        get_league_schedule_index()
+
+        season = datetime.now().year
+        players: Dict[str, List[int]] = {'hitting': [], 'pitching': []}
+        for team_id in team_ids:
+            MLBStatsAPI.expire_team_roster(team_id)
+            roster = MLBStatsAPI.get_team_roster(team_id)
+            players['hitting'] += [p['id'] for p in roster['batters'][:ROSTER_DISPLAY_LIMIT]]
+            players['pitching'] += [p['id'] for p in roster['pitchers'][:ROSTER_DISPLAY_LIMIT]]
+        for stat_group, player_ids in players.items():
+            for player_id in player_ids:
+                MLBStatsAPI.expire_player_game_logs(player_id, stat_group, season)
+            # Incremental: only games since each player's last stored game are fetched.
+            MLBStatsAPI.get_player_stat_columns_batch(player_ids, stat_group, season)
+
+        matchups = dict.fromkeys((game['teams']['home']['team']['id'], game['teams']['away']['team']['id'])
+                                 for game in todays_games)
+        for home_id, away_id in matchups:
+            if home_id in team_ids or away_id in team_ids:
+                materialize_matchup_view(home_id, away_id)
+        logger.info(f"🏁 Refreshed {len(team_ids)} teams and "
+                    f"{sum(len(ids) for ids in players.values())} players after {len(finished)} final(s).")
+
+def watch_game_status(app):
+    """
+    Polls today's schedule and refreshes the data of every game that goes Final.
+
+    Each poll is a single schedule request, so upstream calls grow with the
+    number of games finishing rather than with the size of the league.
+    """
+    states: Dict[Any, str] = {}
+    interval = app.config.get('GAME_STATUS_POLL_INTERVAL', 120)
+    while True:
+        try:
+            today_str = datetime.now(pytz.timezone('US/Pacific')).strftime('%Y-%m-%d')
+            with app.app_context(), swr_cache.revalidation(), rate_limiter.priority(rate_limiter.BACKGROUND):
+                MLBStatsAPI.expire_todays_games(today_str)
+                games = MLBStatsAPI.get_todays_games(today_str)
+            current = {game['gamePk']: game.get('status', {}).get('abstractGameState') for game in games}
+            # Only transitions seen by this watcher count; games already final at startup were warmed.
+            finished = [game for game in games
+                        if current[game['gamePk']] == 'Final' and states.get(game['gamePk']) not in (None, 'Final')]
+            states = current
+            if finished:
+                refresh_finished_games(app, finished, games)
+        except Exception as e:
+            logger.error(f"❌ Game status poll failed: {e}", exc_info=True)
+        time.sleep(interval)
+
+def _next_slate(app) -> Optional[str]:
+    """
+    The date of the slate the next daily refresh will warm, if now is a good
+    time to prefetch it: between the end of the day's last game and the refresh.
+    """
+    pacific_tz = pytz.timezone('US/Pacific')
+    now = datetime.now(pacific_tz)
+    if now.hour < DAILY_REFRESH_HOUR:
+        return now.strftime('%Y-%m-%d')
+    # Polled all evening, so it waits its turn behind interactive requests like the prefetch itself.
+    with app.app_context(), swr_cache.revalidation(), rate_limiter.priority(rate_limiter.PREFETCH):
+        games = MLBStatsAPI.get_todays_games(now.strftime('%Y-%m-%d'))
+    # Player logs still change until every game of the day is over.
+    if any(game.get('status', {}).get('abstractGameState') != 'Final'
+           and 'postponed' not in game.get('status', {}).get('detailedState', '').lower() for game in games):
+        return None
+    return (now + timedelta(days=1)).strftime('%Y-%m-%d')
+
+def prefetch_slate(app, date_str: str) -> int:
+    """
+    Fetches a slate's schedule, then every playing team's info, roster and
+    listed players' stat columns, one team at a time. Matchups with the most
+    favorited teams go first, then earlier start times, so whatever the budget
+    allows covers the pages most likely to be opened.
+
+    Runs at PREFETCH priority: the rate limiter only hands it tokens while
+    half the burst is left and nothing of higher priority is waiting, so it
+    never delays interactive requests or the warmup. Entries already fresh
+    cost nothing; stale ones are re-fetched.
+
+    Returns:
+        The number of upstream calls made.
+    """
+    calls_before = metrics.upstream_calls
+    with app.app_context(), swr_cache.revalidation(), rate_limiter.priority(rate_limiter.PREFETCH):
+        games = [game for game in MLBStatsAPI.get_todays_games(date_str)
+                 if 'postponed' not in game.get('status', {}).get('detailedState', '').lower()]
+        favorites = stats_store.favorite_counts(app.config.get('FAVORITES_WINDOW_DAYS', 30) * 86400)
+
+        def order(game):
+            teams = (game['teams']['home']['team'], game['teams']['away']['team'])
+            return -sum(favorites.get(team.get('name'), 0) for team in teams), game.get('gameDate') or ''
+
+        team_ids = list(dict.fromkeys(game['teams'][side]['team']['id'] for game in sorted(games, key=order)
+                                      for side in ('home', 'away')))
+        season = datetime.now().year
+        for team_id in team_ids:
+            MLBStatsAPI.get_team_info(team_id)
+            roster = MLBStatsAPI.get_team_roster(team_id)
+            MLBStatsAPI.get_player_stat_columns_batch([p['id'] for p in roster['batters'][:ROSTER_DISPLAY_LIMIT]], 'hitting', season)
+            MLBStatsAPI.get_player_stat_columns_batch([p['id'] for p in roster['pitchers'][:ROSTER_DISPLAY_LIMIT]], 'pitching', season)
+    calls = metrics.upstream_calls - calls_before
+    if calls:
+        logger.info(f"🌙 Prefetched {len(team_ids)} teams for {date_str} with {calls} upstream calls.")
+    return calls
+
+def prefetch_next_slate(app):
+    """
+    Prefetches the next day's slate with spare rate-limit budget while no
+    games are being played, so the morning refresh finds it already fetched.
+
+    Passes repeat every PREFETCH_INTERVAL seconds until the refresh. The
+    start of the first one is kept, and the refresh only marks entries stored
+    before it stale, so everything prefetched is served as fresh.
+    """
+    interval = app.config.get('PREFETCH_INTERVAL', 600)
+    while True:
+        try:
+            date_str = _next_slate(app)
+            if date_str is not None:
+                _prefetch_started.setdefault(date_str, time.time())
+                for past_date in [d for d in _prefetch_started if d < date_str]:
+                    del _prefetch_started[past_date]
+                prefetch_slate(app, date_str)
+        except Exception as e:
+            logger.error(f"❌ Slate prefetch failed: {e}", exc_info=True)
+        time.sleep(interval)
+
+def _try_become_leader(app) -> bool:
+    """
+    Takes the host-wide background task lock without blocking. The lock file
+    stays open, and the lock held, for the life of the process.
+    """
+    global _leader_lock_file
+    if _leader_lock_file is not None:
+        return True
+    cache_dir = app.config.get('CACHE_DIR')
+    if fcntl is None or not cache_dir:
+        _leader_lock_file = True
+        return True
+    lock_dir = f"{cache_dir.rstrip(os.sep)}-locks"
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_file = open(os.path.join(lock_dir, 'background.leader'), 'a+')
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _leader_lock_file = lock_file
+    return True
+
+def _run_background_tasks(app):
+    while not _try_become_leader(app):
+        time.sleep(LEADER_RETRY_INTERVAL)
+    logger.info(f"Process {os.getpid()} elected to run background tasks.")
+    # Index logs stored before the leaderboards existed or under other qualifiers.
+    leaderboard_index.rebuild_if_needed()
+    warm_cache_on_startup(app)
+    threading.Thread(target=watch_game_status, args=(app,), name='game-status', daemon=True).start()
+    if app.config.get('PREFETCH_NEXT_SLATE', True):
+        threading.Thread(target=prefetch_next_slate, args=(app,), name='slate-prefetch', daemon=True).start()
+    daily_cache_refresh(app)
+
+def start_background_tasks(app) -> Optional[threading.Thread]:
+    """
+    Starts the leader election, cache warmup and daily refresh on a daemon
+    thread. Safe to call from every worker process.
+    """
+    if not app.config.get('RUN_BACKGROUND_TASKS', True):
+        return None
+    thread = threading.Thread(target=_run_background_tasks, args=(app,), name='background-tasks', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,38 @@
+# tests/conftest.py
+
+"""
+Shared fixtures. The app modules live at the repository root, so it is put
+on sys.path here.
+"""
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extensions import cache  # noqa: E402
+
+class FakeClock:
+    """A clock for components that take one; time only moves when advanced."""
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def app():
+    """A bare app with an in-process cache, for code that needs an app context."""
+    app = Flask(__name__)
+    cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 300})
+    with app.app_context():
+        yield app
@@ -0,0 +1,186 @@
+# tests/test_aggregation.py
+
+"""
+The vectorized aggregation checked against the per-player formulas it
+replaced. The baseline functions below are the original utils.py
+implementations, kept verbatim as the reference.
+"""
+import numpy as np
+import pytest
+
+from aggregation import StatWindows, format_player_stats, rolling_team_stats
+from stat_columns import HITTER_PERIODS, PITCHER_PERIODS, GameLog, PlayerStatColumns
+
+# Baseline (utils.py before the columnar rewrite)
+
+def _get_default_stats(stat_type):
+    if stat_type == 'hitting':
+        return {'avg': '.000', 'obp': '.000', 'slg': '.000', 'hr': 0, 'rbi': 0, 'h': 0, 'ab': 0, 'k': 0}
+    return {'era': '0.00', 'whip': '0.00', 'k': 0, 'bb': 0, 'ip': '0.0', 'h': 0, 'r': 0, 'gs': 0, 'sv': 0}
+
+def _aggregate_hitting_stats(game_logs):
+    if not game_logs: return _get_default_stats('hitting')
+    totals = {'ab': 0, 'h': 0, 'hr': 0, 'rbi': 0, 'bb': 0, 'tb': 0, 'k': 0}
+    for game in game_logs:
+        stat = game.get('stat', {})
+        totals['ab'] += stat.get('atBats', 0)
+        totals['h'] += stat.get('hits', 0)
+        totals['hr'] += stat.get('homeRuns', 0)
+        totals['rbi'] += stat.get('rbi', 0)
+        totals['bb'] += stat.get('baseOnBalls', 0)
+        totals['tb'] += stat.get('totalBases', 0)
+        totals['k'] += stat.get('strikeOuts', 0)
+    avg = f"{(totals['h'] / totals['ab']):.3f}" if totals['ab'] > 0 else ".000"
+    obp = f"{((totals['h'] + totals['bb']) / (totals['ab'] + totals['bb'])):.3f}" if (totals['ab'] + totals['bb']) > 0 else ".000"
+    slg = f"{(totals['tb'] / totals['ab']):.3f}" if totals['ab'] > 0 else ".000"
+    return {'avg': avg, 'obp': obp, 'slg': slg, 'hr': totals['hr'], 'rbi': totals['rbi'],
+            'h': totals['h'], 'ab': totals['ab'], 'bb': totals['bb'], 'tb': totals['tb'], 'k': totals['k']}
+
+def _aggregate_pitching_stats(game_logs):
+    if not game_logs: return _get_default_stats('pitching')
+    totals = {'er': 0, 'h': 0, 'r': 0, 'bb': 0, 'k': 0, 'sv': 0, 'gs': 0}
+    total_ip = 0.0
+    for game in game_logs:
+        stat = game.get('stat', {})
+        ip_str = str(stat.get('inningsPitched', '0'))
+        if '.' in ip_str:
+            parts = ip_str.split('.')
+            total_ip += int(parts[0]) + (int(parts[1]) / 3.0)
+        else:
+            total_ip += float(ip_str)
+        totals['er'] += stat.get('earnedRuns', 0)
+        totals['h'] += stat.get('hits', 0)
+        totals['r'] += stat.get('runs', 0)
+        totals['bb'] += stat.get('baseOnBalls', 0)
+        totals['k'] += stat.get('strikeOuts', 0)
+        totals['sv'] += stat.get('saves', 0)
+        totals['gs'] += stat.get('gamesStarted', 0)
+    era = f"{(totals['er'] * 9 / total_ip):.2f}" if total_ip > 0 else "0.00"
+    whip = f"{((totals['bb'] + totals['h']) / total_ip):.2f}" if total_ip > 0 else "0.00"
+    return {'era': era, 'whip': whip, 'k': totals['k'], 'bb': totals['bb'], 'ip': f"{total_ip:.1f}",
+            'h': totals['h'], 'r': totals['r'], 'gs': totals['gs'], 'sv': totals['sv']}
+
+def baseline_stats_for_periods(game_logs, stat_type, periods):
+    stats_by_period = {}
+    if stat_type == 'hitting':
+        played_games = [g for g in game_logs if g.get('stat', {}).get('atBats', 0) > 0]
+        for period_name, num_games in periods.items():
+            stats_by_period[period_name] = _aggregate_hitting_stats(played_games[:num_games])
+    else:
+        pitched_games = [g for g in game_logs if float(str(g.get('stat', {}).get('inningsPitched', '0'))) > 0]
+        for period_name, num_starts in periods.items():
+            stats_by_period[period_name] = _aggregate_pitching_stats(pitched_games[:num_starts])
+    return stats_by_period
+
+def baseline_rolling_team_stats(batters, pitchers, period, games_played):
+    if not batters: return {'AVG': '.000', 'OBP': '.000', 'SLG': '.000', 'HR': 0, 'AVG_HITS': '0.0', 'AVG_K': '0.0'}
+    b_totals = {'ab': 0, 'h': 0, 'bb': 0, 'tb': 0, 'hr': 0}
+    for batter in batters:
+        stats = batter.get('stats_by_period', {}).get(period, {})
+        if stats and stats.get('ab', 0) > 0:
+            b_totals['ab'] += stats.get('ab', 0)
+            b_totals['h'] += stats.get('h', 0)
+            b_totals['bb'] += stats.get('bb', 0)
+            b_totals['hr'] += stats.get('hr', 0)
+            b_totals['tb'] += stats.get('tb', 0)
+    p_totals = {'k': 0}
+    for pitcher in pitchers:
+        stats = pitcher.get('stats_by_period', {}).get(period, {})
+        if stats and float(stats.get('ip', '0.0')) > 0:
+            p_totals['k'] += stats.get('k', 0)
+    team_avg = f"{(b_totals['h'] / b_totals['ab']):.3f}" if b_totals['ab'] > 0 else ".000"
+    team_obp = f"{((b_totals['h'] + b_totals['bb']) / (b_totals['ab'] + b_totals['bb'])):.3f}" if (b_totals['ab'] + b_totals['bb']) > 0 else ".000"
+    team_slg = f"{(b_totals['tb'] / b_totals['ab']):.3f}" if b_totals['ab'] > 0 else ".000"
+    avg_hits = f"{(b_totals['h'] / games_played):.1f}" if games_played > 0 else "0.0"
+    avg_k = f"{(p_totals['k'] / games_played):.1f}" if games_played > 0 else "0.0"
+    return {'AVG': team_avg, 'OBP': team_obp, 'SLG': team_slg, 'HR': b_totals['hr'], 'AVG_HITS': avg_hits, 'AVG_K': avg_k}
+
+# Fixture logs, most recent game first
+
+def split(day, **stat):
+    return {'date': f"2024-06-{day:02d}", 'game': {'gamePk': 100 + day}, 'stat': stat}
+
+def hitting_line(ab, h, bb=0, hr=0, tb=None, rbi=0, k=0):
+    return {'atBats': ab, 'hits': h, 'baseOnBalls': bb, 'homeRuns': hr,
+            'totalBases': h + 3 * hr if tb is None else tb, 'rbi': rbi, 'strikeOuts': k}
+
+def pitching_line(ip, er, h=0, bb=0, r=None, k=0, sv=0, gs=0):
+    return {'inningsPitched': ip, 'earnedRuns': er, 'hits': h, 'baseOnBalls': bb,
+            'runs': er if r is None else r, 'strikeOuts': k, 'saves': sv, 'gamesStarted': gs}
+
+HITTER_LOGS = {
+    # Regular: walk-only (zero-AB) games are interleaved and skipped as appearances.
+    1: [split(30 - i, **hitting_line(*line)) for i, line in enumerate([
+        (4, 2, 0, 1, None, 3, 1), (0, 0, 2), (3, 1, 1), (5, 0, 0, 0, None, 0, 3), (4, 3, 0, 0, 5, 2),
+        (0, 0, 1), (4, 1), (3, 0, 2), (4, 2, 0, 1), (5, 1, 0, 0, None, 1, 2), (4, 0), (3, 1, 1),
+    ])],
+    # Bench bat: fewer games than the longest window.
+    2: [split(29, **hitting_line(2, 1)), split(25, **hitting_line(1, 0, 1))],
+    # Only walks: no at-bats anywhere, so every period is the default line.
+    3: [split(28, **hitting_line(0, 0, 1)), split(27, **hitting_line(0, 0, 2))],
+    # No games at all.
+    4: [],
+}
+
+PITCHER_LOGS = {
+    # Starter with partial innings and a zero-out appearance.
+    10: [split(30, **pitching_line('5.2', 3, 6, 2, 4, 7, gs=1)), split(26, **pitching_line('0.0', 2, 2, 1)),
+         split(24, **pitching_line('6.0', 1, 4, 1, k=5, gs=1)), split(19, **pitching_line('4.1', 4, 7, 3, k=2, gs=1)),
+         split(13, **pitching_line('7.0', 0, 3, 0, k=9, gs=1))],
+    # Reliever with one-out outings.
+    11: [split(29, **pitching_line('0.1', 0, 1, sv=1)), split(28, **pitching_line('1.0', 1, 2, 1, k=2)),
+         split(27, **pitching_line('0.2', 0, 0, 0, k=1))],
+    # Only zero-out appearances.
+    12: [split(30, **pitching_line('0.0', 3, 3, 2))],
+    13: [],
+}
+
+def columns(stat_type, logs):
+    return [PlayerStatColumns(stat_type, GameLog(stat_type, log)) for log in logs.values()]
+
+SEASON_TO_DATE = {'season': None}
+
+@pytest.mark.parametrize('periods', [HITTER_PERIODS, {'1': 1, '3': 3, '50': 50}])
+def test_hitting_lines_match_the_baseline(periods):
+    windows = StatWindows('hitting', columns('hitting', HITTER_LOGS), periods)
+    expected = [baseline_stats_for_periods(log, 'hitting', periods) for log in HITTER_LOGS.values()]
+    assert format_player_stats(windows) == expected
+
+@pytest.mark.parametrize('periods', [PITCHER_PERIODS, {'1': 1, '2': 2, '50': 50}])
+def test_pitching_lines_match_the_baseline(periods):
+    windows = StatWindows('pitching', columns('pitching', PITCHER_LOGS), periods)
+    expected = [baseline_stats_for_periods(log, 'pitching', periods) for log in PITCHER_LOGS.values()]
+    assert format_player_stats(windows) == expected
+
+@pytest.mark.parametrize('stat_type, logs', [('hitting', HITTER_LOGS), ('pitching', PITCHER_LOGS)])
+def test_season_to_date_matches_the_whole_log(stat_type, logs):
+    windows = StatWindows(stat_type, columns(stat_type, logs), SEASON_TO_DATE)
+    expected = [baseline_stats_for_periods(log, stat_type, {'season': len(log)}) for log in logs.values()]
+    assert format_player_stats(windows) == expected
+
+@pytest.mark.parametrize('games_played', [[5, 8, 15], [0, 2, 0]])
+def test_team_rollups_match_the_baseline(games_played):
+    periods = list(HITTER_PERIODS)
+    batters = StatWindows('hitting', columns('hitting', HITTER_LOGS), HITTER_PERIODS)
+    pitchers = StatWindows('pitching', columns('pitching', PITCHER_LOGS), PITCHER_PERIODS)
+    rollups = rolling_team_stats(batters.team_totals(periods), pitchers.team_totals(periods), np.array(games_played))
+
+    batter_rows = [{'stats_by_period': stats} for stats in format_player_stats(batters)]
+    pitcher_rows = [{'stats_by_period': stats} for stats in format_player_stats(pitchers)]
+    expected = [baseline_rolling_team_stats(batter_rows, pitcher_rows, period, played)
+                for period, played in zip(periods, games_played)]
+    assert rollups == expected
+
+def test_team_rollups_with_no_at_bats_match_the_baseline():
+    periods = list(HITTER_PERIODS)
+    walks_only = {3: HITTER_LOGS[3], 4: HITTER_LOGS[4]}
+    no_outs = {12: PITCHER_LOGS[12], 13: PITCHER_LOGS[13]}
+    batters = StatWindows('hitting', columns('hitting', walks_only), HITTER_PERIODS)
+    pitchers = StatWindows('pitching', columns('pitching', no_outs), PITCHER_PERIODS)
+    rollups = rolling_team_stats(batters.team_totals(periods), pitchers.team_totals(periods), np.array([3, 4, 5]))
+
+    batter_rows = [{'stats_by_period': stats} for stats in format_player_stats(batters)]
+    pitcher_rows = [{'stats_by_period': stats} for stats in format_player_stats(pitchers)]
+    expected = [baseline_rolling_team_stats(batter_rows, pitcher_rows, period, played)
+                for period, played in zip(periods, [3, 4, 5])]
+    assert rollups == expected
@@ -0,0 +1,34 @@
+# tests/test_favorites.py
+
+"""
+Team popularity as counted from the sessions favoriting each team.
+"""
+import pytest
+
+from store import StatsStore
+
+DAY = 86400
+
+@pytest.fixture
+def store(tmp_path):
+    store = StatsStore()
+    store.open(str(tmp_path / 'stats.db'))
+    return store
+
+def test_a_session_counts_once_however_often_it_toggles(store):
+    for _ in range(5):
+        store.set_favorites('a', ['New York Yankees'])
+        store.set_favorites('a', [])
+        store.set_favorites('a', ['New York Yankees', 'Boston Red Sox'])
+    store.set_favorites('b', ['New York Yankees'])
+    assert store.favorite_counts(30 * DAY) == {'New York Yankees': 2, 'Boston Red Sox': 1}
+
+    store.set_favorites('a', [])
+    assert store.favorite_counts(30 * DAY) == {'New York Yankees': 1}
+
+def test_sessions_not_seen_within_the_window_drop_out(store):
+    store.set_favorites('a', ['New York Yankees'])
+    store._connection().execute("UPDATE favorite_sessions SET seen_at = seen_at - ?", (31 * DAY,))
+    store.set_favorites('b', ['Boston Red Sox'])
+    assert store.favorite_counts(30 * DAY) == {'Boston Red Sox': 1}
+    assert store._connection().execute('SELECT COUNT(*) FROM favorite_sessions').fetchone()[0] == 1
@@ -0,0 +1,90 @@
+# tests/test_game_log_sync.py
+
+"""
+Incremental season game-log syncs: the delta fetched by startDate/endDate is
+merged into the stored log by gamePk, against a scripted transport.
+"""
+import json
+
+import pytest
+import requests
+
+import mlb_api
+from caching import memoize_key, swr_cache
+from leaderboards import LeaderboardIndex
+from mlb_api import CircuitBreaker, HTTPTransport, MLBStatsAPI, RateLimiter
+from store import StatsStore
+
+PLAYER = 592450
+SEASON = 2024
+
+def split(game_pk: int, date: str, hits: int):
+    return {'date': date, 'game': {'gamePk': game_pk}, 'team': {'id': 147},
+            'stat': {'atBats': 4, 'hits': hits, 'baseOnBalls': 0, 'homeRuns': 0, 'totalBases': hits}}
+
+class ScriptedTransport(HTTPTransport):
+    """Answers each call with the next scripted list of splits and records the query parameters."""
+    def __init__(self, *responses):
+        super().__init__(max_retries=0)
+        self.responses = list(responses)
+        self.params = []
+
+    def get(self, url, params=None, timeout=None):
+        self.params.append(dict(params or {}))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({'stats': [{'splits': self.responses.pop(0)}]}).encode()
+        response.url = url
+        return response
+
+@pytest.fixture
+def store(app, tmp_path, monkeypatch):
+    store = StatsStore()
+    store.open(str(tmp_path / 'stats.db'))
+    monkeypatch.setattr(mlb_api, 'stats_store', store)
+    monkeypatch.setattr(mlb_api, 'leaderboard_index', LeaderboardIndex(store))
+    monkeypatch.setattr(mlb_api, 'rate_limiter', RateLimiter(max_calls=1000))
+    monkeypatch.setattr(mlb_api, 'circuit_breaker', CircuitBreaker())
+    return store
+
+def use_transport(monkeypatch, *responses) -> ScriptedTransport:
+    transport = ScriptedTransport(*responses)
+    monkeypatch.setattr(mlb_api, 'transport', transport)
+    return transport
+
+def resync():
+    """Expires the player's log and fetches it again, as the daily refresh does."""
+    MLBStatsAPI.expire_player_game_logs(PLAYER, 'hitting', SEASON)
+    with swr_cache.revalidation():
+        return MLBStatsAPI.get_player_game_logs(PLAYER, 'hitting', SEASON)
+
+def test_delta_is_merged_without_duplicating_or_dropping_the_boundary_game(store, monkeypatch):
+    transport = use_transport(
+        monkeypatch,
+        # Full season: the last stored game is the first of a doubleheader, still in progress.
+        [split(1, '2024-06-01', 1), split(3, '2024-06-03', 1)],
+        # Delta from that date: the boundary game again with its final line, the nightcap and the next day.
+        [split(3, '2024-06-03', 2), split(4, '2024-06-03', 0), split(5, '2024-06-04', 3)],
+    )
+    log = MLBStatsAPI.get_player_game_logs(PLAYER, 'hitting', SEASON)
+    assert list(log.game_pks) == [3, 1]
+    assert 'startDate' not in transport.params[0]
+
+    log = resync()
+    assert transport.params[1]['startDate'] == '2024-06-03'
+    assert 'endDate' in transport.params[1]
+    assert list(log.game_pks) == [5, 4, 3, 1]
+    assert list(log.values['h']) == [3, 0, 2, 1]
+    assert [game['game']['gamePk'] for game in store.get_game_logs(PLAYER, 'hitting', SEASON)] == [5, 4, 3, 1]
+
+    # The stat columns cached alongside are rebuilt from the merged log.
+    columns = swr_cache.get(memoize_key(MLBStatsAPI.get_player_stat_columns, PLAYER, 'hitting', SEASON)).value
+    assert columns.window() == {'ab': 16, 'h': 6, 'hr': 0, 'rbi': 0, 'bb': 0, 'tb': 6, 'k': 0, 'games': 4}
+
+def test_empty_delta_keeps_the_stored_log(store, monkeypatch):
+    transport = use_transport(monkeypatch, [split(1, '2024-06-01', 1), split(3, '2024-06-03', 1)], [])
+    MLBStatsAPI.get_player_game_logs(PLAYER, 'hitting', SEASON)
+
+    log = resync()
+    assert transport.params[1]['startDate'] == '2024-06-03'
+    assert list(log.game_pks) == [3, 1]
@@ -0,0 +1,97 @@
+# tests/test_leaderboards.py
+
+"""
+The leaderboard index: qualifiers, ordering and incremental maintenance.
+"""
+import pytest
+
+from leaderboards import LeaderboardIndex
+from stat_columns import GameLog, PlayerStatColumns
+from store import StatsStore
+
+SEASON = 2024
+
+def hitter(games):
+    """Stat columns for a hitter from (at-bats, hits, walks) per game, most recent first."""
+    splits = [{'date': f"2024-06-{30 - i:02d}", 'game': {'gamePk': 1000 + i},
+               'stat': {'atBats': ab, 'hits': h, 'baseOnBalls': bb, 'totalBases': h}}
+              for i, (ab, h, bb) in enumerate(games)]
+    return PlayerStatColumns('hitting', GameLog('hitting', splits))
+
+def pitcher(appearances):
+    """Stat columns for a pitcher from (innings pitched, earned runs, hits, walks) per appearance."""
+    splits = [{'date': f"2024-06-{30 - i:02d}", 'game': {'gamePk': 2000 + i},
+               'stat': {'inningsPitched': ip, 'earnedRuns': er, 'hits': h, 'baseOnBalls': bb}}
+              for i, (ip, er, h, bb) in enumerate(appearances)]
+    return PlayerStatColumns('pitching', GameLog('pitching', splits))
+
+@pytest.fixture
+def store(tmp_path):
+    store = StatsStore()
+    store.open(str(tmp_path / 'stats.db'))
+    return store
+
+@pytest.fixture
+def index(store):
+    return LeaderboardIndex(store, min_pa_per_game=3.1, min_ip_per_appearance=2.0)
+
+def leader_ids(index, stat, period='7'):
+    return [leader['id'] for leader in index.top(stat, period, season=SEASON)['leaders']]
+
+def count_rows(store, table, player_id):
+    return store._connection().execute(f"SELECT COUNT(*) FROM {table} WHERE player_id = ?", (player_id,)).fetchone()[0]
+
+def test_hitters_qualify_by_plate_appearances_per_game(index):
+    # 7 games need ceil(3.1 * 7) = 22 plate appearances.
+    assert index.qualifier('hitting', '7') == {'min_pa': 22}
+    index.update(1, 'hitting', SEASON, hitter([(3, 1, 1)] + [(3, 1, 0)] * 6))   # 22 PA
+    index.update(2, 'hitting', SEASON, hitter([(3, 3, 0)] * 7))                 # 21 PA
+    assert leader_ids(index, 'avg') == [1]
+
+def test_pitchers_qualify_by_outs(index):
+    # 2 appearances need 4.0 innings, i.e. 12 outs.
+    assert index.qualifier('pitching', '7') == {'min_ip': 4.0}
+    index.update(1, 'pitching', SEASON, pitcher([('2.0', 1, 2, 0), ('2.0', 1, 2, 0)]))  # 12 outs
+    index.update(2, 'pitching', SEASON, pitcher([('2.0', 0, 0, 0), ('1.2', 0, 0, 0)]))  # 11 outs
+    assert leader_ids(index, 'era') == [1]
+
+def test_era_and_whip_rank_lowest_first(index):
+    index.update(1, 'pitching', SEASON, pitcher([('3.0', 2, 3, 1)] * 2))
+    index.update(2, 'pitching', SEASON, pitcher([('3.0', 0, 1, 0)] * 2))
+    index.update(3, 'pitching', SEASON, pitcher([('3.0', 1, 2, 0)] * 2))
+    assert leader_ids(index, 'era') == [2, 3, 1]
+    assert leader_ids(index, 'whip') == [2, 3, 1]
+    # Strikeouts still rank highest first.
+    assert index.top('k', '7', season=SEASON)['leaders'][0]['rank'] == 1
+
+def test_window_that_empties_removes_its_entries(index, store):
+    index.update(1, 'hitting', SEASON, hitter([(4, 2, 0)] * 7))
+    assert leader_ids(index, 'avg') == [1]
+    assert count_rows(store, 'player_windows', 1) == 3
+
+    index.update(1, 'hitting', SEASON, hitter([]))
+    assert leader_ids(index, 'avg') == []
+    assert count_rows(store, 'player_windows', 1) == 0
+    assert count_rows(store, 'leaderboard_entries', 1) == 0
+
+def test_incremental_update_replaces_the_players_rows(index, store):
+    index.update(1, 'hitting', SEASON, hitter([(4, 1, 0)] * 7))
+    rows = count_rows(store, 'leaderboard_entries', 1)
+    index.update(1, 'hitting', SEASON, hitter([(4, 4, 0)] + [(4, 1, 0)] * 7))
+
+    assert count_rows(store, 'leaderboard_entries', 1) == rows
+    board = index.top('avg', '7', season=SEASON)
+    assert [(leader['id'], leader['value']) for leader in board['leaders']] == [(1, '0.357')]
+    assert board['leaders'][0]['line']['h'] == 10
+
+def test_traded_player_is_shown_with_the_team_of_their_latest_game(index, store):
+    roster = {'batters': [{'id': 1, 'name': 'Traded Player', 'position': 'CF'}], 'pitchers': []}
+    store.put_roster(147, roster)
+    store.put_roster(111, roster)   # fetched later, e.g. a stale roster still listing the player
+    index.update(1, 'hitting', SEASON, hitter([(4, 2, 0)] * 7), team_id=147)
+    leader = index.top('avg', '7', season=SEASON)['leaders'][0]
+    assert (leader['name'], leader['team_id']) == ('Traded Player', 147)
+
+    # Without a latest-game team, the most recently fetched roster wins.
+    index.update(1, 'hitting', SEASON, hitter([(4, 2, 0)] * 7))
+    assert index.top('avg', '7', season=SEASON)['leaders'][0]['team_id'] == 111
@@ -0,0 +1,93 @@
+# tests/test_rate_limiter.py
+
+"""
+RateLimiter priorities, driven by an injected clock. Waiters block on real
+condition waits, so after advancing the clock the tests keep waking them
+until they have had a chance to re-check the bucket.
+"""
+import threading
+import time
+
+import pytest
+
+from mlb_api import RateLimiter
+
+INTERACTIVE, BACKGROUND, PREFETCH = RateLimiter.INTERACTIVE, RateLimiter.BACKGROUND, RateLimiter.PREFETCH
+
+@pytest.fixture(params=['local', 'shared'])
+def limiter(request, clock, tmp_path):
+    limiter = RateLimiter(max_calls=10, time_window=60, clock=clock)
+    if request.param == 'shared':
+        limiter.state_path = str(tmp_path / 'rate_limit.bucket')
+    return limiter
+
+def wait_until(predicate, limiter=None, timeout=5.0):
+    """Polls predicate, waking the limiter's waiters on every poll."""
+    deadline = time.monotonic() + timeout
+    while True:
+        if limiter is not None:
+            with limiter.cond:
+                limiter.cond.notify_all()
+        if predicate():
+            return
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def settle(limiter, seconds=0.2):
+    """Wakes the waiters repeatedly for a while, giving any that can take a token the chance."""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        with limiter.cond:
+            limiter.cond.notify_all()
+        time.sleep(0.01)
+
+def start_acquire(limiter, priority, served):
+    thread = threading.Thread(target=lambda: (limiter.acquire(priority), served.append(priority)), daemon=True)
+    thread.start()
+    wait_until(lambda: limiter._waiting[priority] == 1)
+
+def test_prefetch_never_takes_the_bucket_below_its_reserve(limiter, clock):
+    reserve = RateLimiter.RESERVES[PREFETCH] * limiter.max_calls
+    for _ in range(int(limiter.max_calls - reserve)):
+        limiter.acquire(PREFETCH)
+    assert limiter.stats()['tokens'] == reserve
+
+    served = []
+    start_acquire(limiter, PREFETCH, served)
+    settle(limiter)
+    assert served == [] and limiter.stats()['tokens'] == reserve
+
+    # Interactive callers can still spend the reserve.
+    for _ in range(int(reserve)):
+        limiter.acquire(INTERACTIVE)
+    assert limiter.stats()['tokens'] == 0
+
+    # Refilling to just under reserve + 1 is still not enough for prefetch.
+    clock.advance((reserve + 0.5) / limiter.rate)
+    settle(limiter)
+    assert served == []
+
+    clock.advance(0.5 / limiter.rate)
+    wait_until(lambda: served == [PREFETCH], limiter)
+    assert limiter.stats()['tokens'] == reserve
+
+def test_interactive_callers_are_served_ahead_of_waiting_lower_priorities(limiter, clock):
+    for _ in range(limiter.max_calls):
+        limiter.acquire(INTERACTIVE)
+
+    served = []
+    for priority in (BACKGROUND, PREFETCH, INTERACTIVE):
+        start_acquire(limiter, priority, served)
+
+    # A token and a half: only the interactive caller may take one, though it queued last.
+    clock.advance(1.5 / limiter.rate)
+    wait_until(lambda: served == [INTERACTIVE], limiter)
+    settle(limiter)
+    assert served == [INTERACTIVE]
+
+    # A full bucket: background goes before prefetch.
+    clock.advance(limiter.time_window)
+    wait_until(lambda: len(served) == 3, limiter)
+    assert served == [INTERACTIVE, BACKGROUND, PREFETCH]
+    priorities = limiter.stats()['priorities']
+    assert all(priorities[name]['throttled'] == 1 for name in ('interactive', 'background', 'prefetch'))
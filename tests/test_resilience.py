@@ -0,0 +1,174 @@
+# tests/test_resilience.py
+
+"""
+Circuit breaker, retry policy and degraded-response caching, run against a
+fake transport and a clock that only moves when the test advances it.
+"""
+import pytest
+import requests
+
+import mlb_api
+from caching import StaleWhileRevalidateCache, memoize_key
+from mlb_api import CircuitBreaker, CircuitOpenError, HTTPTransport, MLBStatsAPI, RateLimiter
+
+URL = f"{mlb_api.MLB_API_BASE}/teams/147"
+ENDPOINT = '/teams/{id}'
+
+def make_response(status: int, body: bytes = b'{}', headers=None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.url = URL
+    response.reason = 'Fake'
+    response.headers.update(headers or {})
+    return response
+
+class FakeTransport(HTTPTransport):
+    """Replays scripted responses (or raises scripted exceptions) instead of calling upstream."""
+    def __init__(self, outcomes, **kwargs):
+        kwargs.setdefault('retry_backoff', 0.001)
+        super().__init__(**kwargs)
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30.0, clock=clock)
+    monkeypatch.setattr(mlb_api, 'circuit_breaker', breaker)
+    monkeypatch.setattr(mlb_api, 'rate_limiter', RateLimiter(max_calls=1000))
+    return breaker
+
+def use_transport(monkeypatch, *outcomes, **kwargs) -> FakeTransport:
+    fake = FakeTransport(outcomes, **kwargs)
+    monkeypatch.setattr(mlb_api, 'transport', fake)
+    return fake
+
+# Circuit breaker
+
+def test_breaker_opens_after_threshold_and_rejects_without_calling_upstream(monkeypatch, breaker):
+    fake = use_transport(monkeypatch, make_response(503), max_retries=0)
+    for _ in range(breaker.threshold):
+        with pytest.raises(requests.exceptions.HTTPError):
+            MLBStatsAPI._make_api_request(URL)
+    assert breaker.open_circuits() == [ENDPOINT]
+
+    with pytest.raises(CircuitOpenError):
+        MLBStatsAPI._make_api_request(URL)
+    assert fake.calls == breaker.threshold
+
+def test_breaker_half_open_lets_one_probe_through(breaker, clock):
+    for _ in range(breaker.threshold):
+        assert breaker.allow(ENDPOINT)
+        breaker.record(ENDPOINT, False)
+    assert not breaker.allow(ENDPOINT)
+
+    clock.advance(breaker.cooldown)
+    assert breaker.allow(ENDPOINT)        # the probe
+    assert not breaker.allow(ENDPOINT)    # everyone else waits for it
+    breaker.record(ENDPOINT, False)
+
+    # A failed probe re-opens the circuit for another cooldown.
+    assert not breaker.allow(ENDPOINT)
+    clock.advance(breaker.cooldown - 1)
+    assert not breaker.allow(ENDPOINT)
+    clock.advance(1)
+    assert breaker.allow(ENDPOINT)
+    breaker.record(ENDPOINT, True)
+
+    assert breaker.open_circuits() == []
+    assert breaker.allow(ENDPOINT) and breaker.allow(ENDPOINT)
+
+# Retries
+
+def test_client_errors_are_not_retried_or_counted_against_the_circuit(monkeypatch, breaker):
+    fake = use_transport(monkeypatch, make_response(404))
+    for _ in range(breaker.threshold + 1):
+        with pytest.raises(requests.exceptions.HTTPError):
+            MLBStatsAPI._make_api_request(URL)
+    assert fake.calls == breaker.threshold + 1
+    assert breaker.open_circuits() == []
+
+def test_server_errors_are_retried_up_to_max_retries(monkeypatch, breaker):
+    fake = use_transport(monkeypatch, make_response(503), max_retries=2)
+    with pytest.raises(requests.exceptions.HTTPError):
+        MLBStatsAPI._make_api_request(URL)
+    assert fake.calls == 3
+
+def test_a_retry_that_succeeds_returns_the_body(monkeypatch, breaker):
+    fake = use_transport(monkeypatch, requests.exceptions.ConnectionError('reset'),
+                         make_response(200, b'{"ok": true}'))
+    assert MLBStatsAPI._make_api_request(URL) == {'ok': True}
+    assert fake.calls == 2
+
+def test_retry_delay_is_jittered_within_the_backoff_and_budget():
+    transport = HTTPTransport(max_retries=3, retry_backoff=0.25, retry_budget=4.0)
+    error = requests.exceptions.Timeout('slow')
+    for attempt in range(3):
+        delays = [transport.retry_delay(error, attempt, 0.0) for _ in range(50)]
+        assert all(0.0 <= delay <= 0.25 * 2 ** attempt for delay in delays)
+    assert transport.retry_delay(error, 3, 0.0) is None
+    # A retry that would run past the budget is not made.
+    assert transport.retry_delay(error, 0, 4.0) is None
+
+def test_retry_after_is_honoured_only_within_the_budget():
+    transport = HTTPTransport(max_retries=2, retry_backoff=0.25, retry_budget=4.0)
+    throttled = requests.exceptions.HTTPError(response=make_response(429, headers={'Retry-After': '2'}))
+    assert transport.retry_delay(throttled, 0, 0.0) == 2.0
+    assert transport.retry_delay(throttled, 0, 3.0) is None
+
+def test_open_circuit_is_not_retried():
+    transport = HTTPTransport(max_retries=2)
+    assert transport.retry_delay(CircuitOpenError('open'), 0, 0.0) is None
+
+# Degraded responses
+
+class RecordingCache(StaleWhileRevalidateCache):
+    """Records the hard TTL of every store."""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.stored = []
+
+    def set(self, key, value, timeout=None, stale=False):
+        self.stored.append((value, timeout))
+        super().set(key, value, timeout=timeout, stale=stale)
+
+@pytest.fixture
+def swr(app):
+    return RecordingCache(negative_timeout=5)
+
+def test_fallback_is_not_stored_over_a_good_value(swr):
+    upstream_ok = [True]
+
+    @swr.memoize(soft_timeout=60, timeout=3600)
+    def fetch(team_id):
+        if upstream_ok[0]:
+            return {'team': team_id, 'name': 'Fresh'}
+        swr.mark_degraded()
+        return {'team': team_id, 'name': 'Placeholder'}
+
+    assert fetch(147)['name'] == 'Fresh'
+    key = memoize_key(fetch, 147)
+    swr.mark_stale(key, timeout=3600)
+    swr.stored.clear()
+
+    upstream_ok[0] = False
+    with swr.revalidation():
+        assert fetch(147)['name'] == 'Fresh'
+    assert swr.stored == []
+    assert swr.get(key).value['name'] == 'Fresh'
+
+def test_fallback_with_nothing_cached_is_stored_for_negative_timeout(swr):
+    @swr.memoize(soft_timeout=60, timeout=3600)
+    def fetch(team_id):
+        swr.mark_degraded()
+        return {'team': team_id, 'name': 'Placeholder'}
+
+    assert fetch(147)['name'] == 'Placeholder'
+    assert swr.stored == [({'team': 147, 'name': 'Placeholder'}, 5)]
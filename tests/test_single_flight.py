@@ -0,0 +1,142 @@
+# tests/test_single_flight.py
+
+"""
+SingleFlight: coalescing concurrent misses, lock ordering, and the striped
+file locks. Two instances sharing a lock directory stand in for two gunicorn
+workers, since flock conflicts between separately opened files even within
+one process.
+"""
+import threading
+import time
+
+import pytest
+
+import caching
+from caching import SingleFlight, StaleWhileRevalidateCache, memoize_key
+
+@pytest.fixture
+def lock_dir(tmp_path):
+    (tmp_path / 'cache-locks').mkdir()
+    return str(tmp_path / 'cache-locks')
+
+@pytest.fixture
+def flight(lock_dir):
+    return SingleFlight(lock_dir=lock_dir, stripes=4, timeout=10.0)
+
+def hold(flight, keys, entered, release):
+    """Holds the locks for keys on a thread until release is set."""
+    def run():
+        with flight.lock_many(keys):
+            entered.set()
+            release.wait(10)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert entered.wait(5)
+    return thread
+
+def test_racing_misses_for_one_key_make_one_upstream_call(app, monkeypatch, flight):
+    monkeypatch.setattr(caching, 'single_flight', flight)
+    swr = StaleWhileRevalidateCache()
+    calls = []
+    start = threading.Barrier(8)
+
+    @swr.memoize(soft_timeout=60, timeout=3600)
+    def fetch(team_id):
+        calls.append(team_id)
+        time.sleep(0.1)
+        return {'team': team_id}
+
+    # As at startup (MLBStatsAPI.ensure_memoize_versions), so every racer computes the same key.
+    memoize_key(fetch)
+    results = []
+    def request():
+        start.wait()
+        with app.app_context():
+            results.append(fetch(147))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert calls == [147]
+    assert results == [{'team': 147}] * 8
+
+def test_overlapping_lock_many_callers_do_not_deadlock(flight):
+    key_sets = [['a', 'b', 'c'], ['c', 'b'], ['d', 'a'], ['b', 'd', 'c', 'a']]
+    holders = {key: 0 for key in 'abcd'}
+    overlaps = []
+    guard = threading.Lock()
+
+    def worker(keys):
+        for _ in range(25):
+            with flight.lock_many(keys):
+                with guard:
+                    for key in keys:
+                        holders[key] += 1
+                        if holders[key] > 1:
+                            overlaps.append(key)
+                time.sleep(0.001)
+                with guard:
+                    for key in keys:
+                        holders[key] -= 1
+
+    threads = [threading.Thread(target=worker, args=(keys,), daemon=True) for keys in key_sets * 2]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(8)
+
+    # A deadlock would only break once the 10s lock timeout let callers through.
+    assert not any(thread.is_alive() for thread in threads)
+    assert time.monotonic() - started < flight.timeout
+    assert overlaps == []
+
+def test_a_stripe_flocked_by_another_process_is_waited_for(lock_dir):
+    other = SingleFlight(lock_dir=lock_dir, stripes=1, timeout=10.0)
+    mine = SingleFlight(lock_dir=lock_dir, stripes=1, timeout=10.0)
+    entered, release = threading.Event(), threading.Event()
+    holder = hold(other, ['team:147'], entered, release)
+
+    # A different key, but with one stripe it hashes to the same lock file.
+    acquired, done = threading.Event(), threading.Event()
+    waiter = threading.Thread(target=lambda: hold(mine, ['team:111'], acquired, done), daemon=True)
+    waiter.start()
+    time.sleep(0.3)
+    assert not acquired.is_set()
+
+    release.set()
+    holder.join(5)
+    assert acquired.wait(5)
+    done.set()
+
+def test_threads_in_one_process_share_a_flocked_stripe(flight):
+    flight.stripes = 1
+    entered, release = threading.Event(), threading.Event()
+    holder = hold(flight, ['team:147'], entered, release)
+
+    # Another key on the same stripe doesn't wait for the holder's flock.
+    started = time.monotonic()
+    with flight.lock('team:111'):
+        assert time.monotonic() - started < 1.0
+    release.set()
+    holder.join(5)
+    assert flight._stripes == {} and flight._locks == {}
+
+@pytest.mark.parametrize('same_process', [True, False])
+def test_a_lock_that_times_out_is_proceeded_without(flight, lock_dir, same_process):
+    entered, release = threading.Event(), threading.Event()
+    holder = hold(flight, ['team:147'], entered, release)
+
+    waiter = flight if same_process else SingleFlight(lock_dir=lock_dir, stripes=4)
+    waiter.timeout = 0.2
+    started = time.monotonic()
+    with waiter.lock('team:147'):
+        waited = time.monotonic() - started
+    assert 0.2 <= waited < 2.0
+    assert holder.is_alive()
+
+    release.set()
+    holder.join(5)
@@ -0,0 +1,133 @@
+# tests/test_snapshots.py
+
+"""
+Snapshot export and import between stats stores on disk.
+"""
+import gzip
+import json
+from datetime import datetime
+
+import pytest
+
+from snapshots import SnapshotError, export_snapshot, import_snapshot, read_snapshot
+from store import StatsStore
+
+SEASON = datetime.now().year
+
+def make_game(game_pk: int, state: str, home_score: int, away_score: int, date: str = '2024-06-01'):
+    return {'gamePk': game_pk, 'officialDate': date, 'gameDate': f"{date}T23:05:00Z",
+            'status': {'abstractGameState': state, 'detailedState': state},
+            'teams': {'home': {'team': {'id': 147}, 'score': home_score},
+                      'away': {'team': {'id': 111}, 'score': away_score}}}
+
+def make_split(game_pk: int, date: str, hits: int):
+    return {'date': date, 'game': {'gamePk': game_pk}, 'team': {'id': 147},
+            'stat': {'atBats': 4, 'hits': hits, 'baseOnBalls': 0, 'homeRuns': 0, 'totalBases': hits}}
+
+@pytest.fixture
+def make_store(tmp_path):
+    def make(name: str) -> StatsStore:
+        store = StatsStore()
+        store.open(str(tmp_path / f"{name}.db"))
+        return store
+    return make
+
+@pytest.fixture
+def source(make_store):
+    store = make_store('source')
+    store.put_schedule('schedule:2024-06-01', [{'date': '2024-06-01', 'games': [make_game(1, 'Final', 5, 3),
+                                                                                make_game(2, 'Live', 1, 0)]}])
+    store.put_team_info(147, {'teams': [{'id': 147, 'name': 'New York Yankees'}]})
+    store.put_roster(147, {'batters': [{'id': 10, 'name': 'A Batter', 'position': 'RF'}],
+                           'pitchers': [{'id': 20, 'name': 'A Pitcher', 'position': 'P'}]})
+    store.put_game_logs(10, 'hitting', SEASON, [make_split(1, '2024-06-01', 2), make_split(3, '2024-06-02', 1)])
+    return store
+
+@pytest.fixture
+def snapshot(tmp_path, source):
+    path = str(tmp_path / 'snapshot.json.gz')
+    export_snapshot(path, source)
+    return path
+
+def rewrite(path: str, edit):
+    """Rewrites a snapshot's lines through edit(lines) -> lines, leaving its manifest as it was."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        lines = f.readlines()
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.writelines(edit(lines))
+
+def test_round_trip_into_an_empty_store(snapshot, source, make_store):
+    target = make_store('target')
+    result = import_snapshot(snapshot, target)
+
+    assert result['skipped'] == []
+    assert target.get_schedule('2024-06-01', '2024-06-01') == source.get_schedule('2024-06-01', '2024-06-01')
+    assert target.get_team_info(147) == source.get_team_info(147)
+    assert target.get_roster(147) == source.get_roster(147)
+    assert target.get_game_logs(10, 'hitting', SEASON) == source.get_game_logs(10, 'hitting', SEASON)
+    # Fetch times travel with the data, so freshness carries on from the exporter.
+    for resource in ('team:147', 'roster:147', StatsStore.game_log_resource(10, 'hitting', SEASON)):
+        assert target.fetched_at(resource) == source.fetched_at(resource)
+
+def test_corrupted_table_is_skipped_and_the_rest_loads(snapshot, make_store):
+    def corrupt_team(lines):
+        return [line.replace('New York Yankees', 'New York Mets') if line.startswith('["teams"') else line
+                for line in lines]
+    rewrite(snapshot, corrupt_team)
+
+    target = make_store('target')
+    result = import_snapshot(snapshot, target)
+
+    assert result['skipped'] == ['teams']
+    assert target.get_team_info(147) is None
+    assert target.fetched_at('team:147') is None
+    assert target.get_roster(147) is not None
+    assert len(target.get_game_logs(10, 'hitting', SEASON)) == 2
+
+@pytest.mark.parametrize('truncate', ['manifest', 'bytes'])
+def test_truncated_snapshot_is_rejected(snapshot, make_store, truncate):
+    if truncate == 'manifest':
+        rewrite(snapshot, lambda lines: lines[:-1])
+    else:
+        with open(snapshot, 'rb') as f:
+            data = f.read()
+        with open(snapshot, 'wb') as f:
+            f.write(data[:len(data) // 2])
+
+    target = make_store('target')
+    with pytest.raises(SnapshotError):
+        read_snapshot(snapshot)
+    with pytest.raises(SnapshotError):
+        import_snapshot(snapshot, target)
+    assert target.get_schedule('2024-06-01', '2024-06-01') == []
+
+def test_stale_snapshot_is_loaded_without_teams_and_rosters(snapshot, make_store):
+    target = make_store('target')
+    result = import_snapshot(snapshot, target, max_age=0)
+
+    assert sorted(result['skipped']) == ['roster_entries', 'teams']
+    assert target.get_team_info(147) is None
+    assert target.get_roster(147) is None
+    assert target.fetched_at('roster:147') is None
+    # Games and logs still seed the store.
+    assert len(target.get_schedule('2024-06-01', '2024-06-01')[0]['games']) == 2
+    assert len(target.get_game_logs(10, 'hitting', SEASON)) == 2
+
+def test_locally_final_game_is_not_overwritten(tmp_path, make_store):
+    source = make_store('source')
+    source.put_schedule('schedule:2024-06-01', [{'date': '2024-06-01', 'games': [make_game(1, 'Live', 2, 1),
+                                                                                make_game(2, 'Final', 4, 0)]}])
+    path = str(tmp_path / 'snapshot.json.gz')
+    export_snapshot(path, source)
+
+    target = make_store('target')
+    target.put_schedule('schedule:2024-06-01', [{'date': '2024-06-01', 'games': [make_game(1, 'Final', 5, 3),
+                                                                                make_game(2, 'Live', 3, 0)]}])
+    import_snapshot(path, target)
+
+    games = {game['gamePk']: game for game in target.get_schedule('2024-06-01', '2024-06-01')[0]['games']}
+    assert games[1]['status']['abstractGameState'] == 'Final'
+    assert games[1]['teams']['home']['score'] == 5
+    # A game not yet final here takes the snapshot's copy.
+    assert games[2]['status']['abstractGameState'] == 'Final'
+    assert games[2]['teams']['home']['score'] == 4
@@ -0,0 +1,73 @@
+# tests/test_stat_columns.py
+
+"""
+GameLog projection and PlayerStatColumns window totals.
+"""
+import pytest
+
+from stat_columns import GameLog, PlayerStatColumns, innings_to_outs
+
+def split(day, **stat):
+    return {'date': f"2024-06-{day:02d}", 'game': {'gamePk': 100 + day}, 'stat': stat}
+
+def hitter_columns(lines):
+    """Stat columns from (at-bats, hits, walks) per game, most recent first."""
+    splits = [split(30 - i, atBats=ab, hits=h, baseOnBalls=bb, totalBases=h) for i, (ab, h, bb) in enumerate(lines)]
+    return PlayerStatColumns('hitting', GameLog('hitting', splits))
+
+@pytest.mark.parametrize('innings, outs', [
+    ('6.2', 20), ('0.1', 1), ('7.0', 21), ('0.0', 0), ('12', 36), (3, 9), (None, 0), ('', 0),
+])
+def test_innings_to_outs(innings, outs):
+    assert innings_to_outs(innings) == outs
+
+def test_game_log_keeps_every_game_and_projects_innings_to_outs():
+    log = GameLog('pitching', [split(30, inningsPitched='5.2', earnedRuns=2, strikeOuts=6),
+                               split(28, inningsPitched='0.0', earnedRuns=1)])
+    assert len(log) == 2
+    assert list(log.values['outs']) == [17, 0]
+    assert list(log.values['er']) == [2, 1]
+    assert list(log.game_pks) == [130, 128]
+    assert log.latest_date == '2024-06-30'
+    assert GameLog('pitching', []).latest_date is None
+
+def test_only_appearances_are_summed():
+    columns = hitter_columns([(4, 2, 0), (0, 0, 2), (3, 1, 1)])
+    assert columns.games == len(columns) == 2
+    assert list(columns.sums['ab']) == [0, 4, 7]
+    assert list(columns.sums['bb']) == [0, 0, 1]
+
+    pitching = PlayerStatColumns('pitching', GameLog('pitching', [
+        split(30, inningsPitched='0.0', earnedRuns=3), split(29, inningsPitched='1.1', earnedRuns=1)]))
+    assert pitching.games == 1
+    assert pitching.window()['er'] == 1
+
+def test_windows_are_differences_of_prefix_sums():
+    lines = [(4, 2, 0), (3, 1, 1), (5, 0, 0), (4, 3, 2), (2, 1, 0)]
+    columns = hitter_columns(lines)
+    for num_games in range(1, len(lines) + 1):
+        for skip in range(len(lines) - num_games + 1):
+            window = columns.window(num_games, skip)
+            chosen = lines[skip:skip + num_games]
+            assert window == {'ab': sum(ab for ab, _, _ in chosen), 'h': sum(h for _, h, _ in chosen),
+                              'hr': 0, 'rbi': 0, 'bb': sum(bb for _, _, bb in chosen),
+                              'tb': sum(h for _, h, _ in chosen), 'k': 0, 'games': num_games}
+
+def test_season_to_date_window_covers_every_appearance():
+    columns = hitter_columns([(4, 2, 0), (0, 0, 1), (3, 1, 1)])
+    assert columns.window() == columns.window(None) == {'ab': 7, 'h': 3, 'hr': 0, 'rbi': 0, 'bb': 1,
+                                                        'tb': 3, 'k': 0, 'games': 2}
+    assert columns.window(None, skip=1)['ab'] == 3
+
+def test_windows_longer_than_the_log_are_clamped():
+    columns = hitter_columns([(4, 2, 0), (3, 1, 1)])
+    assert columns.window(21) == columns.window()
+    assert columns.window(21)['games'] == 2
+    assert columns.window(5, skip=1) == dict(columns.window(1, skip=1), games=1)
+    assert columns.window(5, skip=10) == {'ab': 0, 'h': 0, 'hr': 0, 'rbi': 0, 'bb': 0, 'tb': 0, 'k': 0, 'games': 0}
+
+def test_empty_log_has_empty_windows():
+    columns = hitter_columns([])
+    assert columns.games == 0
+    assert columns.window(7) == columns.window() == {'ab': 0, 'h': 0, 'hr': 0, 'rbi': 0, 'bb': 0,
+                                                     'tb': 0, 'k': 0, 'games': 0}
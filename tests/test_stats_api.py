@@ -0,0 +1,95 @@
+# tests/test_stats_api.py
+
+"""
+The JSON stats API: ETags, conditional requests and error responses,
+served through the Flask test client from a fixed matchup view.
+"""
+import copy
+
+import pytest
+
+import routes
+from stat_columns import HITTER_PERIODS
+
+HOME, AWAY = 147, 111
+
+def make_team(team_id: int, name: str, hits: int):
+    batter = {'id': team_id * 10, 'name': f"{name} Batter", 'position': 'CF',
+              'stats_by_period': {period: {'avg': f"{hits / 20:.3f}", 'obp': '.350', 'slg': '.400', 'hr': 1,
+                                           'rbi': 2, 'h': hits, 'ab': 20, 'k': 4}
+                                  for period in HITTER_PERIODS}}
+    pitcher = {'id': team_id * 10 + 1, 'name': f"{name} Pitcher", 'position': 'P',
+               'stats_by_period': {period: {'era': '3.00', 'whip': '1.10', 'k': 9, 'bb': 2, 'ip': '12.0',
+                                            'h': 11, 'r': 4, 'gs': 2, 'sv': 0}
+                                   for period in HITTER_PERIODS}}
+    return {'id': team_id, 'name': name,
+            'gameHistory': {period: {'record': '4-3', 'games_played': 7, 'game_log': []} for period in HITTER_PERIODS},
+            'rollingTeamStats': {period: {'AVG': '.250', 'OBP': '.320', 'SLG': '.400', 'HR': 5,
+                                          'AVG_HITS': '8.1', 'AVG_K': '7.9'} for period in HITTER_PERIODS},
+            'fullRoster': {'batters': {period: [batter] for period in HITTER_PERIODS},
+                           'pitchers': {period: [pitcher] for period in HITTER_PERIODS}}}
+
+VIEW = {'home_team': make_team(HOME, 'New York Yankees', 6), 'away_team': make_team(AWAY, 'Boston Red Sox', 5)}
+
+@pytest.fixture
+def view(monkeypatch):
+    view = copy.deepcopy(VIEW)
+    monkeypatch.setattr(routes, 'get_matchup_view', lambda home_id, away_id: view)
+    return view
+
+@pytest.fixture
+def client(app, view):
+    app.register_blueprint(routes.main_bp)
+    return app.test_client()
+
+def stats_url(period='7', team=None):
+    url = f"/api/load-stats/{HOME}/{AWAY}/{period}"
+    return url if team is None else f"{url}?team={team}"
+
+def test_etag_is_stable_for_unchanged_data(client):
+    first = client.get(stats_url())
+    second = client.get(stats_url())
+    assert first.status_code == second.status_code == 200
+    assert first.headers['ETag'] and first.headers['ETag'] == second.headers['ETag']
+    assert first.data == second.data
+    assert 'no-cache' in first.headers['Cache-Control']
+
+def test_etag_changes_with_the_data(client, view):
+    before = client.get(stats_url()).headers['ETag']
+    view['home_team']['fullRoster']['batters']['7'][0]['stats_by_period']['7']['h'] += 1
+    assert client.get(stats_url()).headers['ETag'] != before
+    # Other periods are untouched.
+    assert client.get(stats_url('10')).headers['ETag'] == client.get(stats_url('10')).headers['ETag']
+
+def test_matching_if_none_match_gets_a_304(client):
+    etag = client.get(stats_url()).headers['ETag']
+    response = client.get(stats_url(), headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    stale = client.get(stats_url(), headers={'If-None-Match': '"not-the-current-etag"'})
+    assert stale.status_code == 200 and stale.json['status'] == 'success'
+
+def test_team_slice_has_its_own_etag(client):
+    both = client.get(stats_url())
+    home = client.get(stats_url(team=HOME))
+    assert set(both.json['teams']) == {'home', 'away'}
+    assert set(home.json['teams']) == {'home'}
+    assert home.headers['ETag'] != both.headers['ETag']
+
+def test_unknown_period_is_a_404(client):
+    response = client.get(stats_url('season'))
+    assert response.status_code == 404
+    assert response.json['status'] == 'error'
+
+def test_team_not_in_the_matchup_is_a_404(client):
+    response = client.get(stats_url(team=999))
+    assert response.status_code == 404
+    assert response.json['status'] == 'error'
+
+def test_missing_view_is_a_503(client, monkeypatch):
+    monkeypatch.setattr(routes, 'get_matchup_view', lambda home_id, away_id: None)
+    response = client.get(stats_url())
+    assert response.status_code == 503
+    assert 'ETag' not in response.headers
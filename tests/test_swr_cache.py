@@ -0,0 +1,119 @@
+# tests/test_swr_cache.py
+
+"""
+StaleWhileRevalidateCache freshness, driven by an injected clock. The
+in-process cache backend reads the same clock, so hard TTLs expire only when
+the test advances it too.
+"""
+import cachelib.simple
+import pytest
+
+from caching import StaleWhileRevalidateCache, memoize_key
+
+@pytest.fixture
+def swr(app, monkeypatch, clock):
+    monkeypatch.setattr(cachelib.simple, 'time', clock)
+    swr = StaleWhileRevalidateCache(max_workers=1, negative_timeout=5, clock=clock)
+    yield swr
+    if swr._executor is not None:
+        swr._executor.shutdown(wait=True)
+
+def wait_for_refreshes(swr):
+    """Blocks until every queued background refresh has run."""
+    swr._executor.submit(lambda: None).result(timeout=5)
+
+@pytest.fixture
+def upstream(swr):
+    """A memoized fetch returning upstream['value'] and counting its calls."""
+    upstream = {'value': 'v1', 'calls': 0, 'degraded': False}
+
+    @swr.memoize(soft_timeout=60, timeout=3600)
+    def fetch(team_id):
+        upstream['calls'] += 1
+        if upstream['degraded']:
+            swr.mark_degraded()
+            return 'placeholder'
+        return upstream['value']
+
+    memoize_key(fetch)
+    upstream['fetch'] = fetch
+    return upstream
+
+def test_fresh_value_is_served_without_calling_upstream(upstream, clock):
+    fetch = upstream['fetch']
+    assert fetch(147) == 'v1'
+    clock.advance(59)
+    upstream['value'] = 'v2'
+    assert fetch(147) == 'v1'
+    assert upstream['calls'] == 1
+
+def test_stale_value_is_served_while_a_background_refresh_replaces_it(swr, upstream, clock):
+    fetch = upstream['fetch']
+    fetch(147)
+    clock.advance(60)
+    upstream['value'] = 'v2'
+
+    assert fetch(147) == 'v1'
+    assert swr.stale_reads == 1
+    wait_for_refreshes(swr)
+    assert upstream['calls'] == 2
+
+    entry = swr.get(memoize_key(fetch, 147))
+    assert entry.value == 'v2' and swr.is_fresh(entry, 60)
+    assert fetch(147) == 'v2'
+    assert upstream['calls'] == 2
+
+def test_revalidation_treats_stale_values_as_misses(swr, upstream, clock):
+    fetch = upstream['fetch']
+    fetch(147)
+    clock.advance(60)
+    upstream['value'] = 'v2'
+    with swr.revalidation():
+        assert fetch(147) == 'v2'
+    assert swr._executor is None
+
+def test_mark_all_stale_before_keeps_later_entries_fresh(swr, upstream, clock):
+    fetch = upstream['fetch']
+    fetch(1)
+    clock.advance(10)
+    cutoff = clock()
+    clock.advance(10)
+    fetch(2)
+
+    swr.mark_all_stale(before=cutoff)
+    assert not swr.is_fresh(swr.get(memoize_key(fetch, 1)), None)
+    assert swr.is_fresh(swr.get(memoize_key(fetch, 2)), None)
+
+    # A line drawn in the future is pulled back to now.
+    clock.advance(1)
+    swr.mark_all_stale(before=clock() + 100)
+    assert not swr.is_fresh(swr.get(memoize_key(fetch, 2)), None)
+    clock.advance(1)
+    fetch(3)
+    assert swr.is_fresh(swr.get(memoize_key(fetch, 3)), None)
+
+def test_epoch_is_shared_through_the_cache(swr, upstream, clock):
+    fetch = upstream['fetch']
+    fetch(147)
+    clock.advance(1)
+    other = StaleWhileRevalidateCache(epoch_check_interval=0, clock=clock)
+    other.mark_all_stale()
+    swr.epoch_check_interval = 0
+    assert not swr.is_fresh(swr.get(memoize_key(fetch, 147)), None)
+
+def test_degraded_value_expires_after_negative_timeout(swr, upstream, clock):
+    fetch = upstream['fetch']
+    upstream['degraded'] = True
+    assert fetch(147) == 'placeholder'
+    clock.advance(swr.negative_timeout - 1)
+    assert fetch(147) == 'placeholder'
+    assert upstream['calls'] == 1
+
+    upstream['degraded'] = False
+    clock.advance(1)
+    assert fetch(147) == 'v1'
+    assert upstream['calls'] == 2
+    # The good value gets the full hard TTL.
+    clock.advance(swr.negative_timeout)
+    assert fetch(147) == 'v1'
+    assert upstream['calls'] == 2
@@ -0,0 +1,98 @@
+# tests/test_tiered_cache.py
+
+"""
+TwoTierFileSystemCache coherence: the in-memory tier is dropped whenever
+the shared file it was loaded from changes, whichever process changed it.
+Two instances on one cache directory stand in for two gunicorn workers.
+"""
+import os
+
+import pytest
+
+from tiered_cache import TwoTierFileSystemCache
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'cache')
+
+@pytest.fixture
+def mine(cache_dir):
+    return TwoTierFileSystemCache(cache_dir)
+
+@pytest.fixture
+def other(cache_dir):
+    return TwoTierFileSystemCache(cache_dir)
+
+def warm(cache, key):
+    """Reads key twice, so the second read is served from the L1."""
+    value = cache.get(key)
+    hits = cache.l1.counters['hits']
+    assert cache.get(key) is value
+    assert cache.l1.counters['hits'] == hits + 1
+    return value
+
+def test_l1_serves_repeat_reads_as_the_same_object(mine):
+    mine.set('roster:147', {'batters': [1, 2, 3]})
+    # set() also reads the file-count entry, so compare counts around the reads only.
+    l2_hits = mine.stats()['l2']['hits']
+    assert warm(mine, 'roster:147') == {'batters': [1, 2, 3]}
+    assert mine.stats()['l2']['hits'] == l2_hits + 1
+
+def test_rewrite_by_another_process_drops_the_l1_entry(mine, other):
+    mine.set('roster:147', 'old')
+    warm(mine, 'roster:147')
+
+    other.set('roster:147', 'new')
+    invalidations = mine.l1.counters['invalidations']
+    assert mine.get('roster:147') == 'new'
+    assert mine.l1.counters['invalidations'] == invalidations + 1
+
+def test_delete_by_another_process_drops_the_l1_entry(mine, other):
+    mine.set('roster:147', 'old')
+    warm(mine, 'roster:147')
+
+    other.delete('roster:147')
+    assert mine.get('roster:147') is None
+    assert mine.l1.stats()['entries'] == 0
+
+def test_in_place_rewrite_of_the_same_size_is_noticed(mine, other):
+    # Same inode and size; only the mtime tells the two files apart.
+    mine.set('team:147', 'aaaa')
+    other.set('team:111', 'bbbb')
+    warm(mine, 'team:147')
+    filename = mine._get_filename('team:147')
+    with open(other._get_filename('team:111'), 'rb') as f:
+        data = f.read()
+    st = os.stat(filename)
+    assert st.st_size == len(data)
+
+    with open(filename, 'r+b') as f:
+        f.write(data)
+    os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert os.stat(filename).st_ino == st.st_ino
+    assert mine.get('team:147') == 'bbbb'
+
+def test_own_writes_invalidate_without_a_stat_change(mine):
+    mine.set('team:147', 'v1')
+    warm(mine, 'team:147')
+    mine.set('team:147', 'v2')
+    assert mine.get('team:147') == 'v2'
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_l1_is_reset_in_a_forked_child(mine):
+    mine.set('team:147', 'v1')
+    warm(mine, 'team:147')
+    assert mine.l1.stats()['entries'] == 1
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: report through the exit code; never return into pytest.
+        try:
+            ok = mine.l1.stats()['entries'] == 0 and mine.l1.stats()['bytes'] == 0 and mine.get('team:147') == 'v1'
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+    # The parent keeps its tier.
+    assert mine.l1.stats()['entries'] == 1
@@ -0,0 +1,205 @@
+# tiered_cache.py
+
+"""
+Two-tier cache backend: a per-process in-memory L1 in front of the shared
+FileSystemCache (L2) in CACHE_DIR.
+
+Every read of the file cache costs a file read and an unpickle. The L1 keeps
+recently read values as live objects in an LRU bounded by bytes, so a warm
+lookup is an os.stat() of the L2 file plus a dictionary hit.
+
+The stat is what keeps the tiers coherent across gunicorn workers: each L1
+entry remembers the inode, mtime and size of the L2 file it was loaded from,
+and is dropped as soon as the file is rewritten, deleted or cleared by any
+process. Writes and deletes through this backend invalidate the L1 entry
+directly. Values served from the L1 are shared objects and must not be
+mutated by callers.
+
+Selected with CACHE_TYPE = 'tiered_cache.TwoTierFileSystemCache'.
+"""
+import os
+import time
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from flask_caching.backends.filesystemcache import FileSystemCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# (inode, mtime in ns, size) of the L2 file an L1 entry was loaded from
+FileStamp = Tuple[int, int, int]
+
+def _stamp(st: os.stat_result) -> FileStamp:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+class MemoryTier:
+    """
+    Thread-safe LRU of live values with a TTL, bounded by total bytes.
+
+    Sizes are the pickled sizes of the L2 files, which tracks memory use
+    closely enough to bound it without measuring object graphs.
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, Tuple[Any, FileStamp, int, float]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _drop(self, key: str):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: str, stamp: Optional[FileStamp]) -> Any:
+        """
+        Returns the value for key if it was loaded from the file with this
+        stamp, else _MISSING. A stamp of None means the file is gone.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_stamp, _, expires = entry
+                if stamp is not None and entry_stamp == stamp and time.monotonic() < expires:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return value
+                self._drop(key)
+                self.counters['invalidations'] += 1
+            self.counters['misses'] += 1
+            return _MISSING
+
+    def put(self, key: str, value: Any, stamp: FileStamp, size: int, ttl: Optional[float] = None):
+        """Stores value for key; values larger than the whole tier are not kept."""
+        if size > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, stamp, size, time.monotonic() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def discard(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.counters['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_after_fork(self):
+        """Starts the child with an empty tier and a fresh lock."""
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+
+class TwoTierFileSystemCache(FileSystemCache):
+    """
+    FileSystemCache with a MemoryTier in front of it.
+
+    Configured through CACHE_L1_MAX_BYTES (0 disables the L1) and CACHE_L1_TTL
+    on top of the usual FileSystemCache settings.
+    """
+    def __init__(self, cache_dir, l1_max_bytes: int = 64 * 1024 * 1024, l1_ttl: float = 300.0, **kwargs):
+        self.l1: Optional[MemoryTier] = None  # FileSystemCache.__init__ already writes through set()
+        self.l2_counters = {'hits': 0, 'misses': 0}
+        self._counter_lock = threading.Lock()
+        super().__init__(cache_dir, **kwargs)
+        self.l1 = MemoryTier(max_bytes=l1_max_bytes, ttl=l1_ttl) if l1_max_bytes > 0 else None
+        if self.l1 is not None and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.l1.reset_after_fork)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            l1_max_bytes=config.get('CACHE_L1_MAX_BYTES', 64 * 1024 * 1024),
+            l1_ttl=config.get('CACHE_L1_TTL', 300.0),
+        )
+        return super().factory(app, config, args, kwargs)
+
+    def _count_l2(self, outcome: str):
+        with self._counter_lock:
+            self.l2_counters[outcome] += 1
+
+    def _read_l2(self, key: str, filename: str) -> Any:
+        """Loads key from its file, filling the L1 on a hit."""
+        try:
+            with open(filename, 'rb') as f:
+                # The stamp of the open file matches exactly the bytes read below.
+                stamp = _stamp(os.fstat(f.fileno()))
+                expires = struct.unpack('I', f.read(4))[0]
+                if expires != 0 and expires < time.time():
+                    self._count_l2('misses')
+                    return None
+                value = self.serializer.load(f)
+        except FileNotFoundError:
+            self._count_l2('misses')
+            return None
+        except (OSError, EOFError, struct.error):
+            logger.warning(f"Exception raised while reading cache file '{filename}'", exc_info=True)
+            self._count_l2('misses')
+            return None
+        if value is None:
+            self._count_l2('misses')
+            return None
+        self._count_l2('hits')
+        if self.l1 is not None:
+            self.l1.put(key, value, stamp, stamp[2], ttl=expires - time.time() if expires else None)
+        return value
+
+    def get(self, key: str) -> Any:
+        filename = self._get_filename(key)
+        if self.l1 is None:
+            return self._read_l2(key, filename)
+        try:
+            stamp = _stamp(os.stat(filename))
+        except FileNotFoundError:
+            self.l1.get(key, None)
+            self._count_l2('misses')
+            return None
+        value = self.l1.get(key, stamp)
+        if value is not _MISSING:
+            return value
+        return self._read_l2(key, filename)
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None, mgmt_element: bool = False) -> bool:
+        result = super().set(key, value, timeout, mgmt_element=mgmt_element)
+        if self.l1 is not None:
+            # The next read reloads it, so the L1 never holds an object a caller still owns.
+            self.l1.discard(key)
+        return result
+
+    def delete(self, key: str, mgmt_element: bool = False) -> bool:
+        result = super().delete(key, mgmt_element=mgmt_element)
+        if self.l1 is not None:
+            self.l1.discard(key)
+        return result
+
+    def clear(self) -> bool:
+        result = super().clear()
+        if self.l1 is not None:
+            self.l1.clear()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tier hit/miss counters of this process, plus the L1's size."""
+        with self._counter_lock:
+            l2 = dict(self.l2_counters)
+        return {'l1': self.l1.stats() if self.l1 is not None else None, 'l2': l2}
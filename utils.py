@@ -4,14 +4,25 @@
 Helper functions for data processing, calculations, and team data construction.
 """
 
+import copy
+import queue
 import logging
-from datetime import datetime, timedelta
+import threading
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta
 import pytz
-from typing import List, Dict, Any, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import json 
+import numpy as np
+from flask import current_app, has_app_context
 
-from mlb_api import MLBStatsAPI, MLB_API_BASE
+from aggregation import StatWindows, EMPTY_TEAM_STATS, format_player_stats, rolling_team_stats
+from mlb_api import MLBStatsAPI, rate_limiter
+from caching import single_flight, swr_cache
+from stat_columns import HITTER_PERIODS, PITCHER_PERIODS, PERIOD_DAYS, PERIOD_LABELS, PlayerStatColumns
+from workers import fetch_pool
+from profiling import profiler
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +39,11 @@ TEAM_ABBREVIATIONS = {
     'Texas Rangers': 'TEX', 'Toronto Blue Jays': 'TOR', 'Washington Nationals': 'WSH'
 }
 
+# Materialized matchup views are rebuilt in the background after this many seconds.
+MATCHUP_VIEW_SOFT_TIMEOUT = MLBStatsAPI.GAME_LOG_SOFT_TIMEOUT
+# Players shown per roster group on the details page.
+ROSTER_DISPLAY_LIMIT = 15
+
 def get_team_logo_url(team_id: int) -> str:
     """Generates the URL for a team's logo."""
     if not team_id:
@@ -84,140 +100,95 @@ def get_stat_class(value: Any, stat: str) -> str:
         if val < t['bad']: return 'stat-bad'
     return ""
 
-def _get_default_stats(stat_type: str) -> Dict[str, Any]:
-    if stat_type == 'hitting':
-        return {'avg': '.000', 'obp': '.000', 'slg': '.000', 'hr': 0, 'rbi': 0, 'h': 0, 'ab': 0, 'k': 0}
-    return {'era': '0.00', 'whip': '0.00', 'k': 0, 'bb': 0, 'ip': '0.0', 'h': 0, 'r': 0, 'gs': 0, 'sv': 0}
-
-def _aggregate_hitting_stats(game_logs: List[Dict[str, Any]]) -> Dict[str, Any]:
-    if not game_logs: return _get_default_stats('hitting')
-    totals = {'ab': 0, 'h': 0, 'hr': 0, 'rbi': 0, 'bb': 0, 'tb': 0, 'k': 0}
-    for game in game_logs:
-        stat = game.get('stat', {})
-        totals['ab'] += stat.get('atBats', 0)
-        totals['h'] += stat.get('hits', 0)
-        totals['hr'] += stat.get('homeRuns', 0)
-        totals['rbi'] += stat.get('rbi', 0)
-        totals['bb'] += stat.get('baseOnBalls', 0)
-        totals['tb'] += stat.get('totalBases', 0)
-        totals['k'] += stat.get('strikeOuts', 0)
-        
-    avg = f"{(totals['h'] / totals['ab']):.3f}" if totals['ab'] > 0 else ".000"
-    obp = f"{((totals['h'] + totals['bb']) / (totals['ab'] + totals['bb'])):.3f}" if (totals['ab'] + totals['bb']) > 0 else ".000"
-    slg = f"{(totals['tb'] / totals['ab']):.3f}" if totals['ab'] > 0 else ".000"
-    
-    return {
-        'avg': avg, 'obp': obp, 'slg': slg, 
-        'hr': totals['hr'], 'rbi': totals['rbi'], 
-        'h': totals['h'], 'ab': totals['ab'],
-        'bb': totals['bb'], 'tb': totals['tb'], 'k': totals['k']
-    }
+def get_player_stats_for_periods(player_id: int, stat_type: str, periods: Dict[str, Optional[int]], columns: Optional[PlayerStatColumns] = None) -> Dict[str, Any]:
+    """
+    Computes a player's stats for each period from their prefix-summed columns.
+    A period value is the number of most recent games (appearances for
+    pitchers), or None for season-to-date.
+    """
+    if columns is None:
+        current_season = datetime.now().year
+        columns = MLBStatsAPI.get_player_stat_columns(player_id, stat_type, season=current_season)
+    return format_player_stats(StatWindows(stat_type, [columns], periods))[0]
 
-def _aggregate_pitching_stats(game_logs: List[Dict[str, Any]]) -> Dict[str, Any]:
-    if not game_logs: return _get_default_stats('pitching')
-    totals = {'er': 0, 'h': 0, 'r': 0, 'bb': 0, 'k': 0, 'sv': 0, 'gs': 0}
-    total_ip = 0.0
-    for game in game_logs:
-        stat = game.get('stat', {})
-        ip_str = str(stat.get('inningsPitched', '0'))
-        if '.' in ip_str:
-            parts = ip_str.split('.')
-            total_ip += int(parts[0]) + (int(parts[1]) / 3.0)
-        else:
-            total_ip += float(ip_str)
-        totals['er'] += stat.get('earnedRuns', 0)
-        totals['h'] += stat.get('hits', 0)
-        totals['r'] += stat.get('runs', 0)
-        totals['bb'] += stat.get('baseOnBalls', 0)
-        totals['k'] += stat.get('strikeOuts', 0)
-        totals['sv'] += stat.get('saves', 0)
-        totals['gs'] += stat.get('gamesStarted', 0)
-    era = f"{(totals['er'] * 9 / total_ip):.2f}" if total_ip > 0 else "0.00"
-    whip = f"{((totals['bb'] + totals['h']) / total_ip):.2f}" if total_ip > 0 else "0.00"
-    return {'era': era, 'whip': whip, 'k': totals['k'], 'bb': totals['bb'], 'ip': f"{total_ip:.1f}", 'h': totals['h'], 'r': totals['r'], 'gs': totals['gs'], 'sv': totals['sv']}
-
-def get_player_stats_for_periods(player_id: int, stat_type: str, periods: Dict[str, int]) -> Dict[str, Any]:
-    current_season = datetime.now().year
-    game_logs = MLBStatsAPI.get_player_game_logs(player_id, stat_type, season=current_season)
-    stats_by_period = {}
-    if stat_type == 'hitting':
-        played_games = [g for g in game_logs if g.get('stat', {}).get('atBats', 0) > 0]
-        for period_name, num_games in periods.items():
-            stats_by_period[period_name] = _aggregate_hitting_stats(played_games[:num_games])
-    else: 
-        pitched_games = [g for g in game_logs if float(str(g.get('stat', {}).get('inningsPitched', '0'))) > 0]
-        for period_name, num_starts in periods.items():
-            stats_by_period[period_name] = _aggregate_pitching_stats(pitched_games[:num_starts])
-    return stats_by_period
-
-def process_team_roster_in_parallel(roster: List[Dict], stat_type: str, periods: Dict[str, int], max_workers: int = 10) -> List[Dict]:
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_player = {
-            executor.submit(get_player_stats_for_periods, player['id'], stat_type, periods): player
-            for player in roster
-        }
-        for future, player in future_to_player.items():
-            try:
-                player['stats_by_period'] = future.result()
-            except Exception as e:
-                logger.error(f"Error processing player {player['id']} for all periods: {e}")
-                player['stats_by_period'] = {p: _get_default_stats(stat_type) for p in periods}
-    return roster
-
-def calculate_rolling_team_stats(batters: List[Dict], pitchers: List[Dict], period: str, games_played: int) -> Dict[str, Any]:
-    if not batters: return {'AVG': '.000', 'OBP': '.000', 'SLG': '.000', 'HR': 0, 'AVG_HITS': '0.0', 'AVG_K': '0.0'}
-    b_totals = {'ab': 0, 'h': 0, 'bb': 0, 'tb': 0, 'hr': 0}
-    for batter in batters:
-        stats = batter.get('stats_by_period', {}).get(period, {})
-        if stats and stats.get('ab', 0) > 0:
-            b_totals['ab'] += stats.get('ab', 0)
-            b_totals['h'] += stats.get('h', 0)
-            b_totals['bb'] += stats.get('bb', 0)
-            b_totals['hr'] += stats.get('hr', 0)
-            b_totals['tb'] += stats.get('tb', 0)
-    p_totals = {'k': 0}
-    for pitcher in pitchers:
-        stats = pitcher.get('stats_by_period', {}).get(period, {})
-        if stats and float(stats.get('ip', '0.0')) > 0:
-            p_totals['k'] += stats.get('k', 0)
-    team_avg = f"{(b_totals['h'] / b_totals['ab']):.3f}" if b_totals['ab'] > 0 else ".000"
-    team_obp = f"{((b_totals['h'] + b_totals['bb']) / (b_totals['ab'] + b_totals['bb'])):.3f}" if (b_totals['ab'] + b_totals['bb']) > 0 else ".000"
-    team_slg = f"{(b_totals['tb'] / b_totals['ab']):.3f}" if b_totals['ab'] > 0 else ".000"
-    avg_hits = f"{(b_totals['h'] / games_played):.1f}" if games_played > 0 else "0.0"
-    avg_k = f"{(p_totals['k'] / games_played):.1f}" if games_played > 0 else "0.0"
-    return {'AVG': team_avg, 'OBP': team_obp, 'SLG': team_slg, 'HR': b_totals['hr'], 'AVG_HITS': avg_hits, 'AVG_K': avg_k}
-
-
-def get_team_game_history(team_id: int, days: int) -> Dict[str, Any]:
+def process_team_roster(roster: List[Dict], stat_type: str, periods: Dict[str, Optional[int]]) -> StatWindows:
     """
-    Fetches a team's recent game history and calculates their win-loss record.
+    Attaches each player's stats by period and returns the group's window
+    totals for the team rollups. One batched request covers the whole roster;
+    anything it misses is fetched per player. The whole group is aggregated in
+    one vectorized pass. Runs as a single fan-out task, so it must not fan out
+    itself.
     """
+    season = datetime.now().year
+    with profiler.span('roster_group', stat_type=stat_type, players=len(roster)):
+        batch_columns = MLBStatsAPI.get_player_stat_columns_batch([player['id'] for player in roster], stat_type, season=season)
+        columns = []
+        for player in roster:
+            player_columns = batch_columns.get(player['id'])
+            if player_columns is None:
+                try:
+                    player_columns = MLBStatsAPI.get_player_stat_columns(player['id'], stat_type, season=season)
+                except Exception as e:
+                    logger.error(f"Error processing player {player['id']} for all periods: {e}")
+            columns.append(player_columns)
+        with profiler.span('aggregate'):
+            return _attach_stats(roster, StatWindows(stat_type, columns, periods))
+
+def _attach_stats(roster: List[Dict], windows: StatWindows) -> StatWindows:
+    for player, stats_by_period in zip(roster, format_player_stats(windows)):
+        player['stats_by_period'] = stats_by_period
+    return windows
+
+def _with_default_stats(roster: List[Dict], stat_type: str, periods: Dict[str, Optional[int]]) -> StatWindows:
+    return _attach_stats(roster, StatWindows(stat_type, [None] * len(roster), periods))
+
+def period_label(period: str) -> str:
+    """The tab label of a period key."""
+    return PERIOD_LABELS.get(period, period)
+
+def history_days(days: Optional[int]) -> int:
+    """Days spanned by a team-history window; None is season-to-date, counted from January 1."""
+    if days is not None:
+        return days
+    today = datetime.now(pytz.timezone('US/Pacific')).date()
+    return (today - date(today.year, 1, 1)).days
+
+def league_schedule_days() -> int:
+    """The widest team-history window in days; one league-wide schedule fetch covers every team and period."""
+    return max(history_days(days) for days in PERIOD_DAYS.values())
+
+def league_schedule_window(days: Optional[int] = None) -> Tuple[str, str]:
+    """Returns the (start, end) dates of the league schedule covering the last `days` days and every period."""
     pacific = pytz.timezone('US/Pacific')
     end_date = datetime.now(pacific)
-    start_date = end_date - timedelta(days=days)
-
-    url = f"{MLB_API_BASE}/schedule"
-    params = {
-        'sportId': 1,
-        'teamId': team_id,
-        'startDate': start_date.strftime('%Y-%m-%d'),
-        'endDate': end_date.strftime('%Y-%m-%d'),
-        'hydrate': 'decisions,team,linescore',
-    }
+    start_date = end_date - timedelta(days=max(days or 0, league_schedule_days()))
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+def get_league_schedule_index(days: Optional[int] = None) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Returns every team's final games over the last `days` days (at least the
+    widest team-history window) from one league-wide schedule fetch.
+    """
+    return MLBStatsAPI.get_league_schedule(*league_schedule_window(days)) or {}
+
+def get_team_game_history(team_id: int, days: Optional[int]) -> Dict[str, Any]:
+    """
+    Builds a team's recent game history and win-loss record from the shared
+    league schedule index.
+
+    Args:
+        team_id: The MLB team ID.
+        days: Days of history, or None for the regular season to date.
+    """
+    pacific = pytz.timezone('US/Pacific')
+    span = history_days(days)
+    start_str = (datetime.now(pacific) - timedelta(days=span)).strftime('%Y-%m-%d')
     try:
-        data = MLBStatsAPI._make_api_request(url, params)
+        final_games = [g for g in get_league_schedule_index(span).get(team_id, [])
+                       if g['date'] >= start_str and (days is not None or g.get('gameType') in (None, 'R'))]
         wins = 0
         losses = 0
         game_log = []
-        
-        all_games = [game for date_entry in data.get('dates', []) for game in date_entry.get('games', [])]
-
-        final_games = [
-            g for g in all_games 
-            if g.get('status', {}).get('abstractGameState') == 'Final'
-        ]
-        
-        final_games.sort(key=lambda g: g.get('gameDate', ''), reverse=True)
 
         for game in final_games:
             try:
@@ -225,16 +196,8 @@ def get_team_game_history(team_id: int, days: int) -> Dict[str, Any]:
                 if not game_date_str:
                     continue
 
-                away_team = game['teams']['away']
-                home_team = game['teams']['home']
-                is_our_team_away = away_team['team']['id'] == team_id
-                
-                our_score = away_team.get('score', 0) if is_our_team_away else home_team.get('score', 0)
-                opp_score = home_team.get('score', 0) if is_our_team_away else away_team.get('score', 0)
-                opponent_name = home_team.get('team', {}).get('name') if is_our_team_away else away_team.get('team', {}).get('name')
-
-                opponent_abbr = TEAM_ABBREVIATIONS.get(opponent_name, '???')
-                result = 'W' if our_score > opp_score else 'L'
+                opponent_abbr = TEAM_ABBREVIATIONS.get(game['opponent'], '???')
+                result = 'W' if game['score'] > game['opp_score'] else 'L'
                 if result == 'W':
                     wins += 1
                 else:
@@ -255,5 +218,323 @@ def get_team_game_history(team_id: int, days: int) -> Dict[str, Any]:
         return {'record': f"{wins}-{losses}", 'games_played': len(final_games), 'game_log': game_log}
 
     except Exception as e:
-        logger.error(f"Error fetching game history for team {team_id}: {e}", exc_info=True)
-        return {'record': '0-0', 'games_played': 0, 'game_log': []}
\ No newline at end of file
+        logger.error(f"Error building game history for team {team_id}: {e}", exc_info=True)
+        return {'record': '0-0', 'games_played': 0, 'game_log': []}
+
+# Game history shown for a period whose history could not be built in time.
+EMPTY_GAME_HISTORY = {'record': '0-0', 'games_played': 0, 'game_log': []}
+
+def _team_game_histories(team_id: int, periods: List[str]) -> Dict[str, Dict[str, Any]]:
+    """A team's game history for each period."""
+    with profiler.span('game_history', team=team_id):
+        return {period: get_team_game_history(team_id, PERIOD_DAYS[period]) for period in periods}
+
+def _matchup_view_key(home_id: int, away_id: int) -> str:
+    return f"matchup_view:{home_id}:{away_id}"
+
+def _team_versions(home_id: int, away_id: int) -> Dict[int, Any]:
+    """
+    Identifies the data a matchup view was built from: today's date and each
+    team's most recent final game. A change for either team makes the view stale.
+    """
+    index = get_league_schedule_index()
+    today = datetime.now(pytz.timezone('US/Pacific')).strftime('%Y-%m-%d')
+    return {team_id: (today, index[team_id][0]['gamePk'] if index.get(team_id) else None)
+            for team_id in (home_id, away_id)}
+
+# Stat each roster group is sorted by, most first.
+ROSTER_SORT_STATS = {'batters': 'ab', 'pitchers': 'gs'}
+
+def _sort_roster_group(team: Dict[str, Any], kind: str, players: List[Dict]):
+    """Fills team['fullRoster'][kind] with the players sorted for every period."""
+    stat = ROSTER_SORT_STATS[kind]
+    with profiler.span('sort', team=team['id'], kind=kind):
+        team['fullRoster'][kind] = {
+            period: sorted(players, key=lambda p, period=period: p['stats_by_period'][period].get(stat, 0), reverse=True)
+            for period in HITTER_PERIODS
+        }
+
+def iter_matchup_view(home_id: int, away_id: int, timeout: Optional[float] = None,
+                      cancelled: Optional[threading.Event] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Builds a matchup view step by step, so callers can render it progressively.
+
+    The fetches run on the shared pool in two rounds, both under one
+    deadline: both teams' info and rosters and the league schedule, then all
+    four roster groups' stats and both teams' game histories at once. Roster
+    groups and histories that miss the deadline are shown empty. Closing the
+    iterator early, or setting `cancelled`, drops the fetches still queued;
+    a cancelled build ends without a ('view', ...) step.
+
+    Args:
+        timeout: Seconds allowed for the whole build; defaults to FETCH_DEADLINE.
+        cancelled: An event another thread may set to cancel the build.
+
+    Yields:
+        ('teams', (home_team, away_team)) once both teams' info is in;
+        ('group', (team, kind)) as each roster group finishes, with
+        team['fullRoster'][kind] filled in; and finally ('view', view), the
+        complete view, or None if either team's info could not be retrieved.
+    """
+    fan = fetch_pool.fan_out(timeout, cancelled_by=cancelled)
+    try:
+        with profiler.span('team_data'):
+            fan.submit('versions', _team_versions, home_id, away_id)
+            for team_id in (home_id, away_id):
+                fan.submit(('info', team_id), MLBStatsAPI.get_team_info, team_id)
+                fan.submit(('roster', team_id), MLBStatsAPI.get_team_roster, team_id)
+            teams = fan.gather()
+        if cancelled is not None and cancelled.is_set():
+            return
+        # Without them the view is stored unversioned, so it is rebuilt on its next read.
+        versions = teams.get('versions')
+        home_team_data = teams.get(('info', home_id))
+        away_team_data = teams.get(('info', away_id))
+
+        if not home_team_data or not away_team_data or 'teams' not in home_team_data or not home_team_data['teams']:
+            logger.error(f"Could not retrieve team info for home_id={home_id} or away_id={away_id}")
+            yield 'view', None
+            return
+
+        home_team_info = home_team_data['teams'][0]
+        away_team_info = away_team_data['teams'][0]
+
+        home_team = {'id': home_id, 'name': home_team_info.get('name'), 'fullRoster': {'batters': {}, 'pitchers': {}}, 'rollingTeamStats': {}, 'gameHistory': {}}
+        away_team = {'id': away_id, 'name': away_team_info.get('name'), 'fullRoster': {'batters': {}, 'pitchers': {}}, 'rollingTeamStats': {}, 'gameHistory': {}}
+        teams_by_id = {home_id: home_team, away_id: away_team}
+        yield 'teams', (home_team, away_team)
+
+        groups = {}
+        for team_id in (home_id, away_id):
+            roster = teams.get(('roster', team_id)) or {'batters': [], 'pitchers': []}
+            # Cached values are shared between requests; copy the players before attaching stats.
+            batters = [dict(player) for player in roster['batters'][:ROSTER_DISPLAY_LIMIT]]
+            pitchers = [dict(player) for player in roster['pitchers'][:ROSTER_DISPLAY_LIMIT]]
+            groups[(team_id, 'batters')] = (batters, 'hitting', HITTER_PERIODS)
+            groups[(team_id, 'pitchers')] = (pitchers, 'pitching', PITCHER_PERIODS)
+        for label, args in groups.items():
+            fan.submit(label, process_team_roster, *args)
+        # Game history for the rolling team stats, from the league schedule fetched above.
+        periods = list(HITTER_PERIODS)
+        for team_id in (home_id, away_id):
+            fan.submit(('history', team_id), _team_game_histories, team_id, periods)
+        windows = {}
+        for label, result in fan.as_completed():
+            if label[0] == 'history':
+                teams_by_id[label[1]]['gameHistory'] = result
+                continue
+            windows[label] = result
+            _sort_roster_group(teams_by_id[label[0]], label[1], groups[label][0])
+            yield 'group', (teams_by_id[label[0]], label[1])
+        if cancelled is not None and cancelled.is_set():
+            return
+        for label, (roster, stat_type, periods) in groups.items():
+            if label not in windows:
+                # Missed the deadline: show the players with empty stats. The late task may
+                # still attach stats to these player dicts, so show fresh copies instead.
+                roster = [dict(player) for player in roster]
+                groups[label] = (roster, stat_type, periods)
+                windows[label] = _with_default_stats(roster, stat_type, periods)
+                _sort_roster_group(teams_by_id[label[0]], label[1], roster)
+                yield 'group', (teams_by_id[label[0]], label[1])
+
+        for team in (home_team, away_team):
+            for period in periods:
+                # Missed the deadline: an empty record.
+                team['gameHistory'].setdefault(period, dict(EMPTY_GAME_HISTORY, game_log=[]))
+
+        # Team rollups for every period at once, straight from the window totals.
+        with profiler.span('team_rollups'):
+            for team in (home_team, away_team):
+                if not groups[(team['id'], 'batters')][0]:
+                    team['rollingTeamStats'] = {period: dict(EMPTY_TEAM_STATS) for period in periods}
+                    continue
+                games_played = np.array([team['gameHistory'][period]['games_played'] for period in periods])
+                rollups = rolling_team_stats(windows[(team['id'], 'batters')].team_totals(periods),
+                                             windows[(team['id'], 'pitchers')].team_totals(periods), games_played)
+                team['rollingTeamStats'] = dict(zip(periods, rollups))
+
+        yield 'view', {'home_team': home_team, 'away_team': away_team, 'versions': versions}
+    finally:
+        fan.cancel()
+
+def build_matchup_view(home_id: int, away_id: int, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Builds the complete details-page view model for a matchup.
+
+    Args:
+        timeout: Seconds allowed for the whole build; defaults to FETCH_DEADLINE.
+
+    Returns:
+        A dictionary with 'home_team', 'away_team' and 'versions', or None if
+        either team's info could not be retrieved.
+    """
+    view = None
+    for event, value in iter_matchup_view(home_id, away_id, timeout):
+        if event == 'view':
+            view = value
+    return view
+
+def _store_matchup_view(home_id: int, away_id: int, view: Dict[str, Any], stale: bool):
+    swr_cache.set(_matchup_view_key(home_id, away_id), view, timeout=MLBStatsAPI.HARD_TIMEOUT, stale=stale)
+
+def materialize_matchup_view(home_id: int, away_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Builds a matchup view and stores it for the details route to serve.
+    A view built from any stale inputs is stored as stale, so it is rebuilt
+    once their background refreshes have landed.
+    """
+    stale_reads = swr_cache.stale_reads
+    view = build_matchup_view(home_id, away_id)
+    if view is not None:
+        _store_matchup_view(home_id, away_id, view, stale=swr_cache.stale_reads > stale_reads)
+    return view
+
+def get_stored_matchup_view(home_id: int, away_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Returns the stored view for a matchup without building one, or None.
+
+    A stored view whose team versions no longer match (a new final game for
+    either team, or a new day) or that has passed its soft TTL is still served,
+    and rebuilt in the background.
+    """
+    key = _matchup_view_key(home_id, away_id)
+    entry = swr_cache.get(key)
+    if entry is None:
+        return None
+    if (entry.value.get('versions') != _team_versions(home_id, away_id)
+            or not swr_cache.is_fresh(entry, MATCHUP_VIEW_SOFT_TIMEOUT)):
+        swr_cache.refresh_in_background(key, materialize_matchup_view, home_id, away_id)
+    return entry.value
+
+def get_matchup_view(home_id: int, away_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Returns the materialized view for a matchup, building it only if none is
+    stored. See get_stored_matchup_view() for how stored views are refreshed.
+    """
+    view = get_stored_matchup_view(home_id, away_id)
+    if view is not None:
+        return view
+    key = _matchup_view_key(home_id, away_id)
+    with single_flight.lock(key):
+        entry = swr_cache.get(key)
+        if entry is not None:
+            return entry.value
+        return materialize_matchup_view(home_id, away_id)
+
+# Ends a streamed build's event queue; carries the producer's (stale reads, upstream calls).
+_STREAM_END = object()
+
+def stream_matchup_view(home_id: int, away_id: int) -> Iterator[Tuple[str, Any]]:
+    """
+    Like get_matchup_view() for a matchup with no stored view, but yields the
+    build's progress as iter_matchup_view() does, then stores the result.
+
+    The build runs on its own thread, which holds the single-flight lock
+    only while it builds and stores the view and hands each step to this
+    generator through a queue. A slow or stalled client therefore never keeps
+    the lock. Closing this generator, as the server does when the client goes
+    away, cancels the build: its queued fetches are dropped and nothing is
+    stored. If another caller stored the view while the build waited for the
+    lock, only the final ('view', view) step is yielded.
+
+    The build keeps filling in the teams after its 'teams' and 'group'
+    steps, so those are handed over as deep copies the consumer alone owns.
+    The final view is never changed once built.
+    """
+    events: queue.Queue = queue.Queue()
+    cancelled = threading.Event()
+    context = {'app': current_app._get_current_object() if has_app_context() else None,
+               'revalidating': swr_cache.revalidating, 'priority': rate_limiter.current_priority(),
+               'span': profiler.current(), 'cancelled': cancelled}
+    threading.Thread(target=_produce_matchup_view, args=(home_id, away_id, events, context),
+                     name=f"matchup-view-{home_id}-{away_id}", daemon=True).start()
+    try:
+        while True:
+            event, value = events.get()
+            if event is _STREAM_END:
+                _credit_build(value)
+                return
+            if event == 'view':
+                # The build ends right after its view; credit it before the caller stops reading.
+                _credit_build(events.get()[1])
+                yield event, value
+                return
+            yield event, value
+    except GeneratorExit:
+        cancelled.set()
+        raise
+
+def _credit_build(counters: Tuple[int, int]):
+    """Credits a streamed build's stale reads and upstream calls to this request, as a fan-out would."""
+    swr_cache.add_stale_reads(counters[0])
+    metrics.add_upstream_calls(counters[1])
+
+def _produce_matchup_view(home_id: int, away_id: int, events: queue.Queue, context: Dict[str, Any]):
+    """Builds and stores a matchup view under its single-flight lock, putting each step on events."""
+    stale_reads = swr_cache.stale_reads
+    upstream_calls = metrics.upstream_calls
+    try:
+        with ExitStack() as stack:
+            if context['app'] is not None:
+                stack.enter_context(context['app'].app_context())
+            if context['revalidating']:
+                stack.enter_context(swr_cache.revalidation())
+            stack.enter_context(rate_limiter.priority(context['priority']))
+            stack.enter_context(profiler.attached(context['span']))
+            key = _matchup_view_key(home_id, away_id)
+            with single_flight.lock(key):
+                entry = swr_cache.get(key)
+                if entry is not None:
+                    events.put(('view', entry.value))
+                    return
+                for event, value in iter_matchup_view(home_id, away_id, cancelled=context['cancelled']):
+                    if event == 'view':
+                        if value is not None:
+                            _store_matchup_view(home_id, away_id, value, stale=swr_cache.stale_reads > stale_reads)
+                    else:
+                        value = copy.deepcopy(value)
+                    events.put((event, value))
+    except Exception as e:
+        logger.error(f"Building the view for {home_id} vs {away_id} failed: {e}", exc_info=True)
+        events.put(('view', None))
+    finally:
+        events.put((_STREAM_END, (swr_cache.stale_reads - stale_reads, metrics.upstream_calls - upstream_calls)))
+
+def _player_rows(players: List[Dict], period: str, rated_stats: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    rows = []
+    for player in players:
+        stats = player['stats_by_period'][period]
+        rows.append({'id': player['id'], 'name': player['name'], 'position': player.get('position'), 'stats': stats,
+                     'classes': {stat: get_stat_class(stats.get(stat), stat) for stat in rated_stats}})
+    return rows
+
+def matchup_period_slice(view: Dict[str, Any], period: str, team_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extracts one period of a matchup view for the JSON stats API.
+
+    Args:
+        view: A view from get_matchup_view().
+        period: One of the HITTER_PERIODS keys.
+        team_id: Return only this team's slice; both teams if None.
+
+    Returns:
+        A JSON-serializable dictionary with the period and a 'teams' mapping of
+        'home'/'away' to the team's rollups, record and sorted player rows.
+    """
+    teams = {}
+    for side in ('home', 'away'):
+        team = view[f'{side}_team']
+        if team_id is not None and team['id'] != team_id:
+            continue
+        history = team['gameHistory'].get(period, {})
+        teams[side] = {
+            'id': team['id'],
+            'name': team['name'],
+            'record': history.get('record', '0-0'),
+            'game_log': history.get('game_log', [])[:7],
+            'team_stats': team['rollingTeamStats'].get(period, dict(EMPTY_TEAM_STATS)),
+            'batters': _player_rows(team['fullRoster']['batters'][period], period, ('avg', 'slg', 'obp')),
+            'pitchers': _player_rows(team['fullRoster']['pitchers'][period], period, ('era', 'whip')),
+        }
+    return {'period': period, 'teams': teams}
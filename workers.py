@@ -0,0 +1,190 @@
+# workers.py
+
+"""
+The process-wide worker pool for page-building fan-outs.
+
+Every request submits its independent fetches to one shared, bounded
+ThreadPoolExecutor instead of creating its own, so the number of fetch
+threads per gunicorn worker stays capped no matter how many pages are
+loading at once. Each request's tasks form a FanOut with a deadline; work
+still queued when the deadline passes, or when the request is cancelled, is
+dropped rather than run.
+
+Fan-out tasks must not start fan-outs of their own: with every pool thread
+waiting on queued children the pool would deadlock.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, wait, FIRST_COMPLETED
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from caching import swr_cache
+from metrics import metrics
+from profiling import profiler
+from mlb_api import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+class FanOut:
+    """
+    One request's batch of concurrent tasks on the shared pool.
+
+    Tasks run with the submitting thread's app context, revalidation mode and
+    rate-limit priority, and the stale values they read and upstream calls they
+    make are credited back to the submitting thread, so callers behave as if
+    the work ran inline. When the request is being profiled, their spans are
+    recorded under the span that submitted them.
+    """
+    def __init__(self, executor: ThreadPoolExecutor, timeout: Optional[float],
+                 cancelled_by: Optional[threading.Event] = None):
+        self.executor = executor
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.futures: Dict[Any, Future] = {}
+        self.cancelled = threading.Event()
+        self._cancelled_by = cancelled_by
+        self._collected = set()
+        self._stale_reads = 0
+        self._upstream_calls = 0
+        self._lock = threading.Lock()
+        self._app = current_app._get_current_object() if has_app_context() else None
+        self._revalidating = swr_cache.revalidating
+        self._priority = rate_limiter.current_priority()
+
+    def _run(self, func: Callable, args: tuple, kwargs: dict, span):
+        if self.is_cancelled():
+            raise CancelledError()
+        with ExitStack() as stack:
+            if self._app is not None:
+                stack.enter_context(self._app.app_context())
+            if self._revalidating:
+                stack.enter_context(swr_cache.revalidation())
+            stack.enter_context(rate_limiter.priority(self._priority))
+            stack.enter_context(profiler.attached(span))
+            before = swr_cache.stale_reads
+            calls_before = metrics.upstream_calls
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe('mlb_fanout_task_duration_seconds', time.perf_counter() - started)
+                with self._lock:
+                    self._stale_reads += swr_cache.stale_reads - before
+                    self._upstream_calls += metrics.upstream_calls - calls_before
+
+    def submit(self, label: Any, func: Callable, *args, **kwargs) -> Future:
+        """Queues func(*args, **kwargs) under label."""
+        future = self.executor.submit(self._run, func, args, kwargs, profiler.current())
+        self.futures[label] = future
+        return future
+
+    def is_cancelled(self) -> bool:
+        """Whether cancel() was called or the caller's cancellation event is set."""
+        return self.cancelled.is_set() or (self._cancelled_by is not None and self._cancelled_by.is_set())
+
+    def cancel(self):
+        """Drops every task that hasn't started yet; running tasks finish on their own."""
+        self.cancelled.set()
+        for future in self.futures.values():
+            future.cancel()
+
+    def as_completed(self) -> Iterator[Tuple[Any, Any]]:
+        """
+        Yields (label, result) for each task submitted since the last call as
+        it finishes, until all are done, the deadline passes or the fan-out is
+        cancelled; then cancels whatever is still queued. Tasks that failed
+        are logged and skipped. Closing the iterator early cancels the rest as well.
+        """
+        labels = {future: label for label, future in self.futures.items() if future not in self._collected}
+        self._collected.update(labels)
+        pending = set(labels)
+        try:
+            while pending and not self.is_cancelled():
+                remaining = None if self.deadline is None else self.deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning(f"Fan-out deadline passed with {len(pending)} task(s) unfinished.")
+                    break
+                # Wake up periodically so cancel() from another thread is noticed.
+                done, pending = wait(pending, timeout=0.25 if remaining is None else min(remaining, 0.25),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Tasks that were cancelled before they started, or noticed it as they did.
+                    if future.cancelled() or isinstance(future.exception(), CancelledError):
+                        metrics.inc('mlb_fanout_tasks_total', {'result': 'dropped'})
+                        continue
+                    error = future.exception()
+                    if error is not None:
+                        metrics.inc('mlb_fanout_tasks_total', {'result': 'failed'})
+                        logger.error(f"Fan-out task {labels[future]} failed: {error}")
+                        continue
+                    metrics.inc('mlb_fanout_tasks_total', {'result': 'ok'})
+                    yield labels[future], future.result()
+        finally:
+            if pending:
+                metrics.inc('mlb_fanout_tasks_total', {'result': 'dropped'}, len(pending))
+                self.cancel()
+            with self._lock:
+                swr_cache.add_stale_reads(self._stale_reads)
+                metrics.add_upstream_calls(self._upstream_calls)
+                self._stale_reads = 0
+                self._upstream_calls = 0
+
+    def gather(self) -> Dict[Any, Any]:
+        """
+        Waits for the submitted tasks until they finish, the deadline passes or
+        the fan-out is cancelled, then cancels whatever is still queued.
+
+        Returns:
+            A dictionary mapping the label of each task submitted since the
+            last call to its result. Tasks that failed, were cancelled or
+            missed the deadline are omitted.
+        """
+        return dict(self.as_completed())
+
+class FetchPool:
+    """Lazily created, fork-aware shared executor with a global concurrency cap."""
+    def __init__(self, max_workers: int = 16, timeout: float = 20.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Reads the pool size and default per-request deadline from the app config."""
+        self.max_workers = app.config.get('FETCH_MAX_WORKERS', self.max_workers)
+        self.timeout = app.config.get('FETCH_DEADLINE', self.timeout)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            # Threads don't survive a fork; each gunicorn worker builds its own pool.
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fetch')
+                self._pid = os.getpid()
+            return self._executor
+
+    def fan_out(self, timeout: Optional[float] = None, cancelled_by: Optional[threading.Event] = None) -> FanOut:
+        """
+        Starts a fan-out on the shared pool.
+
+        Args:
+            timeout: Seconds until the fan-out's deadline; defaults to FETCH_DEADLINE.
+            cancelled_by: An event another thread may set to cancel the fan-out,
+                e.g. when the client it is building a page for goes away.
+        """
+        return FanOut(self.executor, self.timeout if timeout is None else timeout, cancelled_by)
+
+    def queue_depth(self) -> int:
+        """Tasks submitted to this process's pool that no thread has picked up yet."""
+        executor = self._executor
+        if executor is None or self._pid != os.getpid():
+            return 0
+        return executor._work_queue.qsize()
+
+fetch_pool = FetchPool()
+metrics.register_collector(lambda: [('mlb_fetch_pool_queue_depth', {}, fetch_pool.queue_depth())])